@@ -0,0 +1,114 @@
+"""
+Admission control for the job queue.
+
+The queue is capped, and each priority class is only admitted while the
+queue is shallower than its share of the cap, so low-priority work is shed
+first as the queue fills. Waits are estimated from an EWMA of how long jobs
+take to process; a job that would wait longer than max_wait_s is refused
+as well, and so is any job while the write-behind queues are full because
+Mongo is down. Refusals are 503s carrying the estimated wait as Retry-After.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+
+from fastapi import HTTPException
+
+from metrics import JOBS_REJECTED
+
+if TYPE_CHECKING:
+    from persistence import WriteBehindWriter
+
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+
+# Fraction of max_depth up to which each priority is still admitted
+DEFAULT_SHED_AT: Dict[str, float] = {"high": 1.0, "normal": 0.9, "low": 0.5}
+
+
+class AdmissionController:
+
+    def __init__(
+        self,
+        max_depth: int = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "1000")),
+        max_wait_s: float = float(os.getenv("JOB_QUEUE_MAX_WAIT_S", "900")),
+        workers: int = 1,
+        initial_service_s: float = 30.0,
+        alpha: float = 0.2
+    ):
+        self.max_depth = max_depth
+        self.max_wait_s = max_wait_s
+        self.workers = workers
+        self.service_s = initial_service_s
+        self.alpha = alpha
+        self.shed_at = {**DEFAULT_SHED_AT, **json.loads(os.getenv("JOB_QUEUE_SHED_AT", "{}"))}
+        self.rejected = 0
+
+    def record_service_time(self, seconds: float) -> None:
+        self.service_s += self.alpha * (seconds - self.service_s)
+
+    def throughput(self) -> float:
+        """Jobs per second at the current service time"""
+        return self.workers / self.service_s if self.service_s > 0 else 0.0
+
+    def estimated_wait(self, ahead: int) -> float:
+        """Seconds until a job with `ahead` jobs before it starts"""
+        return ahead * self.service_s / self.workers
+
+    def limit_for(self, priority: str) -> int:
+        return math.ceil(self.max_depth * self.shed_at.get(priority, self.shed_at[DEFAULT_PRIORITY]))
+
+    def admit(self, depth: int, in_flight: int = 0, priority: Optional[str] = None) -> float:
+        """Return the estimated wait for a new job, or raise 503 if it must be refused"""
+        priority = priority or DEFAULT_PRIORITY
+        wait = self.estimated_wait(depth + in_flight)
+        limit = self.limit_for(priority)
+        if depth >= limit:
+            # Retry once enough jobs have drained to bring the queue under this priority's limit.
+            self._refuse(
+                priority, "queue_full", f"Job queue is full for {priority} priority ({depth} queued)",
+                wait, self.estimated_wait(depth - limit + 1)
+            )
+        if wait > self.max_wait_s and priority != "high":
+            self._refuse(
+                priority, "wait_too_long", f"Estimated queue wait {wait:.0f}s exceeds {self.max_wait_s:.0f}s",
+                wait, wait - self.max_wait_s
+            )
+        return wait
+
+    def admit_writes(self, writers: Iterable["WriteBehindWriter"], priority: Optional[str] = None) -> None:
+        """Raise 503 while any write-behind queue is backed up behind an unreachable Mongo"""
+        full = [w for w in writers if w.full()]
+        if full:
+            self._refuse(
+                priority or DEFAULT_PRIORITY, "storage_backlog",
+                f"Storage is behind ({sum(w.queue_depth() for w in full)} writes pending)",
+                0.0, max(w.retry_in() for w in full)
+            )
+
+    def _refuse(self, priority: str, reason: str, detail: str, wait: float, retry_after: float) -> None:
+        self.rejected += 1
+        JOBS_REJECTED.labels(reason, priority).inc()
+        raise HTTPException(
+            status_code=503,
+            detail={"message": detail, "estimated_wait_s": round(wait, 1)},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def saturated(self, depth: int, in_flight: int = 0) -> bool:
+        """True once normal-priority jobs would be refused"""
+        return depth >= self.limit_for(DEFAULT_PRIORITY) or self.estimated_wait(depth + in_flight) > self.max_wait_s
+
+    def status(self, depth: int, in_flight: int = 0) -> Dict[str, object]:
+        return {
+            "depth": depth,
+            "in_flight": in_flight,
+            "max_depth": self.max_depth,
+            "saturated": self.saturated(depth, in_flight),
+            "estimated_wait_s": round(self.estimated_wait(depth + in_flight), 1),
+            "throughput_per_min": round(self.throughput() * 60, 2),
+            "rejected": self.rejected
+        }
@@ -0,0 +1,150 @@
+"""
+Job deadlines and cooperative cancellation.
+
+A CancelToken carries a job's deadline and a cancel flag. It is bound to
+the job through a context variable, so agents, LLM calls and browser
+threads started with tracing.run_in_context() or asyncio.to_thread() see
+the same token. Long-running code calls check_cancelled() between stages
+and sizes its own timeouts with remaining(); the asyncio side is cancelled
+by whoever owns the job task.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_DEADLINE_S = float(os.getenv("JOB_DEFAULT_DEADLINE_S", "180"))
+
+# Seconds from dequeue, per task type; JOB_DEADLINES overrides entries.
+TASK_DEADLINES_S: Dict[str, float] = {
+    "web_scrape": 120.0,
+    "summarize": 60.0,
+    "sentiment_analysis": 30.0,
+    **json.loads(os.getenv("JOB_DEADLINES", "{}")),
+}
+
+
+def deadline_for(task_type: Optional[str], requested_s: Optional[float] = None) -> float:
+    """A deadline requested with the job wins over the task type's default"""
+    if requested_s:
+        return requested_s
+    return TASK_DEADLINES_S.get(task_type, DEFAULT_DEADLINE_S)
+
+
+class JobCancelled(Exception):
+    """Raised at a cancellation check; reason is "cancelled" or "timed_out"."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+
+    def __init__(self, timeout_s: Optional[float] = None, parent: Optional["CancelToken"] = None):
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout_s if timeout_s is not None else None
+        self.parent = parent
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._listeners: List[Callable[[], None]] = []
+
+    def subscribe(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener when the deadline is moved or the token cancelled; returns an unsubscribe"""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        for listener in list(self._listeners):
+            listener()
+
+    def set_timeout(self, timeout_s: float) -> None:
+        """Re-base the deadline on the token's start time"""
+        self.deadline = self.started + timeout_s
+        self._notify()
+
+    def child(self) -> "CancelToken":
+        """A token that can be cancelled on its own and follows this one"""
+        return CancelToken(parent=self)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            self._notify()
+
+    def remaining(self) -> Optional[float]:
+        deadlines = [t.deadline for t in self._chain() if t.deadline is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        for token in self._chain():
+            if token._event.is_set():
+                return True
+            if token.deadline is not None and time.monotonic() >= token.deadline:
+                token.cancel("timed_out")
+                return True
+        return False
+
+    def cancel_reason(self) -> Optional[str]:
+        return next((t.reason for t in self._chain() if t.reason), None)
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(self.cancel_reason())
+
+    def _chain(self):
+        token = self
+        while token is not None:
+            yield token
+            token = token.parent
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+@contextmanager
+def bind(token: CancelToken):
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def check_cancelled() -> None:
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+def sleep(seconds: float, poll: float = 0.5) -> None:
+    """Blocking sleep that ends early, with JobCancelled, if the current job is cancelled"""
+    token = _current_token.get()
+    if token is None:
+        time.sleep(seconds)
+        return
+    end = time.monotonic() + seconds
+    while (left := end - time.monotonic()) > 0:
+        token.check()
+        token._event.wait(min(poll, left))
+    token.check()
+
+
+def remaining(default: Any = None) -> Any:
+    """Seconds left before the current job's deadline, or default if it has none"""
+    token = _current_token.get()
+    left = token.remaining() if token is not None else None
+    return default if left is None else left
@@ -10,6 +10,8 @@ class TaskState(str, Enum):
     in_progress = "in_progress"
     completed = "completed"
     failed = "failed"
+    timed_out = "timed_out"
+    cancelled = "cancelled"
 
 class RequestContext(BaseModel):
     request_id: UUID = Field(default_factory=uuid4)
@@ -24,6 +26,8 @@ class RequestContext(BaseModel):
 
     parent_job_id: Optional[str] = None
     correlation_id: Optional[str] = None
+    # Overrides the task type's default deadline (see agent_executor.cancellation)
+    deadline_s: Optional[float] = None
 
     ALLOWED_TASK_TYPES: ClassVar[set[str]] = {"web_scrape", "summarize", "sentiment_analysis"}
 
@@ -39,3 +43,9 @@ class RequestContext(BaseModel):
 
     def mark_failed(self) -> None:
         self.state = TaskState.failed
+
+    def mark_timed_out(self) -> None:
+        self.state = TaskState.timed_out
+
+    def mark_cancelled(self) -> None:
+        self.state = TaskState.cancelled
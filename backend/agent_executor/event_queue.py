@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
 from uuid import uuid4, UUID
 from pydantic import BaseModel, Field
@@ -13,11 +13,26 @@ class Event(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 class EventQueue:
-    def __init__(self) -> None:
+    def __init__(self, job_id: Optional[str] = None, sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
         self.events: List[Event] = []
+        self.job_id = job_id
+        self.sink = sink
 
     def push(self, event: Event) -> None:
+        seq = len(self.events)
         self.events.append(event)
+        if self.sink is not None:
+            self.sink(self.to_document(seq, event))
+
+    def to_document(self, seq: int, event: Event) -> Dict[str, Any]:
+        doc = event.model_dump()
+        doc["event_id"] = str(event.event_id)
+        doc["job_id"] = self.job_id
+        doc["seq"] = seq
+        # Result payloads are already stored as the job's output.
+        if event.type == "result":
+            doc["metadata"] = {"stored_in": "output"}
+        return doc
 
     def list_events(self) -> List[Event]:
         return self.events
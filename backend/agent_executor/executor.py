@@ -3,12 +3,22 @@ from bs4 import BeautifulSoup
 from datetime import datetime, timezone
 from agent_executor.context import RequestContext
 from agent_executor.event_queue import EventQueue, Event
-from openai import AzureOpenAI
+from agent_executor.sentiment import LexiconMatcher, DEFAULT_MATCHER
+from agent_executor.lexicon import LexiconStore, default_lexicon_store
+from agent_executor.cancellation import check_cancelled, remaining
+from openai import AzureOpenAI, NOT_GIVEN
+from metrics import STAGE_LATENCY, BROWSER_POOL_IN_USE
+from tracing import tracer, run_in_context
+import resilience
+from singleflight import SingleFlight, normalize_url
 import asyncio
+import numpy as np
 import os
 import json
 import re
+from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Mapping
 import sys
 
 
@@ -25,41 +35,82 @@ class AgentExecutor:
 
 class WebScraperExecutor(AgentExecutor):
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, llm_client: AzureOpenAI = None, pool: ThreadPoolExecutor = None):
         super().__init__(name)
-        self.llm_client = AzureOpenAI(
+        self.llm_client = llm_client or AzureOpenAI(
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_version="2024-05-01-preview"
+            api_version="2024-05-01-preview",
+            max_retries=0
         )
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        self.executor = pool or ThreadPoolExecutor(max_workers=3)
+        self.page_flight = SingleFlight("page")
+
+    @staticmethod
+    def _budget_ms(cap_ms: float) -> float:
+        # Playwright timeouts never outlive the job's deadline. Playwright reads
+        # 0 as "no timeout", so a spent budget raises instead of reaching it.
+        check_cancelled()
+        return max(1.0, min(cap_ms, remaining(cap_ms / 1000) * 1000))
 
-    def _scrape_page_sync(self, url: str):
+    def _fetch_page_sync(self, url: str) -> str:
         if sys.platform.startswith("win"):
             asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                viewport={"width": 1920, "height": 1080}
-            )
-            page = context.new_page()
-            page.set_default_navigation_timeout(60000)
-            page.set_default_timeout(60000)
-
-            page.goto(url, wait_until="domcontentloaded")
-            page.wait_for_load_state("load")
-            page.wait_for_selector("body", state="attached", timeout=10000)
-            page.wait_for_timeout(1500)
-
-            content = page.content()
-            browser.close()
-
+        # The job may have been cancelled while waiting for a browser thread.
+        check_cancelled()
+        BROWSER_POOL_IN_USE.inc()
+        try:
+            with tracer.span("scrape", agent=self.name, url=url), sync_playwright() as p:
+                with tracer.span("browser_launch"), STAGE_LATENCY.labels("browser_launch", self.name).time():
+                    browser = p.chromium.launch(headless=True)
+                    context = browser.new_context(
+                        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                        viewport={"width": 1920, "height": 1080}
+                    )
+                    page = context.new_page()
+                # Leaving sync_playwright() closes the browser, so a cancelled
+                # job frees its context as soon as it reaches a check.
+                check_cancelled()
+                page.set_default_navigation_timeout(self._budget_ms(60000))
+                page.set_default_timeout(self._budget_ms(60000))
+
+                with tracer.span("page_load"), STAGE_LATENCY.labels("page_load", self.name).time():
+                    response = page.goto(url, wait_until="domcontentloaded")
+                    if response is not None and response.status in resilience.RETRYABLE_STATUS:
+                        raise resilience.TransientError(
+                            f"{url} returned HTTP {response.status}",
+                            resilience.parse_retry_after(response.headers.get("retry-after"))
+                        )
+                    check_cancelled()
+                    page.wait_for_load_state("load")
+                    page.wait_for_selector("body", state="attached", timeout=self._budget_ms(10000))
+                    page.wait_for_timeout(self._budget_ms(1500))
+                    check_cancelled()
+                    content = page.content()
+                browser.close()
+            return content
+        finally:
+            BROWSER_POOL_IN_USE.dec()
+
+    def _parse_page(self, content: str) -> BeautifulSoup:
+        with tracer.span("parse", agent=self.name), STAGE_LATENCY.labels("parse", self.name).time():
             return BeautifulSoup(content, "html.parser")
 
-    async def scrape_page(self, url: str):
+    async def fetch_page(self, url: str) -> str:
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(self.executor, self._scrape_page_sync, url)
+        # One breaker per site: a site that is down shouldn't fail scrapes of others.
+        return await resilience.call_async(
+            f"site:{urlparse(url).hostname}",
+            lambda: loop.run_in_executor(self.executor, run_in_context(self._fetch_page_sync, url)),
+            resilience.PAGE_RETRY
+        )
+
+    async def scrape_page(self, url: str):
+        # Concurrent scrapes of one page share a browser session. Each caller
+        # parses its own soup, since clean_text() edits it in place.
+        content = await self.page_flight.do(normalize_url(url), lambda: self.fetch_page(url))
+        check_cancelled()
+        return await asyncio.to_thread(self._parse_page, content)
 
     def clean_text(self, soup: BeautifulSoup):
         for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'iframe', 'noscript']):
@@ -108,16 +159,19 @@ class WebScraperExecutor(AgentExecutor):
 
         user_prompt = f"User's Goal: {user_goal}\n\n" + "\n\n".join(context_parts)
 
-        response = self.llm_client.chat.completions.create(
-            model=os.getenv("AZURE_DEPLOYMENT_NAME"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0,
-            max_tokens=1000,
-            response_format={"type": "json_object"}
-        )
+        check_cancelled()
+        with tracer.span("extract", agent=self.name), STAGE_LATENCY.labels("extraction_llm", self.name).time():
+            response = resilience.call("azure_openai", lambda: self.llm_client.chat.completions.create(
+                model=os.getenv("AZURE_DEPLOYMENT_NAME"),
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0,
+                max_tokens=1000,
+                response_format={"type": "json_object"},
+                timeout=remaining(NOT_GIVEN)
+            ))
         content = response.choices[0].message.content
         return json.loads(content)
 
@@ -134,7 +188,8 @@ class WebScraperExecutor(AgentExecutor):
         queue.push(Event(type="status_update", message="Page retrieved successfully"))
         queue.push(Event(type="status_update", message="Analyzing content with LLM..."))
 
-        extracted_data = self.extract_data_with_llm(soup, user_goal, url)
+        # Off the event loop so a slow LLM call can't stall other jobs or deadlines.
+        extracted_data = await asyncio.to_thread(self.extract_data_with_llm, soup, user_goal, url)
 
         result = {
             "url": url,
@@ -150,16 +205,126 @@ class WebScraperExecutor(AgentExecutor):
 
 class SummarizerExecutor(AgentExecutor):
 
+    def __init__(self, name: str, chunk_size: int = 16000, fan_in: int = 8):
+        super().__init__(name)
+        self.chunk_size = chunk_size
+        self.fan_in = fan_in
+
+    def summarize_text(self, text: str, max_length: int):
+        return text[:max_length] + "..." if len(text) > max_length else text
+
+    @staticmethod
+    def _cut(text: str, start: int, chunk_size: int) -> int:
+        # The last whitespace within the chunk, so words are not split across chunks
+        end = start + chunk_size
+        cut = max(text.rfind("\n", start, end), text.rfind(" ", start, end))
+        return cut if cut > start else end
+
+    def iter_chunks(self, source, chunk_size: int):
+        # Accepts a str, a file-like object or any iterable of str pieces and
+        # yields chunks of at most chunk_size characters, cut on whitespace
+        # where possible, whichever form the text arrives in.
+        if isinstance(source, Mapping):
+            # Iterating a dict would summarize its keys.
+            raise TypeError("Text to summarize must be a str or an iterable of str, not a mapping")
+        if isinstance(source, str):
+            start = 0
+            while len(source) - start > chunk_size:
+                cut = self._cut(source, start, chunk_size)
+                yield source[start:cut]
+                start = cut
+            if start < len(source):
+                yield source[start:]
+            return
+
+        if hasattr(source, "read"):
+            pieces = iter(lambda: source.read(chunk_size), "")
+        else:
+            pieces = iter(source)
+
+        buffer = ""
+        for piece in pieces:
+            if not isinstance(piece, str):
+                raise TypeError(f"Text to summarize must be str pieces, got {type(piece).__name__}")
+            buffer += piece
+            while len(buffer) > chunk_size:
+                cut = self._cut(buffer, 0, chunk_size)
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+        if buffer:
+            yield buffer
+
+    def merge_summaries(self, summaries: list, max_length: int):
+        # Every part gets an equal share of the budget so the merged summary
+        # covers the whole span instead of only its first chunk.
+        share = max(1, max_length // len(summaries))
+        return self.summarize_text("\n".join(self.summarize_text(s, share) for s in summaries), max_length)
+
+    def summarize_stream(self, source, max_length: int = 200):
+        """
+        Tree-reduce summarization over a chunked input.
+
+        Every fan_in consecutive chunk summaries are merged into one summary
+        of the next level, so memory is bounded by one chunk per level rather
+        than the document. Blocking: the registry runs it off the event loop.
+        """
+        levels = [[]]
+        original_length = 0
+        chunk_count = 0
+
+        def push(summary: str, level: int = 0):
+            while True:
+                if level == len(levels):
+                    levels.append([])
+                levels[level].append(summary)
+                if len(levels[level]) < self.fan_in:
+                    return
+                summary = self.merge_summaries(levels[level], max_length)
+                levels[level] = []
+                level += 1
+
+        for chunk in self.iter_chunks(source, self.chunk_size):
+            check_cancelled()
+            original_length += len(chunk)
+            chunk_count += 1
+            push(self.summarize_text(chunk, max_length))
+
+        # Higher levels hold earlier text, so merge the leftovers top-down.
+        pending = [s for level in reversed(levels) for s in level]
+        if not pending:
+            summary = ""
+        elif len(pending) == 1:
+            summary = pending[0]
+        else:
+            summary = self.merge_summaries(pending, max_length)
+
+        return {
+            "summary": summary,
+            "original_length": original_length,
+            "summarized_length": len(summary),
+            "chunks": chunk_count,
+            "mode": "streaming"
+        }
+
     def execute(self, request: RequestContext, queue: EventQueue):
         queue.push(Event(type="message", message=f"{self.name} received summarization request"))
 
         data = request.payload.get("data", "")
         max_length = request.payload.get("max_length", 200)
+        stream = request.payload.get("stream", False)
 
         if not data:
             result = {"error": "No data provided to summarize"}
+        elif not (isinstance(data, str) or isinstance(data, list) and all(isinstance(piece, str) for piece in data)):
+            result = {"error": "Data to summarize must be text or a list of text"}
+        elif stream or not isinstance(data, str) or len(data) > self.chunk_size:
+            queue.push(Event(type="status_update", message="Summarizing input in streaming mode"))
+            result = {
+                **self.summarize_stream(data, max_length),
+                "summarized_at": datetime.now(timezone.utc).isoformat()
+            }
         else:
-            summary = data[:max_length] + "..." if len(data) > max_length else data
+            summary = self.summarize_text(data, max_length)
             result = {
                 "summary": summary,
                 "original_length": len(data),
@@ -172,33 +337,76 @@ class SummarizerExecutor(AgentExecutor):
         return result
 
 
+def classify_sentiment(positive, negative):
+    """Label and confidence from lexicon scores; accepts scalars or NumPy arrays"""
+    positive = np.asarray(positive, dtype=np.float64)
+    negative = np.asarray(negative, dtype=np.float64)
+    labels = np.where(positive > negative, "positive", np.where(negative > positive, "negative", "neutral"))
+    confidence = np.where(
+        labels == "neutral",
+        0.5,
+        np.minimum(1.0, np.maximum(positive, negative) / (positive + negative + 1))
+    ).round(2)
+    return labels, confidence
+
+
 class SentimentExecutor(AgentExecutor):
 
+    def __init__(self, name: str, matcher: LexiconMatcher = None, lexicon_store: LexiconStore = None):
+        super().__init__(name)
+        self.matcher = matcher or DEFAULT_MATCHER
+        self.lexicon_store = lexicon_store or (None if matcher else default_lexicon_store())
+
+    def current_matcher(self) -> LexiconMatcher:
+        if self.lexicon_store is not None:
+            return self.lexicon_store.matcher()
+        return self.matcher
+
     def analyze_sentiment(self, text: str):
-        positive_keywords = ["gain", "profit", "growth", "success", "increase", "up", "bullish", "surge"]
-        negative_keywords = ["loss", "decline", "fall", "drop", "crash", "down", "bearish", "plunge"]
-
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_keywords if word in text_lower)
-        negative_count = sum(1 for word in negative_keywords if word in text_lower)
-
-        if positive_count > negative_count:
-            sentiment = "positive"
-            score = min(1.0, positive_count / (positive_count + negative_count + 1))
-        elif negative_count > positive_count:
-            sentiment = "negative"
-            score = min(1.0, negative_count / (positive_count + negative_count + 1))
-        else:
-            sentiment = "neutral"
-            score = 0.5
+        scores = self.current_matcher().score(text)
+        sentiment, score = classify_sentiment(scores["positive_score"], scores["negative_score"])
 
         return {
-            "sentiment": sentiment,
-            "confidence_score": round(score, 2),
-            "positive_indicators": positive_count,
-            "negative_indicators": negative_count
+            "sentiment": str(sentiment),
+            "confidence_score": float(score),
+            "positive_indicators": scores["positive_hits"],
+            "negative_indicators": scores["negative_hits"]
         }
 
+    def analyze_batch(self, texts: list):
+        scores = self.current_matcher().score_batch(texts)
+        positive = scores["positive_score"]
+        negative = scores["negative_score"]
+
+        labels, confidence = classify_sentiment(positive, negative)
+
+        items = [
+            {
+                "index": i,
+                "sentiment": str(labels[i]),
+                "confidence_score": float(confidence[i]),
+                "positive_indicators": int(scores["positive_hits"][i]),
+                "negative_indicators": int(scores["negative_hits"][i])
+            }
+            for i in range(len(texts))
+        ]
+
+        overall, overall_score = classify_sentiment(positive.sum(), negative.sum())
+
+        aggregate = {
+            "sentiment": str(overall),
+            "confidence_score": float(overall_score),
+            "positive_indicators": int(scores["positive_hits"].sum()),
+            "negative_indicators": int(scores["negative_hits"].sum()),
+            "total_items": len(texts),
+            "positive_items": int((labels == "positive").sum()),
+            "negative_items": int((labels == "negative").sum()),
+            "neutral_items": int((labels == "neutral").sum()),
+            "mean_confidence": round(float(confidence.mean()), 2) if len(texts) else 0.0
+        }
+
+        return {"items": items, "aggregate": aggregate}
+
     def execute(self, request: RequestContext, queue: EventQueue):
         queue.push(Event(type="message", message=f"{self.name} received sentiment analysis request"))
 
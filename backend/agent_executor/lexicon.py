@@ -0,0 +1,220 @@
+"""
+Binary sentiment lexicon files, memory-mapped and hot-reloadable.
+
+File layout (little endian):
+    header   magic "TLEX", version u16, max words per term u16, count u32,
+             blob size u32, slot count u32
+    weights  float64[count]
+    offsets  uint32[count + 1]   byte offsets of each term inside the blob
+    slots    uint32[slot count]  open-addressing hash table on crc32 of the
+                                 term; term index + 1, or 0 for empty
+    blob     utf-8 terms, normalized and sorted by their encoded bytes
+
+Matching looks terms up in the slot table and reads weights straight out
+of the mapping, so a worker process holds no term table of its own and
+every process reading the same file shares one copy in the page cache. Writers
+must replace the file atomically (write_lexicon does), never rewrite it
+in place, since readers match against the mapping itself; readers pick
+up the new generation on their next check without restarting.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from agent_executor.sentiment import LexiconMatcher
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TLEX"
+VERSION = 2
+_HEADER = struct.Struct("<4sHHIII")
+
+
+def _slot_count(count: int) -> int:
+    # A power of two at least twice the term count keeps probe chains short.
+    return 1 << max(1, (2 * count - 1).bit_length())
+
+
+def write_lexicon(path: str, lexicon: Dict[str, float]) -> None:
+    """Write a lexicon file atomically (temp file + rename)."""
+    normalized = {}
+    for term, weight in lexicon.items():
+        normalized[LexiconMatcher.normalize(term).encode("utf-8")] = float(weight)
+    terms = sorted(normalized)
+
+    offsets = np.zeros(len(terms) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(t) for t in terms], dtype=np.int64)
+    weights = np.array([normalized[t] for t in terms], dtype="<f8")
+    blob = b"".join(terms)
+    max_words = max((t.count(b" ") + 1 for t in terms), default=1)
+
+    slots = np.zeros(_slot_count(len(terms)), dtype="<u4")
+    mask = len(slots) - 1
+    for i, term in enumerate(terms):
+        at = zlib.crc32(term) & mask
+        while slots[at]:
+            at = (at + 1) & mask
+        slots[at] = i + 1
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, max_words, len(terms), len(blob), len(slots)))
+        f.write(weights.tobytes())
+        f.write(offsets.tobytes())
+        f.write(slots.tobytes())
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class LexiconView:
+    """
+    Read-only view over one generation of a mapped lexicon file.
+
+    Serves as a LexiconMatcher term table: index() probes the mapped slot
+    table and `weights` is the mapped weight array.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.mm) < _HEADER.size:
+            raise ValueError(f"{path} is truncated")
+        magic, version, max_words, count, blob_size, slot_count = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} lexicon file")
+        if slot_count & (slot_count - 1) or slot_count <= count:
+            raise ValueError(f"{path} has a malformed slot table")
+
+        weights_at = _HEADER.size
+        offsets_at = weights_at + 8 * count
+        slots_at = offsets_at + 4 * (count + 1)
+        blob_at = slots_at + 4 * slot_count
+        if blob_at + blob_size > len(self.mm):
+            raise ValueError(f"{path} is truncated")
+
+        self.count = count
+        self.max_words = max(1, max_words)
+        self.weights = np.frombuffer(self.mm, dtype="<f8", count=count, offset=weights_at)
+        self.offsets = np.frombuffer(self.mm, dtype="<u4", count=count + 1, offset=offsets_at)
+        self.slots = np.frombuffer(self.mm, dtype="<u4", count=slot_count, offset=slots_at)
+        self.blob = memoryview(self.mm)[blob_at:blob_at + blob_size]
+        self._mask = slot_count - 1
+
+    def term_bytes(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def index(self, term: str) -> Optional[int]:
+        """Index of a normalized term, probing the mapped hash table"""
+        key = term.encode("utf-8")
+        at = zlib.crc32(key) & self._mask
+        while True:
+            slot = int(self.slots[at])
+            if not slot:
+                return None
+            if self.blob[self.offsets[slot - 1]:self.offsets[slot]] == key:
+                return slot - 1
+            at = (at + 1) & self._mask
+
+    def lookup(self, term: str) -> Optional[float]:
+        i = self.index(LexiconMatcher.normalize(term))
+        return None if i is None else float(self.weights[i])
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        for i in range(self.count):
+            yield self.term_bytes(i).decode("utf-8"), float(self.weights[i])
+
+    def build_matcher(self) -> LexiconMatcher:
+        return LexiconMatcher(table=self)
+
+
+class LexiconStore:
+    """
+    Serves the matcher for the current generation of a lexicon file.
+
+    The file is stat()ed at most every `check_interval` seconds; when it has
+    been replaced the new generation is mapped once, then swapped
+    in as a single reference assignment so in-flight calls keep the old one.
+    """
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._next_check = 0.0
+        self._view: Optional[LexiconView] = None
+        self._matcher: Optional[LexiconMatcher] = None
+        self.reload()
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def reload(self) -> bool:
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return False
+            view = LexiconView(self.path)
+            matcher = view.build_matcher()
+            self._view, self._matcher, self._stamp = view, matcher, stamp
+            return True
+
+    def matcher(self) -> LexiconMatcher:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                if self.reload():
+                    logger.info("Reloaded sentiment lexicon from %s (%d terms)", self.path, self._view.count)
+            except (OSError, ValueError) as e:
+                # Keep serving the last good generation.
+                logger.warning("Lexicon reload failed, keeping current generation: %s", e)
+        return self._matcher
+
+    def lookup(self, term: str) -> Optional[float]:
+        return self._view.lookup(term)
+
+
+_default_store: Optional[LexiconStore] = None
+
+
+def default_lexicon_store() -> Optional[LexiconStore]:
+    """Shared store for SENTIMENT_LEXICON_PATH, or None to use the built-in lexicon."""
+    global _default_store
+    path = os.getenv("SENTIMENT_LEXICON_PATH")
+    if not path:
+        return None
+    if _default_store is None or _default_store.path != path:
+        try:
+            _default_store = LexiconStore(path, float(os.getenv("SENTIMENT_LEXICON_CHECK_INTERVAL", "5")))
+        except (OSError, ValueError) as e:
+            # A bad path must not stop the backend from starting.
+            logger.warning("Cannot load sentiment lexicon %s, using the built-in lexicon: %s", path, e)
+            return None
+    return _default_store
+
+
+if __name__ == "__main__":
+    # python -m agent_executor.lexicon build finance.json finance.tlex
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("usage: python -m agent_executor.lexicon build <lexicon.json> <output.tlex>")
+        sys.exit(1)
+    with open(sys.argv[2], "r") as f:
+        source = json.load(f)
+    write_lexicon(sys.argv[3], source)
+    print(f"Wrote {len(source)} terms to {sys.argv[3]}")
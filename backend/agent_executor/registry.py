@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from openai import AzureOpenAI
+
+from metrics import STAGE_LATENCY
+from tracing import tracer, run_in_context
+
+from agent_executor.cancellation import JobCancelled, current_token
+from agent_executor.context import RequestContext
+from agent_executor.event_queue import EventQueue
+from agent_executor.executor import AgentExecutor, WebScraperExecutor, SummarizerExecutor, SentimentExecutor
+
+
+class AgentRegistry:
+    """
+    Process-wide set of executors, built once at startup.
+
+    Executors share one LLM client (and its connection pool) and the worker
+    pools below, and jobs are dispatched by agent name or task_type through
+    a table instead of constructing a new executor per job.
+    """
+
+    TASK_AGENTS: Dict[str, str] = {
+        "web_scrape": "WebScraperAgent",
+        "summarize": "SummarizerAgent",
+        "sentiment_analysis": "SentimentAgent",
+    }
+    AGENT_TASKS: Dict[str, str] = {agent: task for task, agent in TASK_AGENTS.items()}
+
+    def __init__(self, llm_client: AzureOpenAI, browser_workers: int = 3, compute_workers: int = 4, stats=None):
+        # Optional AgentStatsRecorder fed with every execution's latency and outcome.
+        self.stats = stats
+        self.browser_pool = ThreadPoolExecutor(max_workers=browser_workers, thread_name_prefix="browser")
+        self.compute_pool = ThreadPoolExecutor(max_workers=compute_workers, thread_name_prefix="compute")
+
+        self.agents: Dict[str, AgentExecutor] = {
+            "WebScraperAgent": WebScraperExecutor(
+                name="WebScraperAgent", llm_client=llm_client, pool=self.browser_pool
+            ),
+            "SummarizerAgent": SummarizerExecutor(name="SummarizerAgent"),
+            "SentimentAgent": SentimentExecutor(name="SentimentAgent"),
+        }
+        self.fallback = AgentExecutor(name="GenericAgent")
+
+    def get(self, agent_name: str) -> AgentExecutor:
+        return self.agents[agent_name]
+
+    def resolve(self, agent_name: Optional[str], task_type: Optional[str]) -> AgentExecutor:
+        if agent_name in self.agents:
+            return self.agents[agent_name]
+        if task_type in self.TASK_AGENTS:
+            return self.agents[self.TASK_AGENTS[task_type]]
+        return self.fallback
+
+    async def run(
+        self,
+        agent_name: Optional[str],
+        task_type: Optional[str],
+        request: RequestContext,
+        queue: EventQueue
+    ) -> Tuple[AgentExecutor, Any]:
+        agent = self.resolve(agent_name, task_type)
+        started = time.perf_counter()
+        success = False
+        cancelled = False
+        try:
+            with tracer.span("agent.execute", agent=agent.name, task_type=task_type) as span:
+                if inspect.iscoroutinefunction(agent.execute):
+                    result = await agent.execute(request, queue)
+                else:
+                    # Synchronous executors are CPU-bound; on the loop they
+                    # would stall every request and the deadline watchdog.
+                    result = await self.run_compute(agent.execute, request, queue)
+                success = not (isinstance(result, dict) and "error" in result)
+                span.set(success=success)
+            return agent, result
+        except (asyncio.CancelledError, JobCancelled) as e:
+            # e.g. the losing attempt of a hedged job, or a job past its
+            # deadline; not a measure of the agent.
+            cancelled = True
+            token = current_token()
+            reason = getattr(e, "reason", None) or (token.cancel_reason() if token else None)
+            if reason == "timed_out":
+                request.mark_timed_out()
+            else:
+                request.mark_cancelled()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if not cancelled:
+                STAGE_LATENCY.labels("agent_execute", agent.name).observe(elapsed)
+            if self.stats is not None and agent is not self.fallback and not cancelled:
+                self.stats.record(agent.name, elapsed * 1000, success)
+
+    async def run_compute(self, fn, *args) -> Any:
+        """Run blocking work on the compute pool, in the caller's context (span, cancel token)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.compute_pool, run_in_context(fn, *args))
+
+    def shutdown(self) -> None:
+        self.browser_pool.shutdown(wait=False, cancel_futures=True)
+        self.compute_pool.shutdown(wait=False, cancel_futures=True)
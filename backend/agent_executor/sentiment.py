@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_LEXICON: Dict[str, float] = {
+    "gain": 1.0, "profit": 1.0, "growth": 1.0, "success": 1.0,
+    "increase": 1.0, "up": 1.0, "bullish": 1.0, "surge": 1.0,
+    "loss": -1.0, "decline": -1.0, "fall": -1.0, "drop": -1.0,
+    "crash": -1.0, "down": -1.0, "bearish": -1.0, "plunge": -1.0,
+}
+
+NEGATORS = ("not", "no", "never", "without", "hardly", "barely", "neither", "nor")
+
+# Words, with "n't" contractions kept whole so they read as negators, and clause breaks
+_TOKEN = re.compile(r"(\w+n't|\w+)|[.!?;:]")
+
+
+def tokenize(text: str) -> List[Optional[str]]:
+    """Lowercased words of text, with None for each clause break"""
+    return [match.group(1) for match in _TOKEN.finditer(text.lower())]
+
+
+class TermTable:
+    """
+    In-memory term table: normalized term -> index into `weights`.
+
+    A matcher only needs index(), `weights` and `max_words`, so a table
+    backed by a shared file (agent_executor.lexicon) can stand in for it.
+    """
+
+    def __init__(self, lexicon: Dict[str, float]):
+        self.indexes: Dict[str, int] = {}
+        weights: List[float] = []
+        for term, weight in lexicon.items():
+            key = LexiconMatcher.normalize(term)
+            if key in self.indexes:
+                weights[self.indexes[key]] = float(weight)
+            else:
+                self.indexes[key] = len(weights)
+                weights.append(float(weight))
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.max_words = max((key.count(" ") + 1 for key in self.indexes), default=1)
+
+    def index(self, term: str) -> Optional[int]:
+        return self.indexes.get(term)
+
+
+class LexiconMatcher:
+    """
+    Scores text against a weighted lexicon by token lookup.
+
+    Text is split into words once; at each word the n-grams up to the
+    lexicon's longest term are looked up longest first, so "not bad" wins
+    over "not" and "bad", "up" never matches inside "supply", and the cost
+    per word does not grow with the size of the lexicon. A negator flips
+    the sign of terms that follow it within `negation_window` words,
+    unless a clause break comes first.
+    """
+
+    def __init__(
+        self,
+        lexicon: Optional[Dict[str, float]] = None,
+        negators: Iterable[str] = NEGATORS,
+        negation_window: int = 3,
+        table=None
+    ):
+        self.table = table if table is not None else TermTable(lexicon or {})
+        self.negators = frozenset(negators)
+        self.negation_window = negation_window
+
+    @staticmethod
+    def normalize(term: str) -> str:
+        return " ".join(word for word in tokenize(term) if word)
+
+    def _hits(self, text: str):
+        """Yield (term, term index, negated) for every lexicon hit in text."""
+        tokens = tokenize(text)
+        index, max_words = self.table.index, self.table.max_words
+        negator_at = None
+        i, n = 0, len(tokens)
+        while i < n:
+            word = tokens[i]
+            if word is None:
+                negator_at = None
+                i += 1
+                continue
+            for size in range(min(max_words, n - i), 0, -1):
+                words = tokens[i:i + size]
+                if size > 1 and None in words:
+                    # Terms never span a clause break.
+                    continue
+                term = " ".join(words) if size > 1 else word
+                term_id = index(term)
+                if term_id is not None:
+                    negated = negator_at is not None and i - negator_at - 1 < self.negation_window
+                    yield term, term_id, negated
+                    i += size
+                    break
+            else:
+                if word in self.negators or word.endswith("n't"):
+                    negator_at = i
+                i += 1
+
+    def iter_hits(self, text: str):
+        """Yield (term, negated) for every lexicon hit in text."""
+        for term, _, negated in self._hits(text):
+            yield term, negated
+
+    def iter_matches(self, text: str):
+        """Yield (term, weight) for every lexicon hit, with negation applied."""
+        weights = self.table.weights
+        for term, term_id, negated in self._hits(text):
+            weight = float(weights[term_id])
+            yield term, -weight if negated else weight
+
+    def score(self, text: str) -> Dict[str, float]:
+        positive = negative = 0.0
+        positive_hits = negative_hits = 0
+        for _, weight in self.iter_matches(text):
+            if weight > 0:
+                positive += weight
+                positive_hits += 1
+            elif weight < 0:
+                negative -= weight
+                negative_hits += 1
+        return {
+            "positive_score": positive,
+            "negative_score": negative,
+            "positive_hits": positive_hits,
+            "negative_hits": negative_hits,
+        }
+
+    def score_batch(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Score many texts at once.
+
+        Each text is tokenized exactly once into sparse (document, term, sign)
+        triples, which form the term-document matrix; the weighted lexicon is
+        then applied to the whole batch with NumPy instead of per-item loops.
+        """
+        doc_ids: List[int] = []
+        term_ids: List[int] = []
+        signs: List[float] = []
+        for doc, text in enumerate(texts):
+            for _, term_id, negated in self._hits(text):
+                doc_ids.append(doc)
+                term_ids.append(term_id)
+                signs.append(-1.0 if negated else 1.0)
+
+        n_docs = len(texts)
+        docs = np.asarray(doc_ids, dtype=np.intp)
+        contributions = np.asarray(signs) * self.table.weights[np.asarray(term_ids, dtype=np.intp)]
+        positive = contributions > 0
+        negative = contributions < 0
+
+        return {
+            "positive_score": np.bincount(docs, weights=np.where(positive, contributions, 0.0), minlength=n_docs),
+            "negative_score": np.bincount(docs, weights=np.where(negative, -contributions, 0.0), minlength=n_docs),
+            "positive_hits": np.bincount(docs[positive], minlength=n_docs),
+            "negative_hits": np.bincount(docs[negative], minlength=n_docs),
+        }
+
+
+DEFAULT_MATCHER = LexiconMatcher(DEFAULT_LEXICON)
@@ -0,0 +1,213 @@
+"""
+Live per-agent performance statistics.
+
+Every execution feeds its latency and outcome into an EWMA and streaming
+p50/p95 estimates for that agent, and its outcome into a much slower EWMA
+that is published as the agent's reliability: success_rate follows the
+last few jobs, reliability_score the last few hundred. The figures are written back to the
+agents collection through a write-behind writer, so routing sees how the
+agents actually perform instead of the seed values.
+
+Executors are matched to catalog documents by agent_id (see
+AGENT_CATALOG_IDS), and each flush bumps the catalog version stamp so the
+db service's cached AgentCatalog reloads the new figures.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from persistence import WriteBehindWriter
+
+logger = logging.getLogger(__name__)
+
+# Executor name -> agent_id of its document in the agents collection
+DEFAULT_CATALOG_IDS: Dict[str, str] = {"WebScraperAgent": "A1", "SummarizerAgent": "A2"}
+
+# Version stamp document read by db/agent_catalog.py (CATALOG_KEY there)
+CATALOG_KEY = "agents"
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate in O(1) memory (the P-square algorithm of
+    Jain & Chlamtac): five markers track the min, max, the target quantile
+    and the points halfway to it, adjusted with a parabolic fit per sample.
+    """
+
+    def __init__(self, q: float):
+        self.q = q
+        self.heights: List[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x: float) -> None:
+        h = self.heights
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - self.positions[i]
+            if (d >= 1 and self.positions[i + 1] - self.positions[i] > 1) or \
+               (d <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + step * (h[i + step] - h[i]) / (self.positions[i + step] - self.positions[i])
+                h[i] = candidate
+                self.positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        h, n = self.heights, self.positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        h = self.heights
+        if not h:
+            return None
+        if len(h) < 5:
+            return h[min(len(h) - 1, int(round(self.q * (len(h) - 1))))]
+        return h[2]
+
+
+class AgentStats:
+
+    def __init__(self, alpha: float = 0.2, reliability_alpha: float = 0.01):
+        self.alpha = alpha
+        self.reliability_alpha = reliability_alpha
+        self.jobs = 0
+        self.successes = 0
+        self.ewma_latency_ms: Optional[float] = None
+        self.ewma_success: Optional[float] = None
+        self.reliability: Optional[float] = None
+        self.p50 = P2Quantile(0.5)
+        self.p95 = P2Quantile(0.95)
+
+    def record(self, latency_ms: float, success: bool) -> None:
+        self.jobs += 1
+        self.successes += int(success)
+        outcome = 1.0 if success else 0.0
+        if self.ewma_latency_ms is None:
+            self.ewma_latency_ms = latency_ms
+            self.ewma_success = outcome
+        else:
+            self.ewma_latency_ms += self.alpha * (latency_ms - self.ewma_latency_ms)
+            self.ewma_success += self.alpha * (outcome - self.ewma_success)
+        # Plain average of the outcomes so far until there are 1/alpha of them,
+        # so the first few jobs don't swing the long-run figure.
+        if self.reliability is None:
+            self.reliability = outcome
+        else:
+            self.reliability += max(self.reliability_alpha, 1 / self.jobs) * (outcome - self.reliability)
+        self.p50.add(latency_ms)
+        self.p95.add(latency_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "jobs": self.jobs,
+            "successes": self.successes,
+            "ewma_latency_ms": self.ewma_latency_ms,
+            "success_rate": None if self.ewma_success is None else self.ewma_success * 100,
+            "reliability": self.reliability,
+            "p50_latency_ms": self.p50.value(),
+            "p95_latency_ms": self.p95.value(),
+        }
+
+
+class AgentStatsRecorder:
+    """
+    Keeps AgentStats per agent name and mirrors them into the agents
+    collection. Counters are $inc'd so replicas add up; the rolling figures
+    are $set from whichever replica flushed last.
+    """
+
+    def __init__(
+        self,
+        agents_collection,
+        meta_collection=None,
+        flush_interval: float = 5.0,
+        alpha: float = 0.2,
+        reliability_alpha: float = 0.01,
+        catalog_ids: Optional[Dict[str, str]] = None
+    ):
+        self.alpha = alpha
+        self.reliability_alpha = reliability_alpha
+        self.stats: Dict[str, AgentStats] = {}
+        self.meta = meta_collection
+        self.catalog_ids = catalog_ids if catalog_ids is not None else {
+            **DEFAULT_CATALOG_IDS, **json.loads(os.getenv("AGENT_CATALOG_IDS", "{}"))
+        }
+        self._uncatalogued = set()
+        self.writer = WriteBehindWriter(
+            agents_collection, flush_interval=flush_interval,
+            on_flush=self._bump_catalog_version if meta_collection is not None else None
+        )
+
+    async def _bump_catalog_version(self) -> None:
+        await self.meta.update_one({"_id": CATALOG_KEY}, {"$inc": {"version": 1}}, upsert=True)
+
+    def get(self, agent_name: str) -> Optional[AgentStats]:
+        return self.stats.get(agent_name)
+
+    def p95_ms(self, agent_name: str) -> Optional[float]:
+        stats = self.stats.get(agent_name)
+        return stats.p95.value() if stats else None
+
+    def record(self, agent_name: str, latency_ms: float, success: bool) -> None:
+        stats = self.stats.setdefault(agent_name, AgentStats(self.alpha, self.reliability_alpha))
+        stats.record(latency_ms, success)
+        snapshot = stats.snapshot()
+
+        agent_id = self.catalog_ids.get(agent_name)
+        if agent_id is None:
+            if agent_name not in self._uncatalogued:
+                self._uncatalogued.add(agent_name)
+                logger.warning("%s has no catalog agent_id (AGENT_CATALOG_IDS); its stats stay local", agent_name)
+            return
+
+        self.writer.update({"agent_id": agent_id}, {
+            "$set": {
+                "average_latency_ms": int(round(snapshot["ewma_latency_ms"])),
+                "success_rate": round(snapshot["success_rate"], 2),
+                "reliability_score": round(snapshot["reliability"], 4),
+                "latency_p50_ms": int(round(snapshot["p50_latency_ms"])),
+                "latency_p95_ms": int(round(snapshot["p95_latency_ms"])),
+                "last_updated": datetime.now(timezone.utc)
+            },
+            "$inc": {
+                "total_jobs_completed": int(success),
+                "total_jobs_failed": int(not success)
+            }
+        })
+
+    def start(self) -> None:
+        self.writer.start()
+
+    async def close(self) -> None:
+        await self.writer.close()
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
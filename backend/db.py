@@ -1,7 +1,40 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 client = AsyncIOMotorClient(MONGO_URI)
-db = client["tundra_db"]
+db = client[os.getenv("DB_NAME", "tundra_db")]
 jobs_collection = db["jobs"]
+agents_collection = db["agents"]
+rate_limits_collection = db["rate_limits"]
+api_keys_collection = db["api_keys"]
+spend_rollups_collection = db["spend_rollups"]
+events_collection = db["job_events"]
+catalog_meta_collection = db["catalog_meta"]
+
+
+async def create_index(collection, keys, name, **options):
+    # Renaming indexes left by earlier releases is db/indexes.py's job; if one
+    # is in the way, say so rather than failing startup.
+    try:
+        await collection.create_index(keys, name=name, **options)
+    except OperationFailure as e:
+        logger.warning("Could not create index %s on %s (run db/indexes.py to reconcile): %s",
+                       name, collection.name, e)
+
+
+# Same names and options as db/indexes.py, which owns the full index set.
+async def ensure_indexes():
+    await create_index(
+        jobs_collection,
+        [("job_id", 1)],
+        name="job_id",
+        unique=True,
+        partialFilterExpression={"job_id": {"$type": "string"}}
+    )
+    await create_index(events_collection, [("job_id", 1), ("seq", 1)], name="job_id_seq", unique=True)
+    await create_index(rate_limits_collection, [("expires_at", 1)], name="expires_at_ttl", expireAfterSeconds=0)
@@ -0,0 +1,167 @@
+"""
+Hedged execution for long-tail jobs.
+
+If an attempt is still running after the agent's observed p95 latency, a
+second attempt of the same task is started (for the scraper that means a
+separate browser instance). Whichever attempt succeeds first wins and the
+other is cancelled. A token budget caps hedges to a fraction of traffic.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import nullcontext
+from typing import Any, Optional, Tuple
+
+from agent_executor.cancellation import CancelToken, bind, current_token
+from agent_executor.context import RequestContext
+from agent_executor.event_queue import EventQueue, Event
+from metrics import HEDGES
+from singleflight import bypass
+from tracing import current_span
+
+
+class HedgeBudget:
+    """Every primary attempt earns `ratio` hedge tokens, up to `burst`."""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.hedges = 0
+        self.denied = 0
+
+    def on_request(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.hedges += 1
+            return True
+        self.denied += 1
+        return False
+
+
+def _succeeded(task: asyncio.Task) -> bool:
+    if task.cancelled() or task.exception() is not None:
+        return False
+    _, result = task.result()
+    return not (isinstance(result, dict) and "error" in result)
+
+
+class HedgedRunner:
+
+    def __init__(
+        self,
+        registry,
+        stats,
+        budget: Optional[HedgeBudget] = None,
+        enabled: Optional[bool] = None,
+        default_delay_ms: float = 10000,
+        min_delay_ms: float = 500,
+        min_samples: int = 20
+    ):
+        self.registry = registry
+        self.stats = stats
+        self.budget = budget or HedgeBudget(
+            ratio=float(os.getenv("HEDGE_RATIO", "0.1")),
+            burst=float(os.getenv("HEDGE_BURST", "5"))
+        )
+        # Read at construction, not import, so values loaded from .env apply
+        if enabled is None:
+            enabled = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+        self.enabled = enabled
+        self.default_delay_ms = default_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+
+    def hedge_delay_ms(self, agent_name: str) -> float:
+        stats = self.stats.get(agent_name)
+        if stats is None or stats.jobs < self.min_samples:
+            return self.default_delay_ms
+        return max(self.min_delay_ms, stats.p95.value())
+
+    async def run(
+        self,
+        agent_name: Optional[str],
+        task_type: Optional[str],
+        request: RequestContext,
+        queue: EventQueue,
+        hedge: Optional[bool] = None
+    ) -> Tuple[Any, Any]:
+        if not (self.enabled if hedge is None else hedge):
+            return await self.registry.run(agent_name, task_type, request, queue)
+
+        self.budget.on_request()
+        agent = self.registry.resolve(agent_name, task_type)
+        delay_ms = self.hedge_delay_ms(agent.name)
+
+        # Each attempt gets its own cancel token under the job's, so the loser's
+        # browser thread stops at its next check instead of running on.
+        job_token = current_token() or CancelToken()
+        tokens = {}
+
+        def attempt(req: RequestContext, q: EventQueue, hedged: bool = False) -> asyncio.Task:
+            token = job_token.child()
+            # A hedged attempt must not coalesce with the primary's page fetch.
+            with bind(token), (bypass() if hedged else nullcontext()):
+                task = asyncio.create_task(self.registry.run(agent_name, task_type, req, q))
+            tokens[task] = token
+            return task
+
+        primary = attempt(request, queue)
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay_ms / 1000)
+        except asyncio.CancelledError:
+            # asyncio.wait leaves the attempt running; the job is gone, stop it too.
+            primary.cancel()
+            raise
+        if done or not self.budget.try_acquire():
+            return await primary
+
+        HEDGES.labels(agent.name).inc()
+        if current_span():
+            current_span().set(hedged=True)
+        queue.push(Event(
+            type="status_update",
+            message=f"{agent.name} exceeded p95 latency ({delay_ms:.0f}ms), starting hedged attempt"
+        ))
+        hedge_queue = EventQueue()
+        hedge_request = request.model_copy(deep=True)
+        secondary = attempt(hedge_request, hedge_queue, hedged=True)
+
+        pending = {primary, secondary}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if _succeeded(t)), None)
+        finally:
+            for task in pending:
+                tokens[task].cancel()
+                task.cancel()
+
+        if winner is None:
+            # Both attempts failed; surface the primary's outcome.
+            return primary.result()
+
+        if winner is secondary:
+            for event in hedge_queue.list_events():
+                queue.push(event)
+            request.state = hedge_request.state
+        if current_span():
+            current_span().set(hedge_winner="secondary" if winner is secondary else "primary")
+        queue.push(Event(
+            type="status_update",
+            message=f"{'Hedged' if winner is secondary else 'Primary'} attempt finished first"
+        ))
+        return winner.result()
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hedges": self.budget.hedges,
+            "denied": self.budget.denied,
+            "tokens": round(self.budget.tokens, 2)
+        }
@@ -1,21 +1,52 @@
-from fastapi import FastAPI
+from dotenv import load_dotenv
+
+# Before anything else is imported: several modules read their settings at
+# import time (the tracer, the Mongo client, deadline defaults).
+load_dotenv()
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from agent_executor.context import RequestContext
-from agent_executor.event_queue import EventQueue
-from agent_executor.executor import AgentExecutor, WebScraperExecutor, SummarizerExecutor, SentimentExecutor
+from agent_executor.cancellation import (
+    CancelToken, JobCancelled, bind, check_cancelled, current_token, deadline_for, remaining
+)
+from agent_executor.event_queue import EventQueue, Event
+from agent_executor.registry import AgentRegistry
 from fastapi.middleware.cors import CORSMiddleware
-from models import Job, JobResponse
-from db import jobs_collection
-from dotenv import load_dotenv
-from openai import AzureOpenAI
+from models import Job, JobResponse, BatchSentimentRequest
+from db import (
+    jobs_collection, events_collection, agents_collection, rate_limits_collection, spend_rollups_collection,
+    api_keys_collection, catalog_meta_collection, ensure_indexes
+)
+from persistence import WriteBehindWriter
+from agent_stats import AgentStatsRecorder
+from hedging import HedgedRunner
+from rate_limit import build_rate_limiter, rate_limited
+from spending import SpendRollups
+from admission import AdmissionController
+from scheduler import FairScheduler
+from singleflight import SingleFlight, JobCoalescer, normalize_text, normalize_url
+from metrics import (
+    STAGE_LATENCY, JOB_LATENCY, JOBS, JOBS_SUBMITTED, JOBS_IN_FLIGHT, CONTENT_TYPE_LATEST, bind_gauges, render
+)
+from tracing import tracer, configure_logging
+import resilience
+from openai import AzureOpenAI, NOT_GIVEN
 from datetime import datetime, timezone
 from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
 import asyncio
+import hashlib
+import logging
+import math
 import sys
+import time
 import uuid
 import json
 import os
 
-load_dotenv()
+configure_logging()
+logger = logging.getLogger("tundra")
 
 # On Windows, Playwright needs a Proactor event loop to spawn subprocesses.
 # Uvicorn/Starlette may default to the Selector policy on Windows which breaks this.
@@ -23,14 +54,28 @@ load_dotenv()
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-job_queue = asyncio.Queue()
+admission = AdmissionController()
+job_queue = FairScheduler(maxsize=admission.max_depth)
 
 client = AzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_version="2024-05-01-preview"
+    api_version="2024-05-01-preview",
+    # Retries are handled, and counted against the circuit breaker, by resilience.call
+    max_retries=0
 )
 
+agent_stats = AgentStatsRecorder(agents_collection, catalog_meta_collection)
+registry = AgentRegistry(llm_client=client, stats=agent_stats)
+hedger = HedgedRunner(registry, agent_stats)
+limiter = build_rate_limiter(rate_limits_collection, api_keys_collection)
+spend_rollups = SpendRollups(spend_rollups_collection)
+job_writer = WriteBehindWriter(jobs_collection, key_field="job_id")
+event_writer = WriteBehindWriter(events_collection, flush_interval=0.1)
+# Identical requests that overlap in time are run once and share the result
+execute_flight = SingleFlight("execute")
+job_coalescer = JobCoalescer()
+
 def tundra_agent(user_request: str):
     system_prompt = (
         "You are TundraAgent, a requester agent on the Tundra A2A marketplace. "
@@ -55,15 +100,18 @@ def tundra_agent(user_request: str):
         "The WebScraperAgent uses browser automation and AI to extract data from JavaScript-rendered pages."
     )
 
-    response = client.chat.completions.create(
-        model=os.getenv("AZURE_DEPLOYMENT_NAME"),
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_request}
-        ],
-        temperature=0,
-        response_format={"type": "json_object"}
-    )
+    check_cancelled()
+    with tracer.span("routing", agent="TundraAgent"), STAGE_LATENCY.labels("routing_llm", "TundraAgent").time():
+        response = resilience.call("azure_openai", lambda: client.chat.completions.create(
+            model=os.getenv("AZURE_DEPLOYMENT_NAME"),
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_request}
+            ],
+            temperature=0,
+            response_format={"type": "json_object"},
+            timeout=remaining(NOT_GIVEN)
+        ))
 
     content = response.choices[0].message.content
     return json.loads(content)
@@ -71,8 +119,22 @@ def tundra_agent(user_request: str):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    bind_gauges(
+        job_queue, registry, [job_writer, event_writer, agent_stats.writer, spend_rollups.writer],
+        lambda: admission.estimated_wait(job_queue.qsize() + len(running_jobs))
+    )
+    job_writer.start()
+    event_writer.start()
+    agent_stats.start()
+    spend_rollups.start()
     asyncio.create_task(executor())
     yield
+    await spend_rollups.close()
+    await agent_stats.close()
+    await event_writer.close()
+    await job_writer.close()
+    registry.shutdown()
 
 app = FastAPI(title="TUNDRA Requester Agent", lifespan=lifespan)
 
@@ -84,6 +146,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(resilience.CircuitOpen)
+async def circuit_open(request: Request, exc: resilience.CircuitOpen):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
 @app.get("/")
 async def root():
     return {"message": "TUNDRA Requester Agent running"}
@@ -91,101 +161,357 @@ async def root():
     return {"message": "TUNDRA Requester Agent running"}
 
 @app.get("/health")
-async def health_check():
-    return {"status": "ok"}
+async def health_check(response: Response):
+    queue_status = admission.status(job_queue.qsize(), len(running_jobs))
+    # Load balancers take the 503 as a cue to route new jobs elsewhere.
+    if queue_status["saturated"]:
+        response.status_code = 503
+    return {
+        "status": "saturated" if queue_status["saturated"] else "ok",
+        "queue": {**queue_status, **job_queue.metrics()},
+        "persistence": {
+            "jobs": job_writer.metrics(),
+            "events": event_writer.metrics(),
+            "agent_stats": agent_stats.writer.metrics(),
+            "spend_rollups": spend_rollups.writer.metrics()
+        },
+        "agents": agent_stats.metrics(),
+        "hedging": hedger.metrics(),
+        "rate_limited_requests": limiter.limited,
+        "tracing": tracer.metrics(),
+        "circuits": resilience.metrics(),
+        "coalescing": {
+            "execute": execute_flight.metrics(),
+            "jobs": job_coalescer.metrics()
+        }
+    }
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=render(), media_type=CONTENT_TYPE_LATEST)
+
+def job_key(job: Dict[str, Any]) -> Tuple:
+    # The task type is only known after routing, so the task text stands in for it and the goal.
+    # Jobs only coalesce with ones run on the same terms: a follower shares its
+    # leader's deadline, budget and hedging. Leaders are already running, so
+    # priority, which only orders the queue, doesn't matter.
+    return (
+        "job", normalize_text(job["task"]), normalize_url(job.get("url")),
+        job.get("deadline_s"), job.get("budget"), job.get("hedge")
+    )
 
 @app.post("/submit_job")
-async def submit_job(job: Job, user_id: str = "test_user"):
+async def submit_job(
+    job: Job,
+    user_id: str = "test_user",
+    caller: str = Depends(rate_limited(limiter)),
+    x_correlation_id: Optional[str] = Header(None)
+):
+    # A job's own priority wins over its caller's tier default.
+    job.priority = job.priority or limiter.policy_for(caller).priority
+
     job.job_id = str(uuid.uuid4())
+    # Traces and logs for the job are keyed on this; callers may pass their own.
+    job.correlation_id = x_correlation_id or job.job_id
     job.user_id = user_id
     job.created_at = datetime.now(timezone.utc)
     job.status = "pending"
 
-    await jobs_collection.insert_one(job.model_dump())
-    await job_queue.put(job.model_dump())
+    admission.admit_writes([job_writer, event_writer], job.priority)
+    await limiter.acquire_slot(caller)
+    queued = {**job.model_dump(), "rate_limit_key": caller}
+    leader_id = job_coalescer.attach(job_key(queued), queued)
+    if leader_id is not None:
+        # An identical job is already running: this one takes its result
+        # instead of a place in the queue (see settle_followers).
+        job_writer.insert({**job.model_dump(), "coalesced_with": leader_id})
+        JOBS_SUBMITTED.inc()
+        return JobResponse(
+            job_id=job.job_id,
+            status="queued",
+            message=f"Identical to job {leader_id}; sharing its result"
+        )
+
+    try:
+        estimated_wait = admission.admit(job_queue.qsize(), len(running_jobs), job.priority)
+    except HTTPException:
+        await limiter.release_slot(caller)
+        raise
+
+    job_writer.insert(job.model_dump())
+    JOBS_SUBMITTED.inc()
+    # The in-flight slot is released by executor() when the job finishes
+    # Admitted jobs always fit: nothing has awaited since admit() checked the depth.
+    job_queue.put_nowait(queued)
+
+    return JobResponse(
+        job_id=job.job_id,
+        status="queued",
+        message="Job added to queue",
+        estimated_wait_s=round(estimated_wait, 1)
+    )
 
-    return JobResponse(job_id=job.job_id, status="queued", message="Job added to queue")
+
+# The job executor() is running, job_id -> (task, cancel token, caller key)
+running_jobs: Dict[str, Tuple[asyncio.Task, CancelToken, str]] = {}
 
 
 async def executor():
     while True:
         job = await job_queue.get()
         job_id = job["job_id"]
-        print(f"Processing job: {job_id}")
-
-        decision = tundra_agent(job["task"])
-        print(f"TundraAgent decision: {decision}")
-
-        queue = EventQueue()
-        agent_name = decision.get("agent", "WebScraperAgent")
-        task_type = decision.get("task_type", "web_scrape")
-        payload = decision.get("payload", {})
-
-        if "url" in job and job["url"]:
-            payload["url"] = job["url"]
-
-        req = RequestContext(task_type=task_type, payload=payload)
-
-        if agent_name == "WebScraperAgent" or task_type == "web_scrape":
-            agent = WebScraperExecutor(name="WebScraperAgent")
-            result = await agent.execute(req, queue)
-        elif agent_name == "SummarizerAgent" or task_type == "summarize":
-            agent = SummarizerExecutor(name="SummarizerAgent")
-            result = agent.execute(req, queue)
-        elif agent_name == "SentimentAgent" or task_type == "sentiment_analysis":
-            agent = SentimentExecutor(name="SentimentAgent")
-            result = agent.execute(req, queue)
-        else:
-            agent = AgentExecutor(name="GenericAgent")
-            result = agent.execute(req, queue)
-
-        events = [e.model_dump() for e in queue.list_events()]
-
-        await jobs_collection.update_one(
-            {"job_id": job_id},
-            {"$set": {
-                "status": "completed",
-                "agent_used": agent_name,
-                "task_type": task_type,
-                "reasoning": decision.get("reasoning", ""),
-                "output": result,
-                "events": events,
-                "finished_at": datetime.now(timezone.utc)
-            }}
-        )
-
-        print(f"Job {job_id} finalized")
-        job_queue.task_done()
+        leader_id = job_coalescer.start(job_key(job), job)
+        if leader_id is not None:
+            # An identical job started while this one was queued; share its run.
+            job_writer.update({"job_id": job_id}, {"$set": {"coalesced_with": leader_id}})
+            continue
+
+        # Until routing picks a task type only a per-job deadline or the default applies.
+        token = CancelToken(deadline_for(None, job.get("deadline_s")))
+        with bind(token):
+            task = asyncio.create_task(process_job(job, token))
+        running_jobs[job_id] = (task, token, job.get("rate_limit_key"))
+        try:
+            await watch_deadline(task, token)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error("Job %s could not be finalized", job_id, exc_info=task.exception())
+        finally:
+            running_jobs.pop(job_id, None)
+
+
+async def watch_deadline(task: asyncio.Task, token: CancelToken) -> None:
+    """Wait for a job task, cancelling it once its token's (movable) deadline passes"""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    # Woken when routing moves the deadline, which may bring it closer than the current wait.
+    unsubscribe = token.subscribe(lambda: loop.call_soon_threadsafe(changed.set))
+    try:
+        while not task.done():
+            changed.clear()
+            wakeup = asyncio.ensure_future(changed.wait())
+            try:
+                await asyncio.wait({task, wakeup}, timeout=token.remaining(), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                wakeup.cancel()
+            if not task.done() and token.cancelled:
+                task.cancel()
+                await asyncio.wait({task})
+    finally:
+        unsubscribe()
+
+
+def agent_label(agent_name: Optional[str], task_type: Optional[str]) -> str:
+    """Metric label for a job's agent: a registered agent's name, never the LLM's free text"""
+    if agent_name is None and task_type is None:
+        return "none"
+    return registry.resolve(agent_name, task_type).name
+
+
+async def process_job(job: dict, token: CancelToken):
+    job_id = job["job_id"]
+    started = time.perf_counter()
+    final = None
+    JOBS_IN_FLIGHT.inc()
+    try:
+        with tracer.span("job", trace_id=job.get("correlation_id") or job_id, job_id=job_id, user_id=job.get("user_id")) as root:
+            logger.info("Processing job %s", job_id)
+            job_writer.update({"job_id": job_id}, {"$set": {
+                "status": "in_progress",
+                "started_at": datetime.now(timezone.utc)
+            }})
+
+            queue = EventQueue(job_id=job_id, sink=event_writer.insert)
+            decision, agent_name, task_type = {}, None, None
+            status = "completed"
+            try:
+                decision = await asyncio.to_thread(tundra_agent, job["task"])
+                logger.info("TundraAgent decision for %s: %s", job_id, decision)
+
+                agent_name = decision.get("agent", "WebScraperAgent")
+                task_type = decision.get("task_type", "web_scrape")
+                payload = decision.get("payload", {})
+                root.set(agent=agent_name, task_type=task_type)
+                if not job.get("deadline_s"):
+                    token.set_timeout(deadline_for(task_type))
+
+                if "url" in job and job["url"]:
+                    payload["url"] = job["url"]
+
+                req = RequestContext(
+                    task_type=task_type,
+                    payload=payload,
+                    parent_job_id=job_id,
+                    correlation_id=root.trace_id
+                )
+
+                _, result = await hedger.run(agent_name, task_type, req, queue, hedge=job.get("hedge"))
+            except (asyncio.CancelledError, JobCancelled):
+                if not token.cancelled:
+                    raise
+                status = token.cancel_reason()
+                result = {"error": f"Job {status.replace('_', ' ')}"}
+                root.set(outcome=status)
+                queue.push(Event(type="error", message=f"Job {status.replace('_', ' ')} after {time.perf_counter() - started:.1f}s"))
+                logger.warning("Job %s %s", job_id, status)
+            except Exception as e:
+                # A failed job must never take the worker loop down with it.
+                status = "failed"
+                result = {"error": f"{type(e).__name__}: {e}"}
+                root.record_error(e)
+                queue.push(Event(type="error", message=f"Job failed: {result['error']}"))
+                logger.exception("Job %s failed", job_id)
+            finished_at = datetime.now(timezone.utc)
+
+            with tracer.span("persist", agent=agent_name, task_type=task_type):
+                final = {
+                    "status": status,
+                    "agent_used": agent_name,
+                    "task_type": task_type,
+                    "reasoning": decision.get("reasoning", ""),
+                    "output": result,
+                    "event_count": len(queue.list_events()),
+                    "finished_at": finished_at
+                }
+                job_writer.update({"job_id": job_id}, {"$set": final})
+                spend_rollups.record(job.get("user_id"), job.get("budget"), status, finished_at)
+            JOBS.labels(agent_label(agent_name, task_type), status).inc()
+            JOB_LATENCY.labels(agent_label(agent_name, task_type), status).observe(time.perf_counter() - started)
+            logger.info("Job %s finalized", job_id)
+    finally:
+        JOBS_IN_FLIGHT.dec()
+        admission.record_service_time(time.perf_counter() - started)
+        if job.get("rate_limit_key"):
+            await limiter.release_slot(job["rate_limit_key"])
+        await settle_followers(job_id, final)
+
+
+async def settle_followers(leader_id: str, final: Optional[Dict[str, Any]]) -> None:
+    """
+    Finish the jobs coalesced onto a leader. They share its outcome unless it
+    was cancelled or never got one, in which case each is queued again in its
+    own caller's flow, and the first of them to start leads the rest.
+    """
+    _, followers = job_coalescer.release(leader_id)
+    if final is None or final["status"] == "cancelled":
+        for follower in followers:
+            job_writer.update({"job_id": follower["job_id"]}, {"$set": {"coalesced_with": None}})
+            try:
+                job_queue.put_nowait(follower)
+            except asyncio.QueueFull:
+                await finalize_follower(follower, {
+                    "status": "failed",
+                    "output": {"error": "Job queue is full"},
+                    "finished_at": datetime.now(timezone.utc)
+                }, None)
+        return
+
+    for follower in followers:
+        await finalize_follower(follower, final, leader_id)
+
+
+async def finalize_follower(job: Dict[str, Any], final: Dict[str, Any], leader_id: Optional[str]) -> None:
+    job_writer.update({"job_id": job["job_id"]}, {"$set": {**final, "coalesced_with": leader_id}})
+    spend_rollups.record(job.get("user_id"), job.get("budget"), final["status"], final["finished_at"])
+    JOBS.labels(agent_label(final.get("agent_used"), final.get("task_type")), final["status"]).inc()
+    await limiter.release_slot(job["rate_limit_key"])
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, caller: str = Depends(rate_limited(limiter))):
+    if job_id in running_jobs:
+        task, token, owner = running_jobs[job_id]
+        if owner != caller:
+            raise HTTPException(status_code=403, detail="Job belongs to another caller")
+        # The token stops browser threads at their next check; task.cancel()
+        # interrupts whatever the job is awaiting.
+        token.cancel("cancelled")
+        task.cancel()
+        return {"job_id": job_id, "status": "cancelling"}
+
+    queued = job_queue.get_job(job_id)
+    if queued is not None:
+        if queued.get("rate_limit_key") != caller:
+            raise HTTPException(status_code=403, detail="Job belongs to another caller")
+        job_queue.remove(job_id)
+    else:
+        queued = job_coalescer.follower(job_id)
+        if queued is None:
+            raise HTTPException(status_code=404, detail="Job is not queued or running")
+        if queued.get("rate_limit_key") != caller:
+            raise HTTPException(status_code=403, detail="Job belongs to another caller")
+        job_coalescer.detach(job_id)
+
+    await limiter.release_slot(caller)
+    job_writer.update({"job_id": job_id}, {"$set": {
+        "status": "cancelled",
+        "finished_at": datetime.now(timezone.utc)
+    }})
+    # A cancelled leader hands its followers on rather than cancelling them too.
+    await settle_followers(job_id, None)
+    return {"job_id": job_id, "status": "cancelled"}
 
 @app.post("/execute")
-async def tundra_execute(request: RequestContext):
+async def tundra_execute(request: RequestContext, caller: str = Depends(rate_limited(limiter))):
+    await limiter.acquire_slot(caller)
+    deadline_s = deadline_for(request.task_type, request.deadline_s)
+    try:
+        # Each caller gives up at its own deadline; the shared execution runs
+        # until the most patient caller still waiting on it gives up.
+        with bind(CancelToken(deadline_s)) as token:
+            try:
+                return await asyncio.wait_for(
+                    execute_flight.do(execute_key(request), lambda: run_execute(request)),
+                    token.remaining()
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail=f"Request exceeded its {deadline_s:.0f}s deadline")
+    finally:
+        await limiter.release_slot(caller)
+
+def execute_key(request: RequestContext) -> Tuple:
+    payload = {k: v for k, v in request.payload.items() if k != "url"}
+    # The rest of the payload (e.g. the text to summarize) must match too, not just url and goal.
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return (
+        "execute", request.task_type, normalize_url(request.payload.get("url")),
+        normalize_text(request.goal), digest
+    )
 
+async def run_execute(request: RequestContext):
+    correlation_id = request.correlation_id or str(request.request_id)
+    # Under the single-flight's token: its deadline stretches for every caller
+    # that joins, and it is cancelled once none of them is left waiting.
+    shared = current_token() or CancelToken(deadline_for(request.task_type, request.deadline_s))
+    with tracer.span("execute", trace_id=correlation_id, task_type=request.task_type) as root, \
+            bind(shared.child()):
+        try:
+            return await _run_execute(request, root.trace_id)
+        except JobCancelled:
+            raise HTTPException(status_code=504, detail="Request exceeded its deadline")
+
+async def _run_execute(request: RequestContext, correlation_id: str):
     user_request = f"Goal: {request.goal}. Task type: {request.task_type}. Payload: {request.payload}"
-    decision = tundra_agent(user_request)
+    decision = await asyncio.to_thread(tundra_agent, user_request)
 
     queue = EventQueue()
     agent_name = decision.get("agent", "WebScraperAgent")
     task_type = decision.get("task_type", request.task_type)
     payload = {**request.payload, **decision.get("payload", {})}
 
-    updated_request = RequestContext(task_type=task_type, payload=payload, goal=request.goal)
-
-    if agent_name == "WebScraperAgent" or task_type == "web_scrape":
-        agent = WebScraperExecutor(name="WebScraperAgent")
-        result = await agent.execute(updated_request, queue)
-    elif agent_name == "SummarizerAgent" or task_type == "summarize":
-        agent = SummarizerExecutor(name="SummarizerAgent")
-        result = agent.execute(updated_request, queue)
-    elif agent_name == "SentimentAgent" or task_type == "sentiment_analysis":
-        agent = SentimentExecutor(name="SentimentAgent")
-        result = agent.execute(updated_request, queue)
-    else:
-        agent = AgentExecutor(name="GenericAgent")
-        result = agent.execute(updated_request, queue)
+    updated_request = RequestContext(
+        task_type=task_type,
+        payload=payload,
+        goal=request.goal,
+        parent_job_id=request.parent_job_id,
+        correlation_id=correlation_id
+    )
+
+    _, result = await hedger.run(agent_name, task_type, updated_request, queue, hedge=payload.get("hedge"))
 
     events = [event.model_dump() for event in queue.list_events()]
 
     return {
+        "correlation_id": correlation_id,
         "tundra_agent_decision": decision,
         "selected_agent": agent_name,
         "task_type": task_type,
@@ -193,57 +519,62 @@ async def tundra_execute(request: RequestContext):
         "events": events
     }
 
-@app.post("/orchestrate")
+@app.post("/sentiment/batch", dependencies=[Depends(rate_limited(limiter))])
+def batch_sentiment(request: BatchSentimentRequest):
+    sentiment_agent = registry.get("SentimentAgent")
+    result = sentiment_agent.analyze_batch(request.texts)
+    return {
+        **result,
+        "analyzed_at": datetime.now(timezone.utc).isoformat()
+    }
+
+@app.post("/orchestrate", dependencies=[Depends(rate_limited(limiter))])
 async def multi_agent_orchestration(user_query: str):
-    decision = tundra_agent(user_query)
+    deadline_s = deadline_for(None)
+    with bind(CancelToken(deadline_s)) as token:
+        try:
+            return await asyncio.wait_for(_orchestrate(user_query), token.remaining())
+        except (asyncio.TimeoutError, JobCancelled):
+            token.cancel("timed_out")
+            raise HTTPException(status_code=504, detail=f"Request exceeded its {deadline_s:.0f}s deadline")
+
+# Agent name -> (key of its result in final_result, log entry)
+ORCHESTRATION_STEPS = {
+    "WebScraperAgent": ("scrape_data", "Scraped web data"),
+    "SummarizerAgent": ("summary", "Summarized data"),
+    "SentimentAgent": ("sentiment_analysis", "Analyzed sentiment"),
+}
+
+async def _orchestrate(user_query: str):
+    # In a thread: the routing LLM call blocks, including any retry backoff.
+    decision = await asyncio.to_thread(tundra_agent, user_query)
 
     orchestration_log = []
     final_result = {}
 
     queue = EventQueue()
-    agent_name = decision.get("agent", "WebScraperAgent")
-    task_type = decision.get("task_type", "web_scrape")
-    payload = decision.get("payload", {})
-
-    if agent_name == "WebScraperAgent" or task_type == "web_scrape":
-        scraper = WebScraperExecutor(name="WebScraperAgent")
-        scrape_request = RequestContext(task_type="web_scrape", payload=payload, goal=user_query)
-        scrape_result = await scraper.execute(scrape_request, queue)
-
-        orchestration_log.append({
-            "step": 1,
-            "agent": "WebScraperAgent",
-            "action": "Scraped web data",
-            "result": scrape_result
-        })
-
-        if "news" in scrape_result:
-            news_text = " ".join([item["headline"] for item in scrape_result.get("news", [])])
-            sentiment_queue = EventQueue()
-            sentiment_agent = SentimentExecutor(name="SentimentAgent")
-            sentiment_request = RequestContext(task_type="sentiment_analysis", payload={"text": news_text})
-            sentiment_result = sentiment_agent.execute(sentiment_request, sentiment_queue)
-
-            orchestration_log.append({
-                "step": 2,
-                "agent": "SentimentAgent",
-                "action": "Analyzed sentiment of news",
-                "result": sentiment_result
-            })
-
-            final_result["sentiment_analysis"] = sentiment_result
-
-        final_result["scrape_data"] = scrape_result
-
-    elif agent_name == "SentimentAgent" or task_type == "sentiment_analysis":
-        sentiment_agent = SentimentExecutor(name="SentimentAgent")
-        sentiment_request = RequestContext(task_type="sentiment_analysis", payload=payload)
-        sentiment_result = sentiment_agent.execute(sentiment_request, queue)
+    agent = registry.resolve(decision.get("agent"), decision.get("task_type"))
+    task_type = registry.AGENT_TASKS.get(agent.name, decision.get("task_type") or "unknown")
+    request = RequestContext(task_type=task_type, payload=decision.get("payload", {}), goal=user_query)
+    _, result = await registry.run(agent.name, task_type, request, queue)
+
+    result_key, action = ORCHESTRATION_STEPS.get(agent.name, ("result", "Handled request"))
+    orchestration_log.append({"step": 1, "agent": agent.name, "action": action, "result": result})
+    final_result[result_key] = result
+
+    if isinstance(result, dict) and "news" in result:
+        headlines = [item["headline"] for item in result.get("news", [])]
+        batch = await registry.run_compute(registry.get("SentimentAgent").analyze_batch, headlines)
+        sentiment_result = {
+            **batch["aggregate"],
+            "headlines": [{**item, "headline": headlines[item["index"]]} for item in batch["items"]],
+            "analyzed_at": datetime.now(timezone.utc).isoformat()
+        }
 
         orchestration_log.append({
-            "step": 1,
+            "step": 2,
             "agent": "SentimentAgent",
-            "action": "Analyzed sentiment",
+            "action": "Analyzed sentiment of news",
             "result": sentiment_result
         })
 
@@ -0,0 +1,68 @@
+"""
+Prometheus metrics for the requester service.
+
+Stage latencies share one histogram labelled by stage and agent so a job's
+time can be broken down as routing LLM -> browser launch -> page load ->
+parse -> extraction LLM -> Mongo write. Gauges that mirror state owned
+elsewhere (queue depths, pool usage) are read at scrape time through
+bind_gauges() rather than updated on every change.
+"""
+from __future__ import annotations
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Browser stages run for seconds; LLM and Mongo calls for milliseconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_LATENCY = Histogram(
+    "tundra_stage_duration_seconds",
+    "Time spent in each stage of a job",
+    ["stage", "agent"],
+    buckets=LATENCY_BUCKETS
+)
+JOB_LATENCY = Histogram(
+    "tundra_job_duration_seconds",
+    "Time from dequeue to finalization of a queued job",
+    ["agent", "status"],
+    buckets=LATENCY_BUCKETS
+)
+JOBS = Counter("tundra_jobs_total", "Queued jobs finished, by agent and status", ["agent", "status"])
+JOBS_SUBMITTED = Counter("tundra_jobs_submitted_total", "Jobs accepted by /submit_job")
+JOBS_REJECTED = Counter("tundra_jobs_rejected_total", "Jobs refused by admission control", ["reason", "priority"])
+JOBS_IN_FLIGHT = Gauge("tundra_jobs_in_flight", "Jobs dequeued and currently executing")
+
+JOB_QUEUE_DEPTH = Gauge("tundra_job_queue_depth", "Jobs waiting in the in-process queue")
+QUEUE_WAIT = Histogram(
+    "tundra_job_queue_wait_seconds",
+    "Time jobs spent queued before a worker picked them up",
+    ["priority"],
+    buckets=LATENCY_BUCKETS + (300, 600, 1800, 3600)
+)
+JOB_QUEUE_WAIT = Gauge("tundra_job_queue_estimated_wait_seconds", "Estimated wait for a newly queued job")
+BROWSER_POOL_SIZE = Gauge("tundra_browser_pool_size", "Browser worker threads")
+BROWSER_POOL_IN_USE = Gauge("tundra_browser_pool_in_use", "Browser worker threads currently driving a page")
+
+MONGO_WRITE_LATENCY = Histogram(
+    "tundra_mongo_write_duration_seconds",
+    "Duration of write-behind bulk writes",
+    ["collection"],
+    buckets=LATENCY_BUCKETS
+)
+WRITE_QUEUE_DEPTH = Gauge("tundra_write_behind_queue_depth", "Operations buffered for Mongo", ["collection"])
+WRITE_ERRORS = Counter("tundra_write_behind_errors_total", "Failed Mongo bulk writes", ["collection"])
+RATE_LIMITED = Counter("tundra_rate_limited_total", "Requests rejected with 429")
+COALESCED = Counter("tundra_coalesced_total", "Requests that shared an identical in-flight execution", ["kind"])
+HEDGES = Counter("tundra_hedged_attempts_total", "Hedged attempts started", ["agent"])
+
+
+def bind_gauges(job_queue, registry, writers, estimated_wait) -> None:
+    """Point the state-mirroring gauges at the live objects they report on"""
+    JOB_QUEUE_DEPTH.set_function(job_queue.qsize)
+    JOB_QUEUE_WAIT.set_function(estimated_wait)
+    BROWSER_POOL_SIZE.set(registry.browser_pool._max_workers)
+    for writer in writers:
+        WRITE_QUEUE_DEPTH.labels(writer.collection.name).set_function(writer.queue_depth)
+
+
+def render() -> bytes:
+    return generate_latest()
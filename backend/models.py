@@ -1,16 +1,43 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional, Any, Dict
+from typing import Annotated, Optional, Any, Dict, List, Literal
+import os
 
 class Job(BaseModel):
     job_id: Optional[str] = None
     user_id: Optional[str] = None
     task: str
     url: Optional[str] = None
+    budget: Optional[float] = None
     created_at: Optional[datetime] = None
     status: Optional[str] = None
+    hedge: Optional[bool] = None
+    correlation_id: Optional[str] = None
+    deadline_s: Optional[float] = None
+    # Low-priority jobs are shed first when the queue fills
+    priority: Optional[Literal["high", "normal", "low"]] = None
 
 class JobResponse(BaseModel):
     job_id: str
     status: str
     message: str
+    estimated_wait_s: Optional[float] = None
+
+# Bounds on one /sentiment/batch call; larger inputs should be split client-side.
+# The total caps the work per request, the count only how many tiny texts it holds.
+MAX_SENTIMENT_BATCH = int(os.getenv("SENTIMENT_BATCH_MAX_TEXTS", "50000"))
+MAX_SENTIMENT_TEXT_CHARS = int(os.getenv("SENTIMENT_TEXT_MAX_CHARS", "20000"))
+MAX_SENTIMENT_BATCH_CHARS = int(os.getenv("SENTIMENT_BATCH_MAX_CHARS", "5000000"))
+
+class BatchSentimentRequest(BaseModel):
+    texts: List[Annotated[str, Field(max_length=MAX_SENTIMENT_TEXT_CHARS)]] = Field(
+        ..., max_length=MAX_SENTIMENT_BATCH
+    )
+
+    @field_validator("texts")
+    @classmethod
+    def total_size(cls, texts: List[str]) -> List[str]:
+        total = sum(len(text) for text in texts)
+        if total > MAX_SENTIMENT_BATCH_CHARS:
+            raise ValueError(f"texts total {total} characters, more than {MAX_SENTIMENT_BATCH_CHARS}")
+        return texts
@@ -0,0 +1,300 @@
+"""
+Write-behind persistence for Mongo collections.
+
+Writes are buffered in memory, coalesced per document and sent with one
+ordered bulk_write per batch, flushed when the batch is full or every
+`flush_interval` seconds, and always on close().
+
+Only updates whose effect is preserved are coalesced ($set, $inc, $unset
+and $setOnInsert on distinct fields); any other write to a pending
+document is queued behind it instead.
+
+While Mongo is unreachable a failed batch stays at the head of the queue
+and is retried with backoff for as long as it takes; once more than
+`max_queue` writes are buffered the writer reports full() so callers can
+refuse new work. Writes are lost only if the process exits while Mongo is
+still down (close() retries first), or when a batch fails `max_attempts`
+times for any other reason (e.g. a document Mongo can't store), which is
+logged and counted in `dropped`.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from metrics import MONGO_WRITE_LATENCY, WRITE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+_MERGEABLE = {"$set", "$inc", "$unset", "$setOnInsert"}
+
+
+def _root(field: str) -> str:
+    return field.split(".", 1)[0]
+
+
+def merge_update(merged: Dict[str, Dict[str, Any]], update: Dict[str, Dict[str, Any]]) -> bool:
+    """
+    Fold `update` into the pending update `merged` in place. Returns False,
+    leaving `merged` untouched, if one update could not express both.
+    """
+    if not set(merged) <= _MERGEABLE or not set(update) <= _MERGEABLE:
+        return False
+    for op, fields in update.items():
+        for field in fields:
+            for other_op, other_fields in merged.items():
+                for other in other_fields:
+                    # Overlapping paths only combine as the same operator on the same field.
+                    if _root(other) == _root(field) and (other_op != op or other != field):
+                        return False
+    for op, fields in update.items():
+        target = merged.setdefault(op, {})
+        for field, value in fields.items():
+            if op == "$inc":
+                target[field] = target.get(field, 0) + value
+            elif op == "$setOnInsert":
+                target.setdefault(field, value)
+            else:
+                target[field] = value
+    return True
+
+
+def fold_into_insert(doc: Dict[str, Any], update: Dict[str, Dict[str, Any]]) -> bool:
+    """Apply `update` to a document that has not been inserted yet; False if it can't be"""
+    if not set(update) <= _MERGEABLE or any("." in field for fields in update.values() for field in fields):
+        return False
+    doc.update(update.get("$set", {}))
+    for field, amount in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + amount
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+    # $setOnInsert is a no-op: the document exists by the time the update runs.
+    return True
+
+
+class WriteBehindWriter:
+
+    def __init__(
+        self,
+        collection,
+        key_field: Optional[str] = None,
+        max_batch: int = 500,
+        flush_interval: float = 0.25,
+        max_attempts: int = 8,
+        max_backoff: float = 30.0,
+        max_queue: int = 100000,
+        on_flush: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        self.collection = collection
+        # Awaited after a flush that wrote something, e.g. to invalidate readers' caches
+        self.on_flush = on_flush
+        self.key_field = key_field
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.max_queue = max_queue
+
+        # coalesce key -> {"op": "insert", "doc": ...} or
+        #                 {"op": "update", "filter": ..., "update": ..., "upsert": ...}
+        self._pending: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        # Built ops that go out before anything pending: failed batches being
+        # retried, and writes displaced by a later one that couldn't fold in.
+        self._ready: List[Any] = []
+        self._failures = 0
+        self._retry_at = 0.0
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.flushes = 0
+        self.flushed_ops = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @staticmethod
+    def _filter_key(filter: Dict[str, Any]):
+        return tuple(sorted(filter.items()))
+
+    def _enqueue(self, key, entry: Dict[str, Any]) -> None:
+        self._pending[key] = entry
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def insert(self, doc: Dict[str, Any]) -> None:
+        if self.key_field and doc.get(self.key_field) is not None:
+            key = self._filter_key({self.key_field: doc[self.key_field]})
+        else:
+            key = ("_insert", next(self._seq))
+        self._enqueue(key, {"op": "insert", "doc": doc})
+
+    def update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> None:
+        key = self._filter_key(filter)
+        entry = self._pending.get(key)
+
+        if entry is None:
+            self._enqueue(key, {
+                "op": "update",
+                "filter": filter,
+                "update": {op: dict(fields) for op, fields in update.items()},
+                "upsert": upsert
+            })
+        elif entry["op"] == "insert":
+            # The document has not reached Mongo yet: fold the update into it.
+            if not fold_into_insert(entry["doc"], update):
+                self._displace(key, filter, update, upsert)
+        elif entry["upsert"] != upsert or not merge_update(entry["update"], update):
+            self._displace(key, filter, update, upsert)
+
+    def _displace(self, key, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool) -> None:
+        """Send the pending write for `key` ahead, and queue `update` behind it"""
+        self._ready.append(self._build(self._pending.pop(key)))
+        self._enqueue(key, {
+            "op": "update",
+            "filter": filter,
+            "update": {op: dict(fields) for op, fields in update.items()},
+            "upsert": upsert
+        })
+
+    @staticmethod
+    def _build(entry: Dict[str, Any]):
+        if entry["op"] == "insert":
+            return InsertOne(entry["doc"])
+        return UpdateOne(entry["filter"], entry["update"], upsert=entry["upsert"])
+
+    def _take_batch(self) -> List[Any]:
+        batch = self._ready[:self.max_batch]
+        self._ready = self._ready[len(batch):]
+        while self._pending and len(batch) < self.max_batch:
+            _, entry = self._pending.popitem(last=False)
+            batch.append(self._build(entry))
+        return batch
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            flushed = self.flushed_ops
+            try:
+                await self._flush_all()
+            finally:
+                if self.on_flush is not None and self.flushed_ops != flushed:
+                    try:
+                        await self.on_flush()
+                    except Exception as e:
+                        logger.warning("on_flush hook for %s failed: %s", self.collection.name, e)
+
+    async def _flush_all(self) -> None:
+        while self._ready or self._pending:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            try:
+                await self.collection.bulk_write(batch, ordered=True)
+            except BulkWriteError as e:
+                self.errors += 1
+                WRITE_ERRORS.labels(self.collection.name).inc()
+                self._failures = 0
+                write_errors = e.details.get("writeErrors") or []
+                if not write_errors:
+                    # Only the write concern failed: the writes were applied but not
+                    # acknowledged as replicated; resending could duplicate inserts.
+                    logger.error("Write concern not met for %d writes to %s: %s",
+                                 len(batch), self.collection.name, e.details.get("writeConcernErrors"))
+                    self.flushed_ops += len(batch)
+                    continue
+                # Ordered: everything before the failing op was applied.
+                # The failing op is not retryable (e.g. duplicate key); drop it.
+                failed_at = write_errors[0]["index"]
+                self.flushed_ops += failed_at
+                self.dropped += 1
+                logger.error("Dropping write to %s: %s", self.collection.name, write_errors[0].get("errmsg"))
+                self._ready = batch[failed_at + 1:] + self._ready
+                continue
+            except Exception as e:
+                self.errors += 1
+                WRITE_ERRORS.labels(self.collection.name).inc()
+                self._failures += 1
+                # Mongo being unreachable says nothing about the writes; keep them.
+                if self._failures >= self.max_attempts and not isinstance(e, ConnectionFailure):
+                    self._failures = 0
+                    self.dropped += len(batch)
+                    logger.error("Dropping %d writes to %s after %d failed attempts: %s",
+                                 len(batch), self.collection.name, self.max_attempts, e)
+                else:
+                    self._ready = batch + self._ready
+                    backoff = min(self.max_backoff, self.flush_interval * 2 ** self._failures)
+                    self._retry_at = time.monotonic() + backoff
+                    logger.warning("Flush to %s failed, retrying in %.1fs: %s", self.collection.name, backoff, e)
+                return
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                MONGO_WRITE_LATENCY.labels(self.collection.name).observe(elapsed_ms / 1000)
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._failures = 0
+            self.flushes += 1
+            self.flushed_ops += len(batch)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() < self._retry_at:
+                continue
+            try:
+                await self.flush()
+            except Exception:
+                # Whatever went wrong, the loop must survive to flush later writes.
+                logger.exception("Unexpected error flushing %s", self.collection.name)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, attempts: int = 5) -> None:
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        for _ in range(attempts):
+            await self.flush()
+            if not self.queue_depth():
+                return
+            await asyncio.sleep(self.flush_interval)
+        logger.error("Shutting down with %d unflushed writes to %s", self.queue_depth(), self.collection.name)
+
+    def queue_depth(self) -> int:
+        return len(self._pending) + len(self._ready)
+
+    def full(self) -> bool:
+        """Too many writes are waiting on Mongo; callers should stop adding work"""
+        return self.queue_depth() >= self.max_queue
+
+    def retry_in(self) -> float:
+        """Seconds until the next attempt to flush after a failure"""
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "flushes": self.flushes,
+            "flushed_ops": self.flushed_ops,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "full": self.full(),
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2)
+        }
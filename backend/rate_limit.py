@@ -0,0 +1,291 @@
+"""
+Per-API-key rate limiting and in-flight job quotas.
+
+Each caller gets a token bucket for request rate and a cap on jobs in
+flight, both set by its tier. Callers sending x-api-key are identified by
+the key's hash, looked up in the api_keys collection the db service issues
+keys into; the tier is the key document's `tier` field (the default tier
+if unset). Unknown and revoked keys are refused with 401, so rotating
+random keys can't earn fresh buckets. Callers without a key, or whose key
+can't be checked because Mongo is unreachable, are limited by address.
+Lookups are cached per process, so a revoked key is refused here within
+`ttl` seconds.
+
+The in-memory backend is exact for a single replica; RATE_LIMIT_BACKEND=mongo
+shares the buckets and counters between replicas through one Mongo
+document per caller, which expires (TTL index on expires_at) once its
+bucket has refilled and no slot has been taken for `slot_ttl`.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from fastapi import Header, HTTPException, Request
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+
+class TierPolicy(BaseModel):
+    rate: float          # sustained requests per second
+    burst: float         # bucket size
+    max_in_flight: int   # jobs queued or running at once
+    priority: str = "normal"  # queue priority class for jobs without their own
+
+
+DEFAULT_TIERS: Dict[str, TierPolicy] = {
+    "free": TierPolicy(rate=1.0, burst=5, max_in_flight=2),
+    "pro": TierPolicy(rate=10.0, burst=50, max_in_flight=20, priority="high"),
+    "batch": TierPolicy(rate=50.0, burst=500, max_in_flight=200, priority="low"),
+}
+
+
+def load_tiers() -> Dict[str, TierPolicy]:
+    tiers = dict(DEFAULT_TIERS)
+    for name, policy in json.loads(os.getenv("RATE_LIMIT_TIERS", "{}")).items():
+        tiers[name] = TierPolicy(**policy)
+    return tiers
+
+
+def address_key(request: Request) -> str:
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+class APIKeyTiers:
+    """
+    Tier of each API key by hash, read from the api_keys collection
+
+    Results, misses included, are cached for `ttl` (`negative_ttl` for
+    misses); the cache holds at most `max_entries` keys, least recently
+    used first out, so a flood of random keys can't grow it without bound.
+    """
+
+    def __init__(
+        self,
+        collection,
+        default_tier: str = "free",
+        ttl: float = 60.0,
+        negative_ttl: float = 5.0,
+        max_entries: int = 10000
+    ):
+        self.collection = collection
+        self.default_tier = default_tier
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # key hash -> (expires at, tier or None for unknown / revoked keys)
+        self._cache: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+
+    async def tier(self, key_hash: str) -> Optional[str]:
+        """The key's tier, or None if no active key has this hash"""
+        now = time.monotonic()
+        cached = self._cache.get(key_hash)
+        if cached and cached[0] > now:
+            self._cache.move_to_end(key_hash)
+            return cached[1]
+
+        doc = await self.collection.find_one({"key_hash": key_hash, "active": True}, {"_id": 0, "tier": 1})
+        tier = (doc.get("tier") or self.default_tier) if doc is not None else None
+        self._cache[key_hash] = (now + (self.ttl if doc is not None else self.negative_ttl), tier)
+        self._cache.move_to_end(key_hash)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return tier
+
+
+class InMemoryBackend:
+
+    def __init__(self, sweep_interval: float = 60.0):
+        # key -> (tokens, last refill, time the bucket is full again)
+        self.buckets: Dict[str, Tuple[float, float, float]] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    def _sweep(self, now: float) -> None:
+        # A bucket that has refilled is the same as no bucket at all.
+        self._next_sweep = now + self.sweep_interval
+        for key in [k for k, (_, _, full_at) in self.buckets.items() if full_at <= now]:
+            del self.buckets[key]
+
+    async def take_token(self, key: str, policy: TierPolicy) -> Tuple[bool, float]:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        tokens, last, _ = self.buckets.get(key, (policy.burst, now, now))
+        tokens = min(policy.burst, tokens + (now - last) * policy.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now, now + (policy.burst - tokens) / policy.rate)
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / policy.rate
+
+    async def acquire_slot(self, key: str, policy: TierPolicy) -> bool:
+        if self.in_flight.get(key, 0) >= policy.max_in_flight:
+            return False
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+        return True
+
+    async def release_slot(self, key: str) -> None:
+        remaining = self.in_flight.get(key, 0) - 1
+        if remaining > 0:
+            self.in_flight[key] = remaining
+        else:
+            self.in_flight.pop(key, None)
+
+
+class MongoBackend:
+    """
+    Shared buckets: one atomic find_one_and_update per check, refilling the
+    bucket from the server clock ($$NOW) so replicas agree on elapsed time.
+    """
+
+    def __init__(self, collection, slot_ttl: float = 86400.0):
+        self.collection = collection
+        self.slot_ttl = slot_ttl
+
+    async def take_token(self, key: str, policy: TierPolicy) -> Tuple[bool, float]:
+        now_ms = {"$toLong": "$$NOW"}
+        elapsed = {"$divide": [{"$max": [0, {"$subtract": [now_ms, {"$ifNull": ["$ts", now_ms]}]}]}, 1000]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [policy.burst, {"$add": [
+                        {"$ifNull": ["$tokens", policy.burst]},
+                        {"$multiply": [elapsed, policy.rate]}
+                    ]}]},
+                    "ts": now_ms
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+                # Expire once the bucket is full again, unless a slot keeps it longer.
+                {"$set": {"expires_at": {"$max": [
+                    {"$ifNull": ["$expires_at", "$$NOW"]},
+                    {"$add": ["$$NOW", {"$multiply": [
+                        {"$divide": [{"$subtract": [policy.burst, "$tokens"]}, policy.rate]}, 1000
+                    ]}]}
+                ]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc["allowed"]:
+            return True, 0.0
+        return False, (1 - doc["tokens"]) / policy.rate
+
+    async def acquire_slot(self, key: str, policy: TierPolicy) -> bool:
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": key, "in_flight": {"$not": {"$gte": policy.max_in_flight}}},
+                {
+                    "$inc": {"in_flight": 1},
+                    # Outlives any job, so the count isn't expired while slots are held.
+                    "$max": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.slot_ttl)}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The document exists but is at the cap, so the upsert collided.
+            return False
+        return doc is not None
+
+    async def release_slot(self, key: str) -> None:
+        await self.collection.update_one({"_id": key, "in_flight": {"$gt": 0}}, {"$inc": {"in_flight": -1}})
+
+
+class RateLimiter:
+
+    def __init__(
+        self,
+        backend,
+        keys: Optional[APIKeyTiers] = None,
+        tiers: Optional[Dict[str, TierPolicy]] = None,
+        default_tier: str = "free"
+    ):
+        self.backend = backend
+        self.keys = keys
+        self.tiers = tiers or load_tiers()
+        self.default_tier = os.getenv("RATE_LIMIT_DEFAULT_TIER", default_tier)
+        # {sha256 of api key: tier name}, as last resolved; only valid keys get here
+        self.key_tiers: Dict[str, str] = {}
+        self.limited = 0
+
+    async def caller_key(self, request: Request, api_key: Optional[str]) -> str:
+        """Bucket id for a request: its API key's hash, or its address without one"""
+        if not api_key or self.keys is None:
+            return address_key(request)
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        try:
+            tier = await self.keys.tier(key_hash)
+        except PyMongoError as e:
+            logger.warning("Can't check API key, limiting by address: %s", e)
+            return address_key(request)
+        if tier is None:
+            raise HTTPException(status_code=401, detail="Invalid or revoked API key")
+        self.key_tiers[key_hash] = tier
+        return "key:" + key_hash
+
+    def tier_for(self, key: str) -> str:
+        return self.key_tiers.get(key.split(":", 1)[1], self.default_tier)
+
+    def policy_for(self, key: str) -> TierPolicy:
+        return self.tiers.get(self.tier_for(key), self.tiers[self.default_tier])
+
+    def _too_many(self, detail: str, retry_after: float) -> HTTPException:
+        self.limited += 1
+        RATE_LIMITED.inc()
+        return HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def check_rate(self, key: str) -> None:
+        allowed, retry_after = await self.backend.take_token(key, self.policy_for(key))
+        if not allowed:
+            raise self._too_many("Rate limit exceeded", retry_after)
+
+    async def acquire_slot(self, key: str) -> None:
+        policy = self.policy_for(key)
+        if not await self.backend.acquire_slot(key, policy):
+            # A slot frees up when one of the caller's jobs finishes; suggest
+            # roughly one request interval as the retry hint.
+            raise self._too_many(
+                f"Too many jobs in flight (limit {policy.max_in_flight})",
+                1 / policy.rate
+            )
+
+    async def release_slot(self, key: str) -> None:
+        await self.backend.release_slot(key)
+
+
+def build_rate_limiter(collection, api_keys_collection) -> RateLimiter:
+    keys = APIKeyTiers(api_keys_collection, os.getenv("RATE_LIMIT_DEFAULT_TIER", "free"))
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "mongo":
+        return RateLimiter(MongoBackend(collection), keys)
+    return RateLimiter(InMemoryBackend(), keys)
+
+
+def rate_limited(limiter: RateLimiter):
+    """FastAPI dependency: charges one token and returns the caller key"""
+    async def dependency(request: Request, x_api_key: Optional[str] = Header(None)) -> str:
+        key = await limiter.caller_key(request, x_api_key)
+        await limiter.check_rate(key)
+        return key
+    return dependency
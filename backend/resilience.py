@@ -0,0 +1,269 @@
+"""
+Retries and circuit breakers for calls to external dependencies.
+
+Every call names its dependency ("azure_openai", "site:example.com", ...).
+Failures are classified: transient ones (timeouts, connection errors, 429
+and 5xx responses) are retried with exponential backoff and full jitter,
+waiting at least as long as a Retry-After header asks; anything else is
+raised at once. Transient failures also count against the dependency's
+circuit breaker, which fails calls fast with CircuitOpen while it is open
+and lets a single trial call through once its reset timeout has passed.
+
+Retries never sleep past the job's deadline (agent_executor.cancellation),
+nor, without a deadline, longer than the policy's max_delay.
+
+Breakers are kept for at most MAX_BREAKERS dependencies (one per scraped
+site adds up); past that the least recently used closed breaker, which
+holds nothing worth keeping, is forgotten first.
+"""
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import inspect
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import openai
+from playwright.sync_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+from agent_executor.cancellation import JobCancelled, check_cancelled, remaining, sleep
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Navigation errors that another attempt won't fix
+PERMANENT_NET_ERRORS = ("ERR_NAME_NOT_RESOLVED", "ERR_INVALID_URL", "ERR_CERT_", "ERR_BLOCKED_BY_CLIENT")
+
+
+class TransientError(Exception):
+    """A failure worth retrying, e.g. a target site answering 503"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(f"{dependency} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, TransientError):
+        return True
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    if isinstance(error, PlaywrightTimeoutError):
+        return True
+    if isinstance(error, PlaywrightError):
+        message = str(error)
+        return "net::ERR_" in message and not any(code in message for code in PERMANENT_NET_ERRORS)
+    return False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delay-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    if isinstance(error, TransientError):
+        return error.retry_after
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_retry_after(headers.get("retry-after"))
+
+
+class RetryPolicy:
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 10.0, multiplier: float = 2.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, attempt: int, hint: Optional[float] = None) -> float:
+        # Full jitter spreads out callers that failed together; a server's
+        # Retry-After is a floor, not something to jitter below.
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+        return max(backoff, hint or 0.0)
+
+    def next_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up"""
+        if not is_transient(error) or attempt + 1 >= self.attempts:
+            return None
+        delay = self.delay(attempt, retry_after(error))
+        left = remaining()
+        if left is None:
+            # Nothing else bounds the wait, so neither may a server's Retry-After.
+            return min(delay, self.max_delay)
+        if delay >= left:
+            return None
+        return delay
+
+
+LLM_RETRY = RetryPolicy(attempts=3, base_delay=1.0, max_delay=20.0)
+PAGE_RETRY = RetryPolicy(attempts=2, base_delay=2.0, max_delay=30.0)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive transient failures"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+        # Calls come from the event loop and from worker threads.
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            wait = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and wait <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpen(self.name, max(wait, 1.0))
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def on_abandoned(self) -> None:
+        """The caller gave up (cancelled or past its deadline); no verdict on the dependency"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def on_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self._trial_in_flight = False
+            if not is_transient(error):
+                # The dependency answered; the request itself was bad.
+                self.failures = 0
+                if self.state == "half_open":
+                    self.state = "closed"
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("Circuit for %s opened after %d failures: %s", self.name, self.failures, error)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+MAX_BREAKERS = 1000
+
+_breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+_breakers_lock = threading.Lock()
+
+
+def breaker(dependency: str) -> CircuitBreaker:
+    with _breakers_lock:
+        circuit = _breakers.get(dependency)
+        if circuit is not None:
+            _breakers.move_to_end(dependency)
+            return circuit
+        circuit = _breakers[dependency] = CircuitBreaker(dependency)
+        if len(_breakers) > MAX_BREAKERS:
+            oldest = next((name for name, c in _breakers.items() if c.state == "closed"), None)
+            del _breakers[oldest if oldest is not None else next(iter(_breakers))]
+        return circuit
+
+
+def call(dependency: str, fn: Callable[[], Any], policy: RetryPolicy = LLM_RETRY) -> Any:
+    """Run a blocking call with retries; for worker threads, not the event loop"""
+    circuit = breaker(dependency)
+    attempt = 0
+    while True:
+        check_cancelled()
+        circuit.before_call()
+        try:
+            result = fn()
+        except (asyncio.CancelledError, JobCancelled):
+            circuit.on_abandoned()
+            raise
+        except Exception as e:
+            circuit.on_failure(e)
+            delay = policy.next_delay(attempt, e)
+            if delay is None:
+                raise
+            logger.info("%s failed (%s), retrying in %.1fs", dependency, e, delay)
+            sleep(delay)
+            attempt += 1
+            continue
+        circuit.on_success()
+        return result
+
+
+async def call_async(dependency: str, fn: Callable[[], Any], policy: RetryPolicy = PAGE_RETRY) -> Any:
+    """Like call(), but fn may return an awaitable and backoff doesn't hold a thread"""
+    circuit = breaker(dependency)
+    attempt = 0
+    while True:
+        check_cancelled()
+        circuit.before_call()
+        try:
+            result = fn()
+            if inspect.isawaitable(result):
+                result = await result
+        except (asyncio.CancelledError, JobCancelled):
+            circuit.on_abandoned()
+            raise
+        except Exception as e:
+            circuit.on_failure(e)
+            delay = policy.next_delay(attempt, e)
+            if delay is None:
+                raise
+            logger.info("%s failed (%s), retrying in %.1fs", dependency, e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        circuit.on_success()
+        return result
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    """Breakers that are open or half open; closed ones are the healthy norm"""
+    with _breakers_lock:
+        return {name: circuit.metrics() for name, circuit in _breakers.items() if circuit.state != "closed"}
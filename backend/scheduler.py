@@ -0,0 +1,207 @@
+"""
+Priority classes and per-user fair queuing for queued jobs.
+
+Replaces the FIFO job queue. Dequeueing happens at two levels, both using
+stride scheduling: each served item advances its "pass" by 1/weight, and
+the lowest pass goes next.
+
+  - Classes: high, normal and low share the worker by weight (16:4:1 by
+    default). Weights rather than strict priority mean a batch backlog
+    keeps draining, only more slowly, while interactive traffic arrives.
+  - Users: within a class, every user (job.user_id) gets an equal share,
+    so one user's 10,000 scrapes queue behind each other rather than in
+    front of everyone else's jobs.
+
+A flow that goes idle and comes back starts at the current virtual time,
+not at its old pass, so idling earns no burst of credit. As a backstop
+against starvation, a job that has waited longer than starve_after_s is
+served next regardless of weights.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from admission import DEFAULT_PRIORITY, PRIORITIES
+from metrics import QUEUE_WAIT
+
+DEFAULT_WEIGHTS: Dict[str, float] = {"high": 16.0, "normal": 4.0, "low": 1.0}
+
+
+class _Entry:
+    __slots__ = ("job", "enqueued_at", "removed")
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job = job
+        self.enqueued_at = time.monotonic()
+        self.removed = False
+
+
+class _PriorityClass:
+    """Per-user FIFOs served in stride order"""
+
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.pass_value = 0.0
+        self.vtime = 0.0
+        self.size = 0
+        self.flows: Dict[str, Deque[_Entry]] = {}
+        self.flow_pass: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        # Arrival order across flows, for the starvation check; removed entries are skipped lazily.
+        self._arrivals: Deque[_Entry] = deque()
+
+    def push(self, user: str, entry: _Entry) -> None:
+        flow = self.flows.get(user)
+        if flow is None:
+            flow = self.flows[user] = deque()
+            start = max(self.flow_pass.get(user, 0.0), self.vtime)
+            heapq.heappush(self._heap, (start, next(self._seq), user))
+        flow.append(entry)
+        self._arrivals.append(entry)
+        self.size += 1
+
+    def oldest(self) -> Optional[_Entry]:
+        while self._arrivals and self._arrivals[0].removed:
+            self._arrivals.popleft()
+        return self._arrivals[0] if self._arrivals else None
+
+    def pop(self, entry: Optional[_Entry] = None) -> _Entry:
+        """Serve the next flow, or the flow whose head is `entry`"""
+        if entry is None:
+            pass_value, _, user = heapq.heappop(self._heap)
+        else:
+            user = entry.job.get("user_id") or "anonymous"
+            index = next(i for i, item in enumerate(self._heap) if item[2] == user)
+            pass_value = self._heap[index][0]
+            self._heap[index] = self._heap[-1]
+            self._heap.pop()
+            heapq.heapify(self._heap)
+
+        flow = self.flows[user]
+        served = flow.popleft()
+        self.vtime = pass_value
+        self._settle(user, pass_value + 1.0)
+        served.removed = True
+        self.size -= 1
+        return served
+
+    def remove(self, user: str, entry: _Entry) -> None:
+        flow = self.flows[user]
+        flow.remove(entry)
+        entry.removed = True
+        self.size -= 1
+        if not flow:
+            index = next(i for i, item in enumerate(self._heap) if item[2] == user)
+            self.flow_pass[user] = self._heap[index][0]
+            self._heap[index] = self._heap[-1]
+            self._heap.pop()
+            heapq.heapify(self._heap)
+            del self.flows[user]
+
+    def _settle(self, user: str, next_pass: float) -> None:
+        if self.flows[user]:
+            heapq.heappush(self._heap, (next_pass, next(self._seq), user))
+        else:
+            del self.flows[user]
+            self.flow_pass[user] = next_pass
+            # Bounded by the number of users seen; forget those far behind.
+            if len(self.flow_pass) > 10000:
+                self.flow_pass = {u: p for u, p in self.flow_pass.items() if p >= self.vtime}
+
+
+class FairScheduler:
+    """Drop-in for the asyncio.Queue of jobs: put_nowait(), get(), qsize()"""
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        weights: Optional[Dict[str, float]] = None,
+        starve_after_s: float = float(os.getenv("JOB_STARVATION_S", "300"))
+    ):
+        self.maxsize = maxsize
+        weights = {**DEFAULT_WEIGHTS, **json.loads(os.getenv("JOB_PRIORITY_WEIGHTS", "{}")), **(weights or {})}
+        self.classes = {name: _PriorityClass(name, weights[name]) for name in PRIORITIES}
+        self.starve_after_s = starve_after_s
+        self.vtime = 0.0
+        self.promoted = 0
+        self._entries: Dict[str, Tuple[str, _Entry]] = {}
+        self._wakeup = asyncio.Event()
+
+    def qsize(self) -> int:
+        return len(self._entries)
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self.qsize()
+
+    def put_nowait(self, job: Dict[str, Any]) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+        priority = job.get("priority") or DEFAULT_PRIORITY
+        cls = self.classes[priority]
+        if not cls.size:
+            # An idle class rejoins at the current virtual time.
+            cls.pass_value = max(cls.pass_value, self.vtime)
+        entry = _Entry(job)
+        cls.push(job.get("user_id") or "anonymous", entry)
+        self._entries[job["job_id"]] = (priority, entry)
+        self._wakeup.set()
+
+    async def get(self) -> Dict[str, Any]:
+        while not self._entries:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self._pop()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(job_id)
+        return item[1].job if item else None
+
+    def remove(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Take a queued job out of the queue (e.g. it was cancelled)"""
+        item = self._entries.pop(job_id, None)
+        if item is None:
+            return None
+        priority, entry = item
+        self.classes[priority].remove(entry.job.get("user_id") or "anonymous", entry)
+        return entry.job
+
+    def _pop(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        active = [cls for cls in self.classes.values() if cls.size]
+
+        starving = [
+            (oldest, cls) for cls in active
+            if (oldest := cls.oldest()) is not None and now - oldest.enqueued_at >= self.starve_after_s
+        ]
+        if starving:
+            oldest, cls = min(starving, key=lambda item: item[0].enqueued_at)
+            entry = cls.pop(oldest)
+            self.promoted += 1
+        else:
+            cls = min(active, key=lambda c: c.pass_value)
+            entry = cls.pop()
+        self.vtime = cls.pass_value
+        cls.pass_value += 1.0 / cls.weight
+
+        del self._entries[entry.job["job_id"]]
+        QUEUE_WAIT.labels(cls.name).observe(now - entry.enqueued_at)
+        return entry.job
+
+    def depths(self) -> Dict[str, int]:
+        return {name: cls.size for name, cls in self.classes.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "by_priority": self.depths(),
+            "users_waiting": sum(len(cls.flows) for cls in self.classes.values()),
+            "starvation_promotions": self.promoted
+        }
@@ -0,0 +1,174 @@
+"""
+Coalescing of identical concurrent work.
+
+SingleFlight shares one in-flight execution between callers that ask for
+the same key at the same time: the first caller starts it, later callers
+wait on the same task, and everyone receives its result or exception. The
+shared task runs under its own cancel token, kept alive as long as any
+caller still waits on it and long enough for the most patient one.
+
+Queued jobs can't share a coroutine the same way, since they finish long
+after /submit_job returns; JobCoalescer instead records identical jobs as
+followers of the running one, to be finalized with its result. Only a
+running job leads: following a queued one would hold a caller behind
+another caller's place in the fair queue.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from agent_executor.cancellation import CancelToken, bind, remaining
+from metrics import COALESCED
+
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("singleflight_bypass", default=False)
+
+
+@contextmanager
+def bypass():
+    """Run work started inside this block on its own, e.g. a hedged attempt"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class _Call:
+
+    def __init__(self, task: asyncio.Task, token: CancelToken):
+        self.task = task
+        self.token = token
+        self.waiters = 0
+
+    def extend(self, seconds: Optional[float]) -> None:
+        """Keep the shared work alive for a caller willing to wait `seconds`"""
+        if self.token.deadline is None:
+            return
+        if seconds is None:
+            self.token.deadline = None
+        else:
+            self.token.deadline = max(self.token.deadline, time.monotonic() + seconds)
+
+
+class SingleFlight:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executions = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if _bypass.get():
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, fn)
+        else:
+            self.coalesced += 1
+            COALESCED.labels(self.name).inc()
+            call.extend(remaining())
+
+        call.waiters += 1
+        try:
+            # shield: one caller giving up must not cancel the others' result.
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.token.cancel()
+                call.task.cancel()
+
+    def _start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> _Call:
+        self.executions += 1
+        token = CancelToken(remaining())
+        with bind(token):
+            task = asyncio.create_task(fn())
+        call = self._calls[key] = _Call(task, token)
+
+        def done(finished: asyncio.Task) -> None:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            if not finished.cancelled():
+                # Retrieved here so an abandoned failure isn't logged as unhandled.
+                finished.exception()
+
+        task.add_done_callback(done)
+        return call
+
+    def metrics(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executions": self.executions, "coalesced": self.coalesced}
+
+
+class JobCoalescer:
+    """Identical jobs: while one is running, the rest follow its outcome"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._leaders: Dict[Hashable, str] = {}
+        self._followers: Dict[str, Tuple[Hashable, List[Dict[str, Any]]]] = {}
+        self._follower_of: Dict[str, str] = {}
+
+    def attach(self, key: Hashable, job: Dict[str, Any]) -> Optional[str]:
+        """Make the job a follower if an identical one is running; returns that job's id"""
+        leader_id = self._leaders.get(key)
+        if leader_id is None:
+            return None
+        self._followers[leader_id][1].append(job)
+        self._follower_of[job["job_id"]] = leader_id
+        self.coalesced += 1
+        COALESCED.labels("jobs").inc()
+        return leader_id
+
+    def start(self, key: Hashable, job: Dict[str, Any]) -> Optional[str]:
+        """
+        The job is about to run: it follows an identical running job, whose
+        id is returned, or leads its key until release()
+        """
+        leader_id = self.attach(key, job)
+        if leader_id is None:
+            self._leaders[key] = job["job_id"]
+            self._followers[job["job_id"]] = (key, [])
+        return leader_id
+
+    def follower(self, job_id: str) -> Optional[Dict[str, Any]]:
+        leader_id = self._follower_of.get(job_id)
+        if leader_id is None:
+            return None
+        return next(job for job in self._followers[leader_id][1] if job["job_id"] == job_id)
+
+    def detach(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Drop a follower (e.g. cancelled); the leader is unaffected"""
+        job = self.follower(job_id)
+        if job is not None:
+            self._followers[self._follower_of.pop(job_id)][1].remove(job)
+        return job
+
+    def release(self, leader_id: str) -> Tuple[Optional[Hashable], List[Dict[str, Any]]]:
+        """End the leader's run, handing back its key and followers"""
+        key, followers = self._followers.pop(leader_id, (None, []))
+        if key is not None and self._leaders.get(key) == leader_id:
+            del self._leaders[key]
+        for job in followers:
+            self._follower_of.pop(job["job_id"], None)
+        return key, followers
+
+    def metrics(self) -> Dict[str, int]:
+        return {"leaders": len(self._followers), "followers": len(self._follower_of), "coalesced": self.coalesced}
@@ -0,0 +1,46 @@
+"""
+Incremental per-user spending rollups.
+
+Each finished job adds its cost to the user's document for the UTC day it
+finished on and to their all-time document (ids "<user_id>:<YYYY-MM-DD>"
+and "<user_id>:all"), which the db service's /spending endpoint reads.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from persistence import WriteBehindWriter
+
+ALL_TIME = "all"
+
+
+class SpendRollups:
+
+    def __init__(self, rollups_collection, flush_interval: float = 1.0):
+        self.writer = WriteBehindWriter(rollups_collection, flush_interval=flush_interval)
+
+    def record(self, user_id: Optional[str], budget: Optional[float], status: str, finished_at: datetime) -> None:
+        if not user_id:
+            return
+        completed = status == "completed"
+        increments = {
+            "total_spent": (budget or 0.0) if completed else 0.0,
+            "successful_jobs": int(completed),
+            "failed_jobs": int(status in ("failed", "timed_out")),
+        }
+        for day in (finished_at.date().isoformat(), ALL_TIME):
+            self.writer.update(
+                {"_id": f"{user_id}:{day}"},
+                {
+                    "$inc": increments,
+                    "$setOnInsert": {"user_id": user_id, "day": day, "refunded": 0.0}
+                },
+                upsert=True
+            )
+
+    def start(self) -> None:
+        self.writer.start()
+
+    async def close(self) -> None:
+        await self.writer.close()
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from admission import AdmissionController
+from models import Job
+from rate_limit import InMemoryBackend, RateLimiter
+from scheduler import FairScheduler
+from singleflight import JobCoalescer
+
+
+def controller(**kwargs):
+    return AdmissionController(**{"max_depth": 10, "max_wait_s": 100, "initial_service_s": 10, **kwargs})
+
+
+def test_admitted_jobs_get_an_estimated_wait():
+    assert controller().admit(depth=3, in_flight=1) == 40
+
+
+def test_low_priority_is_shed_first_with_a_retry_hint():
+    admission = controller()
+    admission.admit(depth=4, priority="low")
+    with pytest.raises(HTTPException) as exc:
+        admission.admit(depth=6, priority="low")
+    assert exc.value.status_code == 503
+    # Two jobs must drain before the queue is under the low limit of 5 again.
+    assert exc.value.headers["Retry-After"] == "20"
+    assert exc.value.detail["estimated_wait_s"] == 60
+    assert admission.admit(depth=6, priority="normal") == 60
+
+
+def test_long_waits_are_refused_except_for_high_priority():
+    admission = controller(max_depth=100)
+    with pytest.raises(HTTPException) as exc:
+        admission.admit(depth=12)
+    assert exc.value.headers["Retry-After"] == "20"
+    assert admission.admit(depth=12, priority="high") == 120
+    assert admission.rejected == 1
+
+
+def test_jobs_are_refused_while_writes_are_backed_up():
+    class Writer:
+        def __init__(self, depth, retry_in):
+            self.depth, self.wait = depth, retry_in
+
+        def full(self):
+            return self.depth >= 5
+
+        def queue_depth(self):
+            return self.depth
+
+        def retry_in(self):
+            return self.wait
+
+    admission = controller()
+    admission.admit_writes([Writer(4, 0.0)])
+    with pytest.raises(HTTPException) as exc:
+        admission.admit_writes([Writer(4, 0.0), Writer(5, 2.5)], priority="high")
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "3"
+
+
+def test_service_time_is_an_ewma():
+    admission = controller(alpha=0.5)
+    admission.record_service_time(30)
+    assert admission.service_s == 20
+    assert admission.status(depth=9)["saturated"]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    limiter = RateLimiter(InMemoryBackend())
+    monkeypatch.setattr(main, "limiter", limiter)
+    monkeypatch.setattr(main, "job_coalescer", JobCoalescer())
+    monkeypatch.setattr(main, "job_queue", FairScheduler())
+    monkeypatch.setattr(main, "admission", controller(max_depth=2))
+    return limiter
+
+
+def submit(task, priority="low"):
+    return asyncio.run(main.submit_job(Job(task=task, priority=priority), user_id="u1", caller="ip:c",
+                                       x_correlation_id=None))
+
+
+def test_submit_job_answers_503_and_frees_the_callers_slot(service):
+    assert submit("first").status == "queued"
+    with pytest.raises(HTTPException) as exc:
+        submit("second")
+    assert exc.value.status_code == 503 and "Retry-After" in exc.value.headers
+    assert service.backend.in_flight["ip:c"] == 1
+    assert main.job_coalescer.metrics()["leaders"] == 0
+    assert main.job_queue.qsize() == 1
@@ -0,0 +1,110 @@
+import asyncio
+import importlib.util
+import os
+
+import pytest
+
+from agent_stats import AgentStatsRecorder, P2Quantile
+
+# The db service's scoring module, loaded by path (both services have their own top-level modules).
+_spec = importlib.util.spec_from_file_location(
+    "db_agent_scoring", os.path.join(os.path.dirname(__file__), "..", "..", "db", "agent_scoring.py")
+)
+agent_scoring = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(agent_scoring)
+
+
+class AgentsCollection:
+    """Applies the recorder's $set/$inc updates to in-memory agent documents"""
+    name = "agents"
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            for doc in self.docs:
+                if all(doc.get(k) == v for k, v in op._filter.items()):
+                    doc.update(op._doc.get("$set", {}))
+                    for field, amount in op._doc.get("$inc", {}).items():
+                        doc[field] = doc.get(field, 0) + amount
+
+
+class MetaCollection:
+
+    def __init__(self):
+        self.version = 0
+
+    async def update_one(self, query, update, upsert=False):
+        assert query == {"_id": "agents"}
+        self.version += update["$inc"]["version"]
+
+
+def seeded_agents():
+    common = {"success_rate": 100.0, "reliability_score": 1.0, "pricing": {"base_rate": 1.0}}
+    return [
+        {"_id": "1", "agent_id": "A1", "name": "WebScraperAgent", "average_latency_ms": 800, **common},
+        {"_id": "2", "agent_id": "A9", "name": "OtherScraper", "average_latency_ms": 1000, **common},
+    ]
+
+
+def test_recorded_latency_changes_routing_order():
+    agents, meta = seeded_agents(), MetaCollection()
+    recorder = AgentStatsRecorder(AgentsCollection(agents), meta, catalog_ids={"WebScraperAgent": "A1"})
+
+    ranked = agent_scoring.score_agents(agents)
+    assert ranked[0][1]["name"] == "WebScraperAgent"
+
+    for _ in range(5):
+        recorder.record("WebScraperAgent", 5000, True)
+    asyncio.run(recorder.writer.flush())
+
+    assert agents[0]["average_latency_ms"] == 5000
+    assert agents[0]["total_jobs_completed"] == 5
+    # The catalog version moved, so the db service's AgentCatalog reloads these figures.
+    assert meta.version == 1
+    ranked = agent_scoring.score_agents(agents)
+    assert ranked[0][1]["name"] == "OtherScraper"
+
+
+def test_agents_without_a_catalog_id_stay_local():
+    agents, meta = seeded_agents(), MetaCollection()
+    recorder = AgentStatsRecorder(AgentsCollection(agents), meta, catalog_ids={})
+    recorder.record("SentimentAgent", 100, True)
+    asyncio.run(recorder.writer.flush())
+    assert recorder.get("SentimentAgent").jobs == 1
+    assert recorder.writer.queue_depth() == 0
+    assert meta.version == 0
+
+
+def test_ewma_and_success_rate():
+    recorder = AgentStatsRecorder(AgentsCollection([]), catalog_ids={}, alpha=0.5)
+    recorder.record("A", 100, True)
+    recorder.record("A", 300, False)
+    snapshot = recorder.get("A").snapshot()
+    assert snapshot["ewma_latency_ms"] == 200
+    assert snapshot["success_rate"] == 50
+
+
+def test_reliability_is_a_longer_horizon_signal():
+    agents = seeded_agents()
+    recorder = AgentStatsRecorder(AgentsCollection(agents), catalog_ids={"WebScraperAgent": "A1"}, alpha=0.5)
+    for _ in range(20):
+        recorder.record("WebScraperAgent", 100, True)
+    for _ in range(3):
+        recorder.record("WebScraperAgent", 100, False)
+    asyncio.run(recorder.writer.flush())
+
+    # Three straight failures sink the short-term rate but barely move reliability.
+    assert agents[0]["success_rate"] == 12.5
+    assert agents[0]["reliability_score"] == round(20 / 23, 4)
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95])
+def test_p2_quantile_tracks_the_true_quantile(q):
+    estimate = P2Quantile(q)
+    values = [(i * 7919) % 1000 for i in range(5000)]
+    for value in values:
+        estimate.add(value)
+    exact = sorted(values)[int(q * (len(values) - 1))]
+    assert abs(estimate.value() - exact) < 25
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent_executor import cancellation
+from agent_executor.cancellation import CancelToken, JobCancelled, bind, check_cancelled, deadline_for, remaining
+from agent_executor import executor
+from agent_executor.executor import WebScraperExecutor
+from main import watch_deadline
+
+
+def test_requested_deadline_wins_over_the_task_default():
+    assert deadline_for("sentiment_analysis") == cancellation.TASK_DEADLINES_S["sentiment_analysis"]
+    assert deadline_for("unknown") == cancellation.DEFAULT_DEADLINE_S
+    assert deadline_for("sentiment_analysis", 5) == 5
+
+
+def test_children_follow_their_parent_but_cancel_alone():
+    parent = CancelToken(60)
+    first, second = parent.child(), parent.child()
+    first.cancel()
+    assert first.cancelled and not second.cancelled and not parent.cancelled
+    parent.cancel("timed_out")
+    assert second.cancelled and second.cancel_reason() == "timed_out"
+
+
+def test_deadline_cancels_with_timed_out():
+    token = CancelToken(0)
+    with bind(token), pytest.raises(JobCancelled) as exc:
+        check_cancelled()
+    assert exc.value.reason == "timed_out"
+
+
+def test_remaining_uses_the_nearest_deadline_in_the_chain():
+    parent = CancelToken(1)
+    child = CancelToken(60, parent=parent)
+    with bind(child):
+        assert remaining() <= 1
+    assert remaining("none") == "none"
+
+
+def test_browser_timeouts_are_never_zero(monkeypatch):
+    budget = WebScraperExecutor._budget_ms
+    assert budget(1500) == 1500
+    with bind(CancelToken(60)):
+        assert budget(1500) == 1500
+    with bind(CancelToken(0)), pytest.raises(JobCancelled):
+        budget(1500)
+    # A deadline a hair away still gets a real timeout, not Playwright's "none".
+    monkeypatch.setattr(executor, "remaining", lambda default=None: 0.0)
+    assert budget(1500) == 1
+
+
+def test_blocking_sleep_ends_when_the_job_is_cancelled():
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    started = time.monotonic()
+    with bind(token), pytest.raises(JobCancelled):
+        cancellation.sleep(10, poll=1)
+    assert time.monotonic() - started < 1
+
+
+def test_listeners_hear_deadline_moves_and_cancellation():
+    token = CancelToken(60)
+    heard = []
+    unsubscribe = token.subscribe(lambda: heard.append(token.deadline))
+    token.set_timeout(5)
+    token.cancel()
+    unsubscribe()
+    token.set_timeout(1)
+    assert len(heard) == 2
+
+
+def test_watchdog_wakes_when_the_deadline_is_brought_forward():
+    async def main():
+        token = CancelToken(30)
+        task = asyncio.create_task(asyncio.sleep(30))
+        watcher = asyncio.create_task(watch_deadline(task, token))
+        await asyncio.sleep(0.01)
+        # Routing picked a task type with a shorter deadline.
+        token.set_timeout(0.05)
+        started = time.monotonic()
+        await asyncio.wait_for(watcher, timeout=2)
+        return task, token, time.monotonic() - started
+
+    task, token, waited = asyncio.run(main())
+    assert task.cancelled()
+    assert token.cancel_reason() == "timed_out"
+    assert waited < 1
+
+
+def test_watchdog_returns_when_the_job_finishes():
+    async def main():
+        token = CancelToken(30)
+        task = asyncio.create_task(asyncio.sleep(0.01, result="done"))
+        await watch_deadline(task, token)
+        return task, token
+
+    task, token = asyncio.run(main())
+    assert task.result() == "done" and not token.cancelled
+    assert token._listeners == []
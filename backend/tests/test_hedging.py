@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent_executor.cancellation import current_token
+from agent_executor.context import RequestContext
+from agent_executor.event_queue import EventQueue
+from hedging import HedgeBudget, HedgedRunner
+
+
+class SlowThenFastRegistry:
+    """The first attempt hangs, every later one answers immediately"""
+
+    def __init__(self):
+        self.tokens = []
+
+    def resolve(self, agent_name, task_type):
+        return SimpleNamespace(name="WebScraperAgent")
+
+    async def run(self, agent_name, task_type, request, queue):
+        self.tokens.append(current_token())
+        if len(self.tokens) == 1:
+            await asyncio.sleep(10)
+        return self.resolve(agent_name, task_type), {"attempt": len(self.tokens)}
+
+
+class NoStats:
+
+    def get(self, agent_name):
+        return None
+
+
+def test_enabled_is_read_from_the_environment_at_construction(monkeypatch):
+    monkeypatch.setenv("HEDGE_ENABLED", "true")
+    assert HedgedRunner(None, NoStats()).enabled is True
+    monkeypatch.setenv("HEDGE_ENABLED", "false")
+    assert HedgedRunner(None, NoStats()).enabled is False
+    assert HedgedRunner(None, NoStats(), enabled=True).enabled is True
+
+
+def test_budget_earns_hedges_per_request_up_to_burst():
+    budget = HedgeBudget(ratio=0.5, burst=1.0)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    budget.on_request()
+    budget.on_request()
+    assert budget.try_acquire()
+    assert (budget.hedges, budget.denied) == (2, 1)
+
+
+def test_hedged_attempt_wins_and_the_primary_is_cancelled():
+    registry = SlowThenFastRegistry()
+    runner = HedgedRunner(registry, NoStats(), enabled=True, default_delay_ms=10)
+    queue = EventQueue()
+
+    agent, result = asyncio.run(runner.run("WebScraperAgent", "web_scrape", RequestContext(task_type="web_scrape"), queue))
+
+    assert result == {"attempt": 2}
+    primary_token, hedge_token = registry.tokens
+    assert primary_token.cancelled and not hedge_token.cancelled
+    assert any("Hedged attempt finished first" in e.message for e in queue.list_events())
+
+
+def test_no_hedge_without_budget():
+    registry = SlowThenFastRegistry()
+    runner = HedgedRunner(registry, NoStats(), budget=HedgeBudget(ratio=0, burst=0), enabled=True,
+                          default_delay_ms=10)
+
+    async def main():
+        task = asyncio.create_task(runner.run("WebScraperAgent", "web_scrape",
+                                              RequestContext(task_type="web_scrape"), EventQueue()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(main())
+    assert len(registry.tokens) == 1
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import main
+from agent_executor.cancellation import CancelToken
+from metrics import JOBS
+
+
+def jobs_counted(agent, status="completed"):
+    return JOBS.labels(agent, status)._value.get()
+
+
+@pytest.fixture
+def routed_to(monkeypatch):
+    def route(agent, task_type):
+        monkeypatch.setattr(main, "tundra_agent", lambda task: {"agent": agent, "task_type": task_type})
+
+    async def run(agent_name, task_type, request, queue, hedge=None):
+        return None, {"ok": True}
+
+    monkeypatch.setattr(main.hedger, "run", run)
+    return route
+
+
+def process(job_id):
+    asyncio.run(main.process_job({"job_id": job_id, "task": "anything"}, CancelToken()))
+
+
+def test_unregistered_agent_names_are_not_used_as_labels(routed_to):
+    routed_to("Totally new agent #1234", "made_up_task")
+    before = jobs_counted("GenericAgent")
+    process("job-label-1")
+    assert jobs_counted("GenericAgent") == before + 1
+    assert not any(
+        sample.labels.get("agent") == "Totally new agent #1234"
+        for metric in JOBS.collect() for sample in metric.samples
+    )
+
+
+def test_unknown_names_fall_back_to_the_task_types_agent(routed_to):
+    routed_to("sentiment bot", "sentiment_analysis")
+    before = jobs_counted("SentimentAgent")
+    process("job-label-2")
+    assert jobs_counted("SentimentAgent") == before + 1
+
+
+def test_agent_label():
+    assert main.agent_label(None, None) == "none"
+    assert main.agent_label("SummarizerAgent", "web_scrape") == "SummarizerAgent"
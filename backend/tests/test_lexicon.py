@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from agent_executor import lexicon
+from agent_executor.lexicon import LexiconStore, LexiconView, default_lexicon_store, write_lexicon
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "finance.tlex")
+    write_lexicon(path, {"Rally": 1.5, "sell  off": -2.0, "café": 0.5})
+    view = LexiconView(path)
+    assert view.count == 3
+    assert view.lookup("rally") == 1.5
+    assert view.lookup("SELL OFF") == -2.0
+    assert view.lookup("café") == 0.5
+    assert view.lookup("missing") is None
+    assert dict(view.items()) == {"rally": 1.5, "sell off": -2.0, "café": 0.5}
+
+
+def test_rejects_foreign_and_truncated_files(tmp_path):
+    path = tmp_path / "bad.tlex"
+    path.write_bytes(b"NOPE" + b"\0" * 16)
+    with pytest.raises(ValueError):
+        LexiconView(str(path))
+
+    write_lexicon(str(path), {"gain": 1.0})
+    path.write_bytes(path.read_bytes()[:-2])
+    with pytest.raises(ValueError):
+        LexiconView(str(path))
+
+
+def test_store_hot_reloads_replaced_file(tmp_path):
+    path = str(tmp_path / "lexicon.tlex")
+    write_lexicon(path, {"gain": 1.0})
+    store = LexiconStore(path, check_interval=0)
+    assert store.matcher().score("gain")["positive_score"] == 1.0
+
+    write_lexicon(path, {"gain": 3.0})
+    assert store.matcher().score("gain")["positive_score"] == 3.0
+
+    # A broken replacement keeps the last good generation. (Replaced, not
+    # rewritten in place: the current generation is matched from its mapping.)
+    with open(path + ".new", "wb") as f:
+        f.write(b"junk")
+    os.replace(path + ".new", path)
+    assert store.matcher().score("gain")["positive_score"] == 3.0
+
+
+def test_missing_lexicon_falls_back_to_built_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexicon, "_default_store", None)
+    monkeypatch.setenv("SENTIMENT_LEXICON_PATH", str(tmp_path / "missing.tlex"))
+    assert default_lexicon_store() is None
+
+    monkeypatch.delenv("SENTIMENT_LEXICON_PATH")
+    assert default_lexicon_store() is None
+
+
+def test_matching_reads_the_mapped_table(tmp_path):
+    path = str(tmp_path / "big.tlex")
+    terms = {f"term{i}": float(i % 7 - 3) for i in range(5000)}
+    terms["sell off"] = -2.0
+    write_lexicon(path, terms)
+    view = LexiconView(path)
+    matcher = view.build_matcher()
+
+    assert matcher.table is view
+    assert all(view.lookup(term) == weight for term, weight in terms.items())
+    assert view.index("term5000") is None
+    assert matcher.score("term4 and a sell off")["negative_score"] == 2.0
+    assert matcher.score("term4 and a sell off")["positive_score"] == 1.0
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from agent_executor import cancellation
+
+
+def test_routing_runs_off_the_event_loop_under_a_deadline(monkeypatch):
+    seen = {}
+
+    def tundra_agent(user_query):
+        seen["thread"] = threading.current_thread()
+        seen["remaining"] = cancellation.remaining()
+        return {"agent": "SentimentAgent", "task_type": "sentiment_analysis", "payload": {"text": "profit surge"}}
+
+    monkeypatch.setattr(main, "tundra_agent", tundra_agent)
+    result = asyncio.run(main.multi_agent_orchestration("how do people feel?"))
+
+    assert seen["thread"] is not threading.main_thread()
+    assert seen["remaining"] is not None
+    assert result["final_result"]["sentiment_analysis"]["sentiment"] == "positive"
+
+
+def test_deadline_stops_a_slow_routing_call(monkeypatch):
+    monkeypatch.setattr(cancellation, "DEFAULT_DEADLINE_S", 0.05)
+    stopped = threading.Event()
+
+    def tundra_agent(user_query):
+        try:
+            cancellation.sleep(5, poll=0.01)
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(main, "tundra_agent", tundra_agent)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(main.multi_agent_orchestration("anything"))
+    assert exc.value.status_code == 504
+    assert stopped.wait(1)
+
+
+def test_decisions_are_dispatched_through_the_registry(monkeypatch):
+    monkeypatch.setattr(main, "tundra_agent", lambda query: {
+        "agent": "SummarizerAgent", "task_type": "summarize", "payload": {"data": "a short text"}
+    })
+    result = asyncio.run(main.multi_agent_orchestration("summarize this"))
+
+    assert [step["agent"] for step in result["orchestration_log"]] == ["SummarizerAgent"]
+    assert result["final_result"]["summary"]["summary"] == "a short text"
@@ -0,0 +1,106 @@
+import asyncio
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, InvalidDocument
+
+from persistence import WriteBehindWriter, merge_update
+
+
+class FakeCollection:
+    name = "test"
+
+    def __init__(self, failures=()):
+        self.batches = []
+        self.failures = list(failures)
+
+    async def bulk_write(self, ops, ordered=True):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.batches.append(list(ops))
+
+
+def flush(writer):
+    asyncio.run(writer.flush())
+    return [op for batch in writer.collection.batches for op in batch]
+
+
+def test_updates_fold_into_a_pending_insert():
+    writer = WriteBehindWriter(FakeCollection(), key_field="job_id")
+    writer.insert({"job_id": "a", "status": "pending", "tries": 1, "tmp": True})
+    writer.update({"job_id": "a"}, {"$set": {"status": "done"}, "$inc": {"tries": 2}, "$unset": {"tmp": ""}})
+    assert flush(writer) == [InsertOne({"job_id": "a", "status": "done", "tries": 3})]
+
+
+def test_unsupported_operator_is_queued_behind_the_insert():
+    writer = WriteBehindWriter(FakeCollection(), key_field="job_id")
+    writer.insert({"job_id": "a", "tags": []})
+    writer.update({"job_id": "a"}, {"$push": {"tags": "x"}})
+    writer.update({"job_id": "a"}, {"$set": {"status": "done"}})
+    assert flush(writer) == [
+        InsertOne({"job_id": "a", "tags": []}),
+        UpdateOne({"job_id": "a"}, {"$push": {"tags": "x"}}),
+        UpdateOne({"job_id": "a"}, {"$set": {"status": "done"}}),
+    ]
+
+
+def test_updates_merge_by_operator():
+    writer = WriteBehindWriter(FakeCollection())
+    writer.update({"_id": 1}, {"$inc": {"n": 1}, "$setOnInsert": {"day": "mon"}}, upsert=True)
+    writer.update({"_id": 1}, {"$inc": {"n": 2}, "$setOnInsert": {"day": "tue"}}, upsert=True)
+    assert flush(writer) == [UpdateOne({"_id": 1}, {"$inc": {"n": 3}, "$setOnInsert": {"day": "mon"}}, upsert=True)]
+
+
+def test_conflicting_updates_are_not_merged():
+    merged = {"$set": {"a": 1}}
+    assert not merge_update(merged, {"$unset": {"a": ""}})
+    assert not merge_update(merged, {"$inc": {"a.b": 1}})
+    assert merged == {"$set": {"a": 1}}
+    assert merge_update(merged, {"$set": {"a": 2}, "$inc": {"b": 1}})
+    assert merged == {"$set": {"a": 2}, "$inc": {"b": 1}}
+
+
+def test_failed_op_is_dropped_and_the_rest_sent():
+    error = BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "duplicate key"}]})
+    writer = WriteBehindWriter(FakeCollection([error]))
+    writer.insert({"n": 1})
+    writer.insert({"n": 2})
+    assert flush(writer) == [InsertOne({"n": 2})]
+    assert writer.dropped == 1
+
+
+def test_write_concern_error_is_not_resent():
+    error = BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"errmsg": "timeout"}]})
+    writer = WriteBehindWriter(FakeCollection([error]))
+    writer.insert({"n": 1})
+    assert flush(writer) == []
+    assert writer.queue_depth() == 0
+
+
+def test_unwritable_batch_is_retried_then_dropped():
+    writer = WriteBehindWriter(FakeCollection([InvalidDocument("bad key")] * 3), max_attempts=3)
+    writer.insert({"n": 1})
+    for _ in range(2):
+        asyncio.run(writer.flush())
+        assert writer.queue_depth() == 1
+    asyncio.run(writer.flush())
+    assert writer.queue_depth() == 0
+    assert writer.dropped == 1
+
+    writer.insert({"n": 2})
+    assert flush(writer) == [InsertOne({"n": 2})]
+
+
+def test_writes_are_kept_while_mongo_is_unreachable():
+    writer = WriteBehindWriter(FakeCollection([AutoReconnect()] * 5), max_attempts=3, max_queue=3)
+    writer.insert({"n": 1})
+    for _ in range(5):
+        asyncio.run(writer.flush())
+    assert writer.dropped == 0
+    assert writer.retry_in() > 0
+    writer.insert({"n": 2})
+    assert not writer.full()
+    writer.insert({"n": 3})
+    assert writer.full()
+
+    assert flush(writer) == [InsertOne({"n": 1}), InsertOne({"n": 2}), InsertOne({"n": 3})]
+    assert not writer.full()
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from rate_limit import APIKeyTiers, InMemoryBackend, RateLimiter, TierPolicy, rate_limited
+
+TIERS = {
+    "free": TierPolicy(rate=1.0, burst=2, max_in_flight=1),
+    "pro": TierPolicy(rate=10.0, burst=20, max_in_flight=5, priority="high"),
+}
+PRO_KEY = "tundra-pro-key"
+PRO_HASH = hashlib.sha256(PRO_KEY.encode()).hexdigest()
+
+
+def request(host="10.0.0.1"):
+    return SimpleNamespace(client=SimpleNamespace(host=host))
+
+
+class KeysCollection:
+    name = "api_keys"
+
+    def __init__(self, docs, error=None):
+        self.docs = docs
+        self.error = error
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        if self.error:
+            raise self.error
+        return next((
+            {"tier": d["tier"]} if "tier" in d else {}
+            for d in self.docs if d["key_hash"] == query["key_hash"] and d["active"] == query["active"]
+        ), None)
+
+
+@pytest.fixture
+def keys():
+    return KeysCollection([
+        {"key_hash": PRO_HASH, "active": True, "tier": "pro"},
+        {"key_hash": hashlib.sha256(b"plain-key").hexdigest(), "active": True},
+        {"key_hash": hashlib.sha256(b"revoked-key").hexdigest(), "active": False, "tier": "pro"},
+    ])
+
+
+@pytest.fixture
+def limiter(keys):
+    return RateLimiter(InMemoryBackend(), APIKeyTiers(keys), tiers=TIERS)
+
+
+def test_keys_get_their_own_bucket_and_the_tier_on_their_document(limiter, keys):
+    key = asyncio.run(limiter.caller_key(request(), PRO_KEY))
+    assert key == "key:" + PRO_HASH
+    assert limiter.policy_for(key).priority == "high"
+    plain = asyncio.run(limiter.caller_key(request(), "plain-key"))
+    assert limiter.tier_for(plain) == "free"
+    # Cached: the second check of the same key doesn't hit Mongo.
+    asyncio.run(limiter.caller_key(request(), PRO_KEY))
+    assert keys.lookups == 2
+
+
+@pytest.mark.parametrize("api_key", ["random-key", "revoked-key"])
+def test_unknown_and_revoked_keys_are_refused(limiter, api_key):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(rate_limited(limiter)(request(), x_api_key=api_key))
+    assert exc.value.status_code == 401
+
+
+def test_callers_without_a_key_are_limited_by_address(limiter):
+    dependency = rate_limited(limiter)
+
+    async def main():
+        keys = [await dependency(request(), x_api_key=None) for _ in range(2)]
+        with pytest.raises(HTTPException) as exc:
+            await dependency(request(), x_api_key=None)
+        return keys, exc.value
+
+    keys, error = asyncio.run(main())
+    assert keys == ["ip:10.0.0.1", "ip:10.0.0.1"]
+    assert error.status_code == 429
+    assert error.headers["Retry-After"] == "1"
+    # Another address has its own bucket.
+    assert asyncio.run(dependency(request("10.0.0.2"), x_api_key=None)) == "ip:10.0.0.2"
+
+
+def test_keys_fall_back_to_the_address_while_mongo_is_down():
+    limiter = RateLimiter(InMemoryBackend(), APIKeyTiers(KeysCollection([], ServerSelectionTimeoutError())))
+    assert asyncio.run(limiter.caller_key(request(), PRO_KEY)) == "ip:10.0.0.1"
+
+
+def test_key_cache_is_bounded():
+    tiers = APIKeyTiers(KeysCollection([]), max_entries=3)
+    for i in range(10):
+        asyncio.run(tiers.tier(f"h{i}"))
+    assert list(tiers._cache) == ["h7", "h8", "h9"]
+
+
+def test_in_flight_slots_are_capped_and_released(limiter):
+    async def main():
+        await limiter.acquire_slot("ip:a")
+        with pytest.raises(HTTPException):
+            await limiter.acquire_slot("ip:a")
+        await limiter.release_slot("ip:a")
+        await limiter.acquire_slot("ip:a")
+
+    asyncio.run(main())
+    assert limiter.limited == 1
+
+
+def test_refilled_buckets_are_swept(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("rate_limit.time.monotonic", lambda: now[0])
+    backend = InMemoryBackend(sweep_interval=10)
+    policy = TIERS["free"]
+
+    for i in range(50):
+        asyncio.run(backend.take_token(f"ip:{i}", policy))
+    assert len(backend.buckets) == 50
+
+    # One token back at 1/s: full again after a second, swept at the next interval.
+    now[0] += 11
+    asyncio.run(backend.take_token("ip:new", policy))
+    assert list(backend.buckets) == ["ip:new"]
+
+
+def test_bucket_refills_at_the_tier_rate(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("rate_limit.time.monotonic", lambda: now[0])
+    backend = InMemoryBackend()
+    policy = TIERS["free"]
+
+    assert asyncio.run(backend.take_token("k", policy)) == (True, 0.0)
+    assert asyncio.run(backend.take_token("k", policy)) == (True, 0.0)
+    allowed, retry_after = asyncio.run(backend.take_token("k", policy))
+    assert not allowed and retry_after == pytest.approx(1.0)
+    now[0] += 1
+    assert asyncio.run(backend.take_token("k", policy))[0]
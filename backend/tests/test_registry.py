@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+
+from agent_executor.cancellation import CancelToken, JobCancelled, bind, current_token
+from agent_executor.context import RequestContext, TaskState
+from agent_executor.event_queue import EventQueue
+from agent_executor.executor import AgentExecutor
+from agent_executor.registry import AgentRegistry
+
+
+class FakeStats:
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, agent_name, latency_ms, success):
+        self.records.append((agent_name, success))
+
+
+@pytest.fixture
+def registry():
+    registry = AgentRegistry(llm_client=None, stats=FakeStats())
+    yield registry
+    registry.shutdown()
+
+
+def test_resolve_by_name_then_task_type(registry):
+    assert registry.resolve("SummarizerAgent", None) is registry.get("SummarizerAgent")
+    assert registry.resolve("Unknown", "sentiment_analysis") is registry.get("SentimentAgent")
+    assert registry.resolve(None, "unknown") is registry.fallback
+
+
+def test_run_reuses_executors_and_records_stats(registry):
+    request = RequestContext(task_type="sentiment_analysis", payload={"text": "profit surge"})
+    agent, result = asyncio.run(registry.run("SentimentAgent", "sentiment_analysis", request, EventQueue()))
+    assert agent is registry.get("SentimentAgent")
+    assert result["sentiment"] == "positive"
+
+    request = RequestContext(task_type="sentiment_analysis", payload={})
+    asyncio.run(registry.run("SentimentAgent", "sentiment_analysis", request, EventQueue()))
+    assert registry.stats.records == [("SentimentAgent", True), ("SentimentAgent", False)]
+
+
+def test_cancelled_runs_are_not_recorded(registry):
+    class Cancelled(AgentExecutor):
+        def execute(self, request, queue):
+            raise JobCancelled("cancelled")
+
+    registry.agents["SentimentAgent"] = Cancelled("SentimentAgent")
+    request = RequestContext(task_type="sentiment_analysis")
+    with pytest.raises(JobCancelled):
+        asyncio.run(registry.run("SentimentAgent", None, request, EventQueue()))
+    assert registry.stats.records == []
+    assert request.state == TaskState.cancelled
+
+
+def test_runs_past_their_deadline_are_marked_timed_out(registry):
+    class Slow(AgentExecutor):
+        async def execute(self, request, queue):
+            await asyncio.sleep(60)
+
+    registry.agents["SentimentAgent"] = Slow("SentimentAgent")
+    request = RequestContext(task_type="sentiment_analysis")
+    token = CancelToken(0.01)
+
+    async def main():
+        with bind(token):
+            task = asyncio.create_task(registry.run("SentimentAgent", None, request, EventQueue()))
+            await asyncio.sleep(0.05)
+            assert token.cancelled
+            task.cancel()
+            await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+    assert request.state == TaskState.timed_out
+
+
+def test_synchronous_executors_run_off_the_event_loop(registry):
+    seen = {}
+
+    class Probe(AgentExecutor):
+        def execute(self, request, queue):
+            seen["thread"] = threading.current_thread().name
+            seen["token"] = current_token()
+            return {"ok": True}
+
+    registry.agents["SentimentAgent"] = Probe("SentimentAgent")
+    token = CancelToken(60)
+
+    async def main():
+        with bind(token):
+            return await registry.run("SentimentAgent", None, RequestContext(task_type="sentiment_analysis"), EventQueue())
+
+    _, result = asyncio.run(main())
+    assert result == {"ok": True}
+    assert seen["thread"].startswith("compute")
+    assert seen["token"] is token
@@ -0,0 +1,102 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+import resilience
+from agent_executor.cancellation import CancelToken, bind
+from resilience import CircuitBreaker, CircuitOpen, RetryPolicy, TransientError
+
+
+def test_breaker_opens_after_consecutive_transient_failures():
+    circuit = CircuitBreaker("dep", failure_threshold=2, reset_timeout=30)
+    circuit.on_failure(TransientError("503"))
+    circuit.on_success()
+    circuit.on_failure(TransientError("503"))
+    assert circuit.state == "closed"
+    circuit.on_failure(TransientError("503"))
+    assert circuit.state == "open"
+    with pytest.raises(CircuitOpen):
+        circuit.before_call()
+    assert circuit.rejected == 1
+
+
+def test_half_open_lets_one_trial_through(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    circuit = CircuitBreaker("dep", failure_threshold=1, reset_timeout=30)
+    circuit.on_failure(TransientError("503"))
+
+    now[0] += 31
+    circuit.before_call()
+    assert circuit.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        circuit.before_call()
+
+    # A failed trial reopens, a successful one closes.
+    circuit.on_failure(TransientError("503"))
+    assert circuit.state == "open"
+    now[0] += 31
+    circuit.before_call()
+    circuit.on_success()
+    assert circuit.state == "closed"
+
+
+def test_permanent_errors_do_not_count_against_the_breaker():
+    circuit = CircuitBreaker("dep", failure_threshold=1)
+    circuit.on_failure(ValueError("bad request"))
+    assert circuit.state == "closed"
+
+
+def test_retry_after_is_a_floor_within_the_deadline():
+    policy = RetryPolicy(attempts=3, base_delay=0.1, max_delay=1.0)
+    with bind(CancelToken(60)):
+        assert policy.next_delay(0, TransientError("429", retry_after=5)) == 5
+    with bind(CancelToken(2)):
+        assert policy.next_delay(0, TransientError("429", retry_after=5)) is None
+
+
+def test_retry_after_is_capped_without_a_deadline():
+    policy = RetryPolicy(attempts=3, base_delay=0.1, max_delay=1.0)
+    assert policy.next_delay(0, TransientError("429", retry_after=3600)) == 1.0
+
+
+def test_no_retry_for_permanent_errors_or_the_last_attempt():
+    policy = RetryPolicy(attempts=2)
+    assert policy.next_delay(0, ValueError("bad request")) is None
+    assert policy.next_delay(1, TransientError("503")) is None
+
+
+def test_call_retries_transient_failures(monkeypatch):
+    monkeypatch.setattr(resilience, "sleep", lambda seconds: None)
+    fn = mock.Mock(side_effect=[TransientError("503"), "ok"])
+    assert resilience.call("test-call-retry", fn, RetryPolicy(attempts=3)) == "ok"
+    assert fn.call_count == 2
+    assert resilience.breaker("test-call-retry").state == "closed"
+
+
+def test_call_async_awaits_and_gives_up_on_permanent_errors():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(resilience.call_async("test-call-async", fn, RetryPolicy(attempts=3)))
+    assert len(calls) == 1
+
+
+def test_breaker_registry_is_bounded_and_keeps_open_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", resilience.OrderedDict())
+    monkeypatch.setattr(resilience, "MAX_BREAKERS", 3)
+    down = resilience.breaker("site:down.example")
+    for _ in range(down.failure_threshold):
+        down.on_failure(TransientError("503"))
+    for i in range(10):
+        resilience.breaker(f"site:{i}.example")
+
+    assert list(resilience._breakers) == ["site:down.example", "site:8.example", "site:9.example"]
+    assert resilience.breaker("site:down.example") is down
+    # Health only lists the breakers that are failing calls.
+    assert list(resilience.metrics()) == ["site:down.example"]
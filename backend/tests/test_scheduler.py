@@ -0,0 +1,92 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+import scheduler
+from scheduler import FairScheduler
+
+
+def job(job_id, priority="normal", user_id="u1"):
+    return {"job_id": job_id, "priority": priority, "user_id": user_id}
+
+
+def drain(queue, n=None):
+    served = []
+    while queue.qsize() and (n is None or len(served) < n):
+        served.append(queue._pop()["job_id"])
+    return served
+
+
+def test_classes_share_the_worker_by_weight():
+    queue = FairScheduler(weights={"high": 4.0, "normal": 2.0, "low": 1.0})
+    for i in range(20):
+        for priority in ("high", "normal", "low"):
+            queue.put_nowait(job(f"{priority}-{i}", priority))
+
+    served = Counter(job_id.split("-")[0] for job_id in drain(queue, 14))
+    assert served == {"high": 8, "normal": 4, "low": 2}
+
+
+def test_users_in_a_class_take_turns():
+    queue = FairScheduler()
+    for i in range(5):
+        queue.put_nowait(job(f"bulk-{i}", user_id="bulk"))
+    queue.put_nowait(job("other-0", user_id="other"))
+    queue.put_nowait(job("other-1", user_id="other"))
+    assert drain(queue, 4) == ["bulk-0", "other-0", "bulk-1", "other-1"]
+
+
+def test_an_idle_user_rejoins_without_banked_credit():
+    queue = FairScheduler()
+    for i in range(4):
+        queue.put_nowait(job(f"a-{i}", user_id="a"))
+    drain(queue, 3)
+    # b was idle while a was served: it starts at the current virtual time and
+    # alternates with a, rather than running all its jobs on banked credit.
+    for i in range(3):
+        queue.put_nowait(job(f"b-{i}", user_id="b"))
+    queue.put_nowait(job("a-4", user_id="a"))
+    assert drain(queue) == ["b-0", "a-3", "b-1", "a-4", "b-2"]
+
+
+def test_starving_jobs_are_promoted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    queue = FairScheduler(weights={"low": 0.001}, starve_after_s=60)
+    queue.put_nowait(job("low-0", "low"))
+    queue.put_nowait(job("low-1", "low"))
+    now[0] += 1
+    for i in range(50):
+        queue.put_nowait(job(f"high-{i}", "high"))
+
+    # After one turn the low class's pass is far ahead of the high class's.
+    assert drain(queue, 4) == ["high-0", "low-0", "high-1", "high-2"]
+    now[0] += 59.5
+    assert drain(queue, 2) == ["low-1", "high-3"]
+    assert queue.promoted == 1
+
+
+def test_removed_jobs_are_never_served():
+    queue = FairScheduler()
+    queue.put_nowait(job("a", user_id="x"))
+    queue.put_nowait(job("b", user_id="y"))
+    assert queue.remove("a")["job_id"] == "a"
+    assert queue.remove("a") is None
+    assert queue.get_job("a") is None
+    assert drain(queue) == ["b"]
+    assert queue.metrics()["users_waiting"] == 0
+
+
+def test_maxsize_and_blocking_get():
+    queue = FairScheduler(maxsize=1)
+
+    async def main():
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        queue.put_nowait(job("a"))
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(job("b"))
+        return await getter
+
+    assert asyncio.run(main())["job_id"] == "a"
@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+
+from agent_executor.sentiment import DEFAULT_MATCHER, LexiconMatcher, TermTable
+
+
+def hits(text, matcher=DEFAULT_MATCHER):
+    return list(matcher.iter_hits(text))
+
+
+def test_terms_match_on_word_boundaries():
+    assert hits("supply is up") == [("up", False)]
+    assert hits("Profit, profit and more PROFIT") == [("profit", False)] * 3
+
+
+def test_negation_window_and_clause_breaks():
+    assert hits("not up") == [("up", True)]
+    assert hits("not a b up") == [("up", True)]
+    assert hits("not a b c up") == [("up", False)]
+    assert hits("not a. up") == [("up", False)]
+    assert hits("shares didn't surge") == [("surge", True)]
+
+
+def test_negation_counts_words_across_several_hits():
+    # "gain" is two words after "never", "loss" four: only the first is flipped.
+    assert hits("never a gain or a loss") == [("gain", True), ("loss", False)]
+
+
+def test_multi_word_terms_win_over_their_parts():
+    matcher = LexiconMatcher({"not bad": 1.0, "bad": -1.0})
+    assert hits("not bad at all", matcher) == [("not bad", False)]
+
+
+def test_long_text_after_a_negator_stays_linear():
+    text = "not " + "word " * 50000 + "up " * 1000
+    assert sum(negated for _, negated in hits(text)) == 0
+
+
+def test_score_batch_agrees_with_score():
+    texts = ["profit up", "not a decline", "crash; no gain", ""]
+    batch = DEFAULT_MATCHER.score_batch(texts)
+    for i, text in enumerate(texts):
+        single = DEFAULT_MATCHER.score(text)
+        assert np.isclose(batch["positive_score"][i], single["positive_score"])
+        assert np.isclose(batch["negative_score"][i], single["negative_score"])
+        assert batch["positive_hits"][i] == single["positive_hits"]
+
+
+def synthetic_lexicon(n):
+    lexicon = {f"term{i}": (1.0 if i % 2 else -1.0) for i in range(n)}
+    lexicon.update({f"term{i} phrase": 2.0 for i in range(0, n, 10)})
+    return lexicon
+
+
+class CountingTable(TermTable):
+
+    def __init__(self, lexicon):
+        super().__init__(lexicon)
+        self.probes = 0
+
+    def index(self, term):
+        self.probes += 1
+        return super().index(term)
+
+
+def test_lookups_per_word_do_not_grow_with_the_lexicon():
+    text = " ".join(f"term{i * 7 % 6000} word" for i in range(2500))
+    probes = []
+    for size in (16, 5000):
+        table = CountingTable(synthetic_lexicon(size))
+        LexiconMatcher(table=table).score(text)
+        probes.append(table.probes)
+    # At most one probe per n-gram length per word, whatever the lexicon size.
+    assert probes[1] <= 2 * 5000
+    assert probes[1] <= probes[0] * 1.5
+
+
+def test_large_lexicon_batch_scoring_is_fast():
+    matcher = LexiconMatcher(synthetic_lexicon(5000))
+    headlines = [f"term{i} surges as term{i + 1} phrase falls, not term{i + 2}" for i in range(1000)]
+    started = time.perf_counter()
+    scores = matcher.score_batch(headlines)
+    assert time.perf_counter() - started < 0.5
+    assert scores["positive_hits"].sum() + scores["negative_hits"].sum() == 3000
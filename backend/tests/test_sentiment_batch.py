@@ -0,0 +1,53 @@
+import pytest
+from pydantic import ValidationError
+
+from agent_executor.executor import SentimentExecutor
+from agent_executor.sentiment import DEFAULT_MATCHER
+import models
+from models import MAX_SENTIMENT_BATCH, MAX_SENTIMENT_TEXT_CHARS, BatchSentimentRequest
+
+
+def executor():
+    return SentimentExecutor("SentimentAgent", matcher=DEFAULT_MATCHER)
+
+
+def test_batch_items_match_single_analysis():
+    texts = ["profit and growth", "shares crash", "no news", "not a gain"]
+    agent = executor()
+    batch = agent.analyze_batch(texts)
+    for item, text in zip(batch["items"], texts):
+        single = agent.analyze_sentiment(text)
+        assert item["sentiment"] == single["sentiment"]
+        assert item["confidence_score"] == single["confidence_score"]
+
+
+def test_batch_aggregate():
+    aggregate = executor().analyze_batch(["profit up", "surge", "loss"])["aggregate"]
+    assert aggregate["sentiment"] == "positive"
+    assert (aggregate["positive_items"], aggregate["negative_items"], aggregate["neutral_items"]) == (2, 1, 0)
+    assert aggregate["confidence_score"] == 0.6
+
+
+def test_empty_batch_is_neutral():
+    aggregate = executor().analyze_batch([])["aggregate"]
+    assert aggregate["sentiment"] == "neutral"
+    assert aggregate["mean_confidence"] == 0.0
+
+
+def test_batch_request_size_is_capped():
+    BatchSentimentRequest(texts=["x"] * MAX_SENTIMENT_BATCH)
+    with pytest.raises(ValidationError):
+        BatchSentimentRequest(texts=["x"] * (MAX_SENTIMENT_BATCH + 1))
+
+
+def test_batch_accepts_thousands_of_texts():
+    assert len(BatchSentimentRequest(texts=["profit up"] * 5000).texts) == 5000
+
+
+def test_text_length_and_total_size_are_bounded(monkeypatch):
+    with pytest.raises(ValidationError):
+        BatchSentimentRequest(texts=["x" * (MAX_SENTIMENT_TEXT_CHARS + 1)])
+    monkeypatch.setattr(models, "MAX_SENTIMENT_BATCH_CHARS", 100)
+    BatchSentimentRequest(texts=["x" * 50] * 2)
+    with pytest.raises(ValidationError):
+        BatchSentimentRequest(texts=["x" * 50] * 3)
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from agent_executor.cancellation import CancelToken, bind, current_token
+from agent_executor.context import RequestContext
+from rate_limit import InMemoryBackend, RateLimiter
+from scheduler import FairScheduler
+from singleflight import JobCoalescer, SingleFlight, bypass, normalize_text, normalize_url
+
+
+def test_normalization():
+    assert normalize_url("HTTPS://Example.com?q=1#top") == "https://example.com/?q=1"
+    assert normalize_text("  Scrape   THE news ") == "scrape the news"
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert (len(runs), flight.coalesced) == (1, 2)
+    assert flight.metrics()["in_flight"] == 0
+
+
+def test_bypass_runs_alone():
+    flight = SingleFlight("test")
+
+    async def work():
+        return current_token()
+
+    async def main():
+        with bypass():
+            return await flight.do("k", work)
+
+    assert asyncio.run(main()) is None
+    assert flight.executions == 0
+
+
+def test_a_follower_keeps_the_work_alive_after_the_leader_gives_up():
+    flight = SingleFlight("test")
+    seen = {}
+
+    async def work():
+        seen["token"] = current_token()
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def caller(deadline_s):
+        with bind(CancelToken(deadline_s)) as token:
+            return await asyncio.wait_for(flight.do("k", work), token.remaining())
+
+    async def main():
+        leader = asyncio.create_task(caller(0.02))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(caller(5))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(main())
+    assert isinstance(leader, asyncio.TimeoutError)
+    assert follower == "result"
+    assert not seen["token"].cancelled
+
+
+def test_the_work_is_cancelled_once_every_caller_is_gone():
+    flight = SingleFlight("test")
+    seen = {}
+
+    async def work():
+        seen["token"] = current_token()
+        await asyncio.sleep(5)
+
+    async def main():
+        callers = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for task in callers:
+            task.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert seen["token"].cancel_reason() == "cancelled"
+
+
+def test_job_coalescer_only_follows_running_jobs():
+    coalescer = JobCoalescer()
+    # Queued jobs lead nothing, so each keeps its own place in the queue.
+    assert coalescer.attach("k", {"job_id": "queued"}) is None
+    assert coalescer.start("k", {"job_id": "leader"}) is None
+    assert coalescer.attach("k", {"job_id": "f1"}) == "leader"
+    assert coalescer.start("k", {"job_id": "queued"}) == "leader"
+    assert coalescer.follower("f1")["job_id"] == "f1"
+    assert coalescer.detach("f1")["job_id"] == "f1"
+
+    key, followers = coalescer.release("leader")
+    assert key == "k" and [job["job_id"] for job in followers] == ["queued"]
+    assert coalescer.attach("k", {"job_id": "f2"}) is None
+    assert coalescer.metrics() == {"leaders": 0, "followers": 0, "coalesced": 2}
+
+
+def test_followers_of_a_cancelled_leader_requeue_in_their_own_flows(monkeypatch):
+    monkeypatch.setattr(main, "job_coalescer", JobCoalescer())
+    monkeypatch.setattr(main, "job_queue", FairScheduler())
+    job = {"task": "Scrape the news", "url": "https://example.com"}
+    a = {**job, "job_id": "a", "rate_limit_key": "key:a"}
+    b = {**job, "job_id": "b", "rate_limit_key": "key:b"}
+    c = {**job, "job_id": "c", "rate_limit_key": "key:c"}
+
+    main.job_coalescer.start(main.job_key(a), a)
+    assert main.job_coalescer.attach(main.job_key(b), b) == "a"
+    assert main.job_coalescer.attach(main.job_key(c), c) == "a"
+    asyncio.run(main.settle_followers("a", {"status": "cancelled"}))
+
+    assert main.job_queue.qsize() == 2
+    assert main.job_queue.get_job("b")["rate_limit_key"] == "key:b"
+    assert main.job_coalescer.metrics()["leaders"] == 0
+
+
+def test_jobs_only_coalesce_on_the_same_terms():
+    base = {"task": "Scrape the news", "url": "https://example.com"}
+    assert main.job_key(base) == main.job_key({**base, "task": "  scrape THE news"})
+    assert main.job_key(base) == main.job_key({**base, "priority": "high"})
+    for field, value in (("deadline_s", 30), ("budget", 5.0), ("hedge", True)):
+        assert main.job_key(base) != main.job_key({**base, field: value})
+
+
+@pytest.fixture
+def execute(monkeypatch):
+    monkeypatch.setattr(main, "limiter", RateLimiter(InMemoryBackend()))
+    monkeypatch.setattr(main, "execute_flight", SingleFlight("execute"))
+    seen = {"tokens": []}
+    release = threading.Event()
+
+    def tundra_agent(user_request):
+        token = current_token()
+        seen["tokens"].append(token)
+        # Blocks like a browser thread, until released or the job is cancelled.
+        while not release.wait(0.01):
+            token.check()
+        return {"agent": "SentimentAgent", "task_type": "sentiment_analysis", "payload": {"text": "profit surge"}}
+
+    monkeypatch.setattr(main, "tundra_agent", tundra_agent)
+    return seen, release
+
+
+def call_execute(deadline_s):
+    request = RequestContext(task_type="sentiment_analysis", payload={"text": "profit surge"}, deadline_s=deadline_s)
+    return main.tundra_execute(request, caller="ip:c")
+
+
+def test_execute_callers_time_out_on_their_own_deadlines(execute):
+    seen, release = execute
+
+    async def run():
+        leader = asyncio.create_task(call_execute(0.05))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(call_execute(5))
+        await asyncio.wait({leader})
+        release.set()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(run())
+    assert isinstance(leader, HTTPException) and leader.status_code == 504
+    assert follower["result"]["sentiment"] == "positive"
+    assert len(seen["tokens"]) == 1
+
+
+def test_execute_cancellation_reaches_the_worker_thread(execute):
+    seen, release = execute
+
+    async def run():
+        with pytest.raises(HTTPException):
+            await call_execute(0.05)
+        # The worker thread sees the shared token cancelled and stops.
+        for _ in range(100):
+            if seen["tokens"][0].cancelled:
+                return
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert seen["tokens"][0].cancel_reason() == "cancelled"
+    release.set()
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from spending import SpendRollups
+
+
+class FakeCollection:
+    name = "spend_rollups"
+
+    def __init__(self):
+        self.batches = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.batches.append(list(ops))
+
+
+FINISHED = datetime(2026, 3, 4, 23, 59, tzinfo=timezone.utc)
+
+
+def test_jobs_on_the_same_day_fold_into_one_upsert_per_rollup():
+    rollups = SpendRollups(FakeCollection())
+    rollups.record("u1", 2.5, "completed", FINISHED)
+    rollups.record("u1", 1.0, "failed", FINISHED)
+    rollups.record("u1", None, "timed_out", FINISHED)
+    asyncio.run(rollups.writer.flush())
+
+    increments = {"total_spent": 2.5, "successful_jobs": 1, "failed_jobs": 2}
+    on_insert = lambda day: {"user_id": "u1", "day": day, "refunded": 0.0}
+    assert rollups.writer.collection.batches == [[
+        UpdateOne({"_id": "u1:2026-03-04"}, {"$inc": increments, "$setOnInsert": on_insert("2026-03-04")}, upsert=True),
+        UpdateOne({"_id": "u1:all"}, {"$inc": increments, "$setOnInsert": on_insert("all")}, upsert=True),
+    ]]
+
+
+def test_anonymous_jobs_are_not_rolled_up():
+    rollups = SpendRollups(FakeCollection())
+    rollups.record(None, 5.0, "completed", FINISHED)
+    assert rollups.writer.queue_depth() == 0
+
+
+def test_cancelled_jobs_count_neither_way():
+    rollups = SpendRollups(FakeCollection())
+    rollups.record("u1", 5.0, "cancelled", FINISHED)
+    asyncio.run(rollups.writer.flush())
+    first = rollups.writer.collection.batches[0][0]
+    assert first._doc["$inc"] == {"total_spent": 0.0, "successful_jobs": 0, "failed_jobs": 0}
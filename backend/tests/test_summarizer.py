@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+from agent_executor.context import RequestContext
+from agent_executor.event_queue import EventQueue
+from agent_executor.executor import SummarizerExecutor
+
+
+def summarizer(**kwargs):
+    return SummarizerExecutor("SummarizerAgent", **kwargs)
+
+
+def test_iter_chunks_cuts_on_whitespace():
+    chunks = list(summarizer().iter_chunks(iter(["alpha beta ", "gamma delta"]), 12))
+    assert chunks == ["alpha beta", " gamma delta"]
+    assert "".join(chunks) == "alpha beta gamma delta"
+
+
+def test_str_and_streamed_input_are_cut_alike():
+    text = "lorem ipsum dolor sit amet consectetur adipiscing elit " * 20
+    pieces = [text[i:i + 7] for i in range(0, len(text), 7)]
+    chunker = summarizer()
+    assert list(chunker.iter_chunks(text, 50)) == list(chunker.iter_chunks(pieces, 50))
+    assert all(len(chunk) <= 50 for chunk in chunker.iter_chunks(text, 50))
+
+
+def test_iter_chunks_reads_file_like_objects():
+    chunks = list(summarizer().iter_chunks(io.StringIO("x" * 25), 10))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+
+
+def test_iter_chunks_rejects_non_str_input():
+    with pytest.raises(TypeError):
+        list(summarizer().iter_chunks({"text": "a dict"}, 10))
+    with pytest.raises(TypeError):
+        list(summarizer().iter_chunks([b"bytes"], 10))
+
+
+def test_summarize_stream_tree_reduces_every_chunk():
+    result = summarizer(chunk_size=10, fan_in=2).summarize_stream("abcdefghij" * 9, max_length=40)
+    assert result["chunks"] == 9
+    assert result["original_length"] == 90
+    assert result["summarized_length"] <= 43
+    assert result["summary"].startswith("abcd")
+
+
+def test_execute_refuses_structured_data():
+    request = RequestContext(task_type="summarize", payload={"data": {"text": "hello"}})
+    result = summarizer().execute(request, EventQueue())
+    assert "error" in result
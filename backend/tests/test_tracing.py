@@ -0,0 +1,92 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import tracing
+from tracing import JsonlFileExporter, Tracer, build_tracer, configure_logging, current_span, run_in_context
+
+
+class ListExporter:
+
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def test_spans_nest_under_the_root_including_worker_threads():
+    exporter = ListExporter()
+    tracer = Tracer(exporter)
+
+    def in_thread():
+        with tracer.span("scrape"):
+            pass
+
+    with tracer.span("job", trace_id="corr-1") as root:
+        with tracer.span("routing") as routing:
+            assert current_span() is routing
+        thread = threading.Thread(target=run_in_context(in_thread))
+        thread.start()
+        thread.join()
+
+    [spans] = exporter.traces
+    assert {s["trace_id"] for s in spans} == {"corr-1"}
+    assert {s["name"]: s["parent_id"] for s in spans} == {
+        "job": None, "routing": root.span_id, "scrape": root.span_id
+    }
+    assert current_span() is None
+
+
+def test_failed_and_slow_traces_survive_sampling():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=0.0, slow_ms=0.0)
+    with tracer.span("fast"):
+        pass
+    assert len(exporter.traces) == 1
+
+    tracer.slow_ms = None
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("boom")
+    with tracer.span("sampled out"):
+        pass
+    assert [t[0]["status"] for t in exporter.traces] == ["ok", "error"]
+    assert tracer.sampled_out == 1
+
+
+def test_build_tracer_reads_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRACE_EXPORT", "file")
+    monkeypatch.setenv("TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setenv("TRACE_SAMPLE_RATE", "0.25")
+    tracer = build_tracer()
+    assert isinstance(tracer.exporter, JsonlFileExporter)
+    assert tracer.sample_rate == 0.25
+
+
+def test_log_level_is_read_when_logging_is_configured(monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    root.handlers = []
+    try:
+        configure_logging()
+        assert root.level == logging.WARNING
+    finally:
+        root.handlers, root.level = handlers, level
+
+
+def test_main_loads_dotenv_before_the_tracer_is_built(tmp_path):
+    (tmp_path / ".env").write_text(f"TRACE_EXPORT=file\nTRACE_FILE={tmp_path / 'traces.jsonl'}\n")
+    env = {k: v for k, v in os.environ.items() if not k.startswith("TRACE_")}
+    env["PYTHONPATH"] = os.path.dirname(os.path.abspath(tracing.__file__))
+    # Run from tmp_path: outside a script, load_dotenv() looks for .env from the working directory.
+    result = subprocess.run(
+        [sys.executable, "-c", "import main; print(type(main.tracer.exporter).__name__)"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.stdout.strip().splitlines()[-1] == "JsonlFileExporter", result.stderr
@@ -0,0 +1,238 @@
+"""
+Span-based tracing keyed on correlation IDs.
+
+A job opens a root span whose trace_id is its correlation ID; every span
+opened underneath it (routing, agent execution, scrape, parse, extract,
+persist) becomes a child through a context variable, including spans in
+browser threads started with run_in_context(). When the root span ends the
+whole trace is handed to the exporter, subject to sampling:
+
+    TRACE_EXPORT=file      append one JSON line per trace to TRACE_FILE
+    TRACE_EXPORT=http      POST each trace as JSON to TRACE_COLLECTOR_URL
+    TRACE_SAMPLE_RATE=0.1  keep 10% of ordinary traces (default 1.0)
+    TRACE_SLOW_MS=10000    always keep traces at least this slow
+
+Failed traces are always kept. TRACE_SAMPLE_RATE=0 with TRACE_SLOW_MS set
+exports slow jobs only.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+
+    def __init__(self, name: str, trace: "Trace", parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span failed for an error that was handled rather than raised"""
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if error is not None:
+            self.record_error(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time.isoformat(),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        # Appended from the event loop and from worker threads; list.append is atomic.
+        self.spans: List[Span] = []
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def run_in_context(fn, *args):
+    """Bind fn to the caller's context so spans opened in a worker thread nest correctly"""
+    return functools.partial(contextvars.copy_context().run, fn, *args)
+
+
+class JsonlFileExporter:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        line = json.dumps({"trace_id": spans[0]["trace_id"], "spans": spans}, default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class HttpExporter:
+    """Posts traces from a background thread so a slow collector never blocks a job"""
+
+    def __init__(self, url: str, max_queue: int = 1000, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        with httpx.Client(timeout=self.timeout) as client:
+            while True:
+                spans = self._queue.get()
+                try:
+                    client.post(self.url, json={"trace_id": spans[0]["trace_id"], "spans": spans})
+                except httpx.HTTPError as e:
+                    logger.warning("Trace export to %s failed: %s", self.url, e)
+
+
+class Tracer:
+
+    def __init__(self, exporter=None, sample_rate: float = 1.0, slow_ms: Optional[float] = None):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.exported = 0
+        self.sampled_out = 0
+
+    def should_export(self, root: Span) -> bool:
+        if root.status == "error":
+            return True
+        if self.slow_ms is not None and root.duration_ms >= self.slow_ms:
+            return True
+        return random.random() < self.sample_rate
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes):
+        """
+        Open a span under the current one. Without a current span this starts
+        a new trace, using trace_id (e.g. a job's correlation ID) if given.
+        """
+        parent = _current_span.get()
+        trace = parent.trace if parent else Trace(trace_id or uuid.uuid4().hex)
+        span = Span(name, trace, parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            span.finish(error)
+            _current_span.reset(token)
+            trace.spans.append(span)
+            if parent is None:
+                self._finish_trace(span)
+
+    def _finish_trace(self, root: Span) -> None:
+        if self.exporter is None:
+            return
+        if not self.should_export(root):
+            self.sampled_out += 1
+            return
+        try:
+            self.exporter.export([s.to_dict() for s in sorted(root.trace.spans, key=lambda s: s.start_time)])
+            self.exported += 1
+        except OSError as e:
+            logger.warning("Trace export failed: %s", e)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "exported": self.exported,
+            "sampled_out": self.sampled_out
+        }
+
+
+def build_tracer() -> Tracer:
+    mode = os.getenv("TRACE_EXPORT", "none")
+    if mode == "file":
+        exporter = JsonlFileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    elif mode == "http":
+        exporter = HttpExporter(os.environ["TRACE_COLLECTOR_URL"])
+    else:
+        exporter = None
+    slow_ms = os.getenv("TRACE_SLOW_MS")
+    return Tracer(
+        exporter,
+        sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+        slow_ms=float(slow_ms) if slow_ms else None
+    )
+
+
+tracer = build_tracer()
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamps log records with the current trace ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceContextFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    logging.basicConfig(level=level, handlers=[handler])
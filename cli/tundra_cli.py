@@ -256,8 +256,10 @@ def jobs_create(
 
 @jobs_app.command("list")
 def jobs_list(
-    status: Optional[str] = typer.Option(None, "--status", "-s", help="Filter by status (pending, processing, completed, failed)"),
+    status: Optional[str] = typer.Option(None, "--status", "-s", help="Filter by status (pending, in_progress, completed, failed, timed_out, cancelled)"),
     limit: int = typer.Option(20, "--limit", "-l", help="Maximum number of jobs to show"),
+    user: Optional[str] = typer.Option(None, "--user", "-u", help="Only show jobs for this user ID"),
+    cursor: Optional[str] = typer.Option(None, "--cursor", help="Continue from a previous page"),
 ):
     """
     List all your jobs.
@@ -276,8 +278,20 @@ def jobs_list(
 
     headers = {"x-api-key": key}
 
+    # Filtering and paging happen on the server
+    params = {
+        "limit": limit,
+        "fields": "job_id,task,status,assigned_agent_name,assigned_agent_id,budget",
+    }
+    if status:
+        params["status"] = status
+    if user:
+        params["user_id"] = user
+    if cursor:
+        params["cursor"] = cursor
+
     try:
-        resp = requests.get(f"{base}/jobs", headers=headers, timeout=10)
+        resp = requests.get(f"{base}/jobs", headers=headers, params=params, timeout=10)
     except Exception as e:
         print_error(f"Could not reach backend: {e}")
         raise typer.Exit(1)
@@ -288,15 +302,12 @@ def jobs_list(
 
     data = resp.json()
     jobs = data if isinstance(data, list) else data.get("jobs", [])
+    next_cursor = None if isinstance(data, list) else data.get("next_cursor")
 
-    # Filter by status if provided
-    if status:
-        jobs = [j for j in jobs if j.get("status", "").lower() == status.lower()]
+    display_jobs_table(jobs[:limit], show_full=False)
 
-    # Limit results
-    jobs = jobs[:limit]
-
-    display_jobs_table(jobs, show_full=False)
+    if next_cursor:
+        print_info(f"More jobs available: tundra jobs list --limit {limit} --cursor {next_cursor}")
 
 
 @jobs_app.command("view")
@@ -371,35 +382,10 @@ def spend_summary(
 
     headers = {"x-api-key": key}
 
-    # Try to fetch spending data
+    # Served from per-day rollups on the server
     try:
         resp = requests.get(f"{base}/spending", headers=headers, params={"period": period}, timeout=10)
     except Exception as e:
-        # If endpoint doesn't exist, calculate from jobs
-        try:
-            resp = requests.get(f"{base}/jobs", headers=headers, timeout=10)
-            if resp.status_code == 200:
-                jobs = resp.json()
-                if not isinstance(jobs, list):
-                    jobs = jobs.get("jobs", [])
-
-                # Calculate spending from jobs
-                total_spent = sum(j.get("budget", 0) for j in jobs if j.get("status") == "completed")
-                successful = len([j for j in jobs if j.get("status") == "completed"])
-                failed = len([j for j in jobs if j.get("status") == "failed"])
-
-                spending_data = {
-                    "total_spent": total_spent,
-                    "successful_jobs": successful,
-                    "failed_jobs": failed,
-                    "refunded": 0,
-                }
-
-                display_spend_summary(spending_data)
-                return
-        except:
-            pass
-
         print_error(f"Could not retrieve spending data: {e}")
         raise typer.Exit(1)
 
@@ -0,0 +1,100 @@
+# db/agent_catalog.py
+"""
+In-process cache of the agents collection
+
+The catalog is small and changes rarely, so reads are served from memory.
+Every write bumps a version stamp in Mongo; once the local copy is older
+than its TTL, a replica re-checks that stamp (a single _id lookup) and only
+reloads the collection when it has moved.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional
+
+from database import agents_collection, meta_collection
+from metrics import CATALOG_RELOADS
+
+CATALOG_KEY = "agents"
+
+
+def normalize_capability(capability: str) -> str:
+    return capability.lower().replace(" ", "_")
+
+
+class AgentCatalog:
+
+    def __init__(self, collection, meta, ttl: float = 30.0):
+        self.collection = collection
+        self.meta = meta
+        self.ttl = ttl
+        self._lock = asyncio.Lock()
+        self._expires = 0.0
+        self._version = None
+        self._agents: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._by_capability: Dict[str, List[Dict]] = {}
+        self.etag: Optional[str] = None
+
+    async def _read_version(self):
+        stamp = await self.meta.find_one({"_id": CATALOG_KEY})
+        return stamp["version"] if stamp else 0
+
+    async def _load(self, version) -> None:
+        agents = []
+        async for agent in self.collection.find():
+            agent["_id"] = str(agent["_id"])
+            agents.append(agent)
+
+        by_capability: Dict[str, List[Dict]] = {}
+        for agent in agents:
+            for capability in agent.get("capabilities", []):
+                by_capability.setdefault(normalize_capability(capability), []).append(agent)
+
+        digest = hashlib.sha1(json.dumps(agents, sort_keys=True, default=str).encode()).hexdigest()
+
+        self._agents = agents
+        self._by_id = {agent["_id"]: agent for agent in agents}
+        self._by_id.update({agent["agent_id"]: agent for agent in agents if agent.get("agent_id")})
+        self._by_capability = by_capability
+        self._version = version
+        self.etag = f'"{digest}"'
+        CATALOG_RELOADS.inc()
+
+    async def refresh(self, force: bool = False) -> None:
+        if not force and time.monotonic() < self._expires:
+            return
+        async with self._lock:
+            if not force and time.monotonic() < self._expires:
+                return
+            version = await self._read_version()
+            if force or version != self._version:
+                await self._load(version)
+            self._expires = time.monotonic() + self.ttl
+
+    async def invalidate(self) -> None:
+        """Call after any write to the agents collection"""
+        await self.meta.update_one({"_id": CATALOG_KEY}, {"$inc": {"version": 1}}, upsert=True)
+        self._expires = 0.0
+        await self.refresh()
+
+    async def list(self) -> List[Dict]:
+        await self.refresh()
+        return self._agents
+
+    async def get(self, agent_id: str) -> Optional[Dict]:
+        await self.refresh()
+        return self._by_id.get(agent_id)
+
+    async def with_capability(self, capability: str) -> List[Dict]:
+        await self.refresh()
+        return self._by_capability.get(normalize_capability(capability), [])
+
+    async def capability_index(self) -> Dict[str, List[Dict]]:
+        await self.refresh()
+        return self._by_capability
+
+
+agent_catalog = AgentCatalog(agents_collection, meta_collection)
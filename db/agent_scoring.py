@@ -0,0 +1,78 @@
+# db/agent_scoring.py
+"""
+Deterministic multi-objective scoring of candidate agents
+
+Each metric is normalized to 0..1 across the candidate set (higher is
+better), combined with configurable weights, and ties are broken by
+reliability, then latency, then id so the same inputs always pick the
+same agent.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+
+class ScoringWeights(BaseModel):
+    success_rate: float = 0.4
+    latency: float = 0.25
+    reliability: float = 0.2
+    price: float = 0.15
+
+
+def agent_price(agent: Dict) -> float:
+    return (agent.get("pricing") or {}).get("base_rate", 0.0) or 0.0
+
+
+def _normalized(values: List[float], higher_is_better: bool) -> List[float]:
+    lo, hi = min(values), max(values)
+    if hi == lo:
+        return [1.0] * len(values)
+    if higher_is_better:
+        return [(v - lo) / (hi - lo) for v in values]
+    return [(hi - v) / (hi - lo) for v in values]
+
+
+def within_budget(agents: List[Dict], budget: Optional[float]) -> List[Dict]:
+    if budget is None:
+        return list(agents)
+    return [a for a in agents if agent_price(a) <= budget]
+
+
+def score_agents(
+    candidates: List[Dict],
+    weights: Optional[ScoringWeights] = None,
+    budget: Optional[float] = None
+) -> List[Tuple[float, Dict]]:
+    """
+    Rank candidates best-first as (score, agent) pairs
+
+    Agents whose base rate exceeds the budget are left out.
+    """
+    weights = weights or ScoringWeights()
+    agents = within_budget(candidates, budget)
+    if not agents:
+        return []
+
+    success = _normalized([(a.get("success_rate") or 0.0) for a in agents], True)
+    latency = _normalized([(a.get("average_latency_ms") or 0) for a in agents], False)
+    reliability = _normalized([(a.get("reliability_score") or 0.0) for a in agents], True)
+    price = _normalized([agent_price(a) for a in agents], False)
+
+    total = weights.success_rate + weights.latency + weights.reliability + weights.price or 1.0
+    scored = []
+    for i, agent in enumerate(agents):
+        score = (
+            weights.success_rate * success[i]
+            + weights.latency * latency[i]
+            + weights.reliability * reliability[i]
+            + weights.price * price[i]
+        ) / total
+        scored.append((round(score, 6), agent))
+
+    scored.sort(key=lambda pair: (
+        -pair[0],
+        -(pair[1].get("reliability_score") or 0.0),
+        pair[1].get("average_latency_ms") or 0,
+        str(pair[1].get("_id")),
+    ))
+    return scored
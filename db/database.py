@@ -18,5 +18,9 @@ db = client[DB_NAME]
 # Collections
 agents_collection = db["agents"]
 jobs_collection = db["jobs"]
+events_collection = db["job_events"]
+meta_collection = db["catalog_meta"]
+api_keys_collection = db["api_keys"]
+spend_rollups_collection = db["spend_rollups"]
 
 print(f"yay connected to MongoDB database: {DB_NAME}")
@@ -0,0 +1,193 @@
+# db/indexes.py
+"""
+Index manager for the TUNDRA collections
+
+Declares the indexes every lookup in the system relies on, ensures them at
+startup, and can check Mongo explain plans for collection scans:
+
+    python indexes.py           # ensure indexes
+    python indexes.py explain   # report queries that fall back to COLLSCAN
+"""
+
+import asyncio
+import logging
+import os
+from pymongo import ASCENDING, DESCENDING
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Keyset pagination on GET /jobs sorts by (created_at, _id); every filter
+# it supports gets a compound index ending in that sort key.
+# The backend service creates the same job_id and job_events indexes but
+# leaves renaming and conflicts to ensure_index here; keep the names and
+# options in sync.
+INDEXES = {
+    "jobs": [
+        {
+            "keys": [("job_id", ASCENDING)],
+            "name": "job_id",
+            "unique": True,
+            "partialFilterExpression": {"job_id": {"$type": "string"}}
+        },
+        {"keys": [("created_at", DESCENDING), ("_id", DESCENDING)], "name": "created_at_id"},
+        {"keys": [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], "name": "status_created_at_id"},
+        {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], "name": "user_created_at_id"},
+        {
+            "keys": [("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            "name": "user_status_created_at_id"
+        },
+    ],
+    "agents": [
+        {
+            "keys": [("agent_id", ASCENDING)],
+            "name": "agent_id",
+            "unique": True,
+            "partialFilterExpression": {"agent_id": {"$type": "string"}}
+        },
+        {"keys": [("name", ASCENDING)], "name": "name"},
+        {"keys": [("capabilities", ASCENDING), ("status", ASCENDING)], "name": "capabilities_status"},
+        {"keys": [("status", ASCENDING), ("region", ASCENDING)], "name": "status_region"},
+    ],
+    "job_events": [
+        {"keys": [("job_id", ASCENDING), ("seq", ASCENDING)], "name": "job_id_seq", "unique": True},
+    ],
+    "api_keys": [
+        {"keys": [("key_hash", ASCENDING)], "name": "key_hash", "unique": True},
+        # At most one active key per user
+        {
+            "keys": [("user_id", ASCENDING)],
+            "name": "user_id_active",
+            "unique": True,
+            "partialFilterExpression": {"active": True}
+        },
+    ],
+    # Buckets and in-flight counters of the backend's Mongo rate limiter
+    "rate_limits": [
+        {"keys": [("expires_at", ASCENDING)], "name": "expires_at_ttl", "expireAfterSeconds": 0},
+    ],
+    "spend_rollups": [
+        {"keys": [("user_id", ASCENDING), ("day", ASCENDING)], "name": "user_day"},
+    ],
+}
+
+# Names earlier releases gave to indexes that are now declared above.
+LEGACY_INDEX_NAMES = {
+    "job_id_seq": ("job_id_1_seq_1",),
+}
+
+# Optional retention, in days. Unset means documents are kept forever.
+TTL_INDEXES = {
+    "job_events": ("timestamp", "EVENT_TTL_DAYS"),
+    "jobs": ("finished_at", "JOB_TTL_DAYS"),
+}
+
+# Representative queries, one per lookup path, checked by `explain`.
+DIAGNOSTIC_QUERIES = [
+    ("jobs", {"job_id": "JOB-DEMO-001"}, None),
+    ("jobs", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("jobs", {"status": "completed"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("jobs", {"user_id": "test_user"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("jobs", {"user_id": "test_user", "status": "completed"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("agents", {"agent_id": "A1"}, None),
+    ("agents", {"name": "WebScraperAgent"}, None),
+    ("agents", {"capabilities": "web_scraping", "status": "active"}, None),
+    ("agents", {"status": "active", "region": "US-East"}, None),
+    ("job_events", {"job_id": "JOB-DEMO-001", "seq": {"$gt": -1}}, [("seq", ASCENDING)]),
+    ("api_keys", {"key_hash": "0" * 64}, None),
+    ("api_keys", {"user_id": "test_user", "active": True}, None),
+    ("spend_rollups", {"user_id": "test_user", "day": {"$gte": "2025-01-01", "$lte": "2025-01-07"}}, None),
+]
+
+
+def declared_indexes():
+    """INDEXES plus any TTL indexes enabled through the environment"""
+    declared = {name: list(specs) for name, specs in INDEXES.items()}
+    for collection, (field, env_var) in TTL_INDEXES.items():
+        days = os.getenv(env_var)
+        if days:
+            declared.setdefault(collection, []).append({
+                "keys": [(field, ASCENDING)],
+                "name": f"{field}_ttl",
+                "expireAfterSeconds": int(float(days) * 86400)
+            })
+    return declared
+
+
+async def ensure_index(collection, keys, name: str, **options):
+    """
+    create_index, first dropping an index on the same keys that an earlier
+    release created under another name (LEGACY_INDEX_NAMES), which would
+    otherwise fail with IndexOptionsConflict. Same-key indexes this module
+    did not create are left alone and reported instead.
+    """
+    for existing, info in (await collection.index_information()).items():
+        if existing == name or list(info["key"]) != list(keys):
+            continue
+        if existing not in LEGACY_INDEX_NAMES.get(name, ()):
+            logger.warning("Not creating index %s on %s: index %s already covers the same keys",
+                           name, collection.name, existing)
+            return
+        await collection.drop_index(existing)
+    await collection.create_index(keys, name=name, **options)
+
+
+async def ensure_indexes():
+    """Create any missing indexes (create_index is a no-op when they exist)"""
+    for collection, specs in declared_indexes().items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k not in ("keys", "name")}
+            await ensure_index(db[collection], spec["keys"], spec["name"], **options)
+
+
+def plan_stages(plan: dict):
+    """Yield every stage name in an explain plan tree"""
+    if not plan:
+        return
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+    # Plans from the slot-based engine nest the classic plan here
+    if "queryPlan" in plan:
+        yield from plan_stages(plan["queryPlan"])
+
+
+async def explain_queries():
+    """Run explain on each diagnostic query and return those that scan"""
+    report = []
+    for collection, query, sort in DIAGNOSTIC_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        report.append({
+            "collection": collection,
+            "query": query,
+            "sort": sort,
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+async def main(argv):
+    await ensure_indexes()
+    print("✅ Indexes ensured")
+
+    if len(argv) > 1 and argv[1] == "explain":
+        scans = 0
+        for entry in await explain_queries():
+            marker = "⚠️  COLLSCAN" if entry["collection_scan"] else "✅"
+            print(f"{marker} {entry['collection']}.find({entry['query']}) sort={entry['sort']} -> {' > '.join(filter(None, entry['stages']))}")
+            scans += entry["collection_scan"]
+        print(f"\n{scans} of {len(DIAGNOSTIC_QUERIES)} queries hit a collection scan")
+
+
+if __name__ == "__main__":
+    import sys
+
+    asyncio.run(main(sys.argv))
@@ -0,0 +1,153 @@
+# db/key_store.py
+"""
+Persistent API key store with an in-process verification cache
+
+Keys are stored in Mongo by SHA-256 hash only. verify() is on every
+authenticated request, so results (including misses) are cached for a
+short TTL; revoking a key drops it from this worker's cache immediately,
+and other workers drop it as soon as the change stream reports the
+revocation, or when their TTL runs out if change streams are unavailable.
+
+The cache holds at most `max_entries` keys, least recently used first out,
+so a flood of random keys can't grow it without bound.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from database import api_keys_collection
+
+KEY_PREFIX_LENGTH = 13
+
+
+class APIKeyStore:
+
+    def __init__(
+        self,
+        collection,
+        ttl: float = 60.0,
+        negative_ttl: float = 5.0,
+        max_entries: int = 10000,
+        max_backoff: float = 300.0
+    ):
+        self.collection = collection
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_backoff = max_backoff
+        self._cache: "OrderedDict[str, Tuple[float, Optional[dict]]]" = OrderedDict()
+        self._user_hashes: Dict[str, Set[str]] = {}
+        self._next_sweep = 0.0
+
+    def _forget(self, key_hash: str) -> None:
+        _, data = self._cache.pop(key_hash, (None, None))
+        if data:
+            hashes = self._user_hashes.get(data["user_id"])
+            if hashes is not None:
+                hashes.discard(key_hash)
+                if not hashes:
+                    del self._user_hashes[data["user_id"]]
+
+    def _evict(self, now: float) -> None:
+        # Expired entries go first, swept at most once per negative TTL since
+        # that is a full scan; then the least recently used.
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.negative_ttl
+            for key_hash in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                self._forget(key_hash)
+        while len(self._cache) > self.max_entries:
+            self._forget(next(iter(self._cache)))
+
+    def _remember(self, key_hash: str, data: Optional[dict]) -> None:
+        now = time.monotonic()
+        self._forget(key_hash)
+        ttl = self.ttl if data else self.negative_ttl
+        self._cache[key_hash] = (now + ttl, data)
+        if data:
+            self._user_hashes.setdefault(data["user_id"], set()).add(key_hash)
+        if len(self._cache) > self.max_entries:
+            self._evict(now)
+
+    def invalidate_user(self, user_id: str) -> None:
+        for key_hash in self._user_hashes.pop(user_id, set()):
+            self._cache.pop(key_hash, None)
+
+    async def verify(self, key_hash: str) -> Optional[dict]:
+        """Return the key's record (active or not), or None if it doesn't exist"""
+        cached = self._cache.get(key_hash)
+        if cached:
+            if cached[0] > time.monotonic():
+                self._cache.move_to_end(key_hash)
+                return cached[1]
+            self._forget(key_hash)
+
+        doc = await self.collection.find_one({"key_hash": key_hash}, {"_id": 0})
+        self._remember(key_hash, doc)
+        return doc
+
+    async def active_key_for(self, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"user_id": user_id, "active": True}, {"_id": 0})
+
+    async def create(self, user_id: str, email: str, api_key: str, key_hash: str, replace: bool = False) -> bool:
+        """
+        Store a new key for the user
+
+        With replace=True any active key is revoked first. Returns False if
+        the user already has an active key (the unique partial index on
+        user_id for active keys settles concurrent creates).
+        """
+        doc = {
+            "key_hash": key_hash,
+            "key_prefix": api_key[:KEY_PREFIX_LENGTH],
+            "user_id": user_id,
+            "email": email,
+            "created_at": datetime.utcnow().isoformat(),
+            "active": True
+        }
+        if replace:
+            # A regenerated key keeps the rate limit tier of the one it replaces.
+            previous = await self.active_key_for(user_id)
+            if previous and previous.get("tier"):
+                doc["tier"] = previous["tier"]
+            await self.revoke_user(user_id)
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            return False
+        self._forget(key_hash)
+        return True
+
+    async def revoke_user(self, user_id: str) -> int:
+        result = await self.collection.update_many(
+            {"user_id": user_id, "active": True},
+            {"$set": {"active": False, "revoked_at": datetime.utcnow().isoformat()}}
+        )
+        self.invalidate_user(user_id)
+        return result.modified_count
+
+    async def watch_revocations(self, initial_backoff: float = 1.0) -> None:
+        """Invalidate cached keys revoked by other workers (needs a replica set)"""
+        pipeline = [{"$match": {"operationType": "update", "updateDescription.updatedFields.active": False}}]
+        backoff = initial_backoff
+        while True:
+            try:
+                async with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+                    backoff = initial_backoff
+                    async for change in stream:
+                        doc = change.get("fullDocument") or {}
+                        if doc.get("user_id"):
+                            self.invalidate_user(doc["user_id"])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                print(f"API key change stream unavailable, relying on cache TTL; retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+
+
+key_store = APIKeyStore(api_keys_collection)
@@ -1,14 +1,30 @@
 # db/main.py
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import without dots when running directly
 try:
-    from .routes import agents, jobs, auth
+    from .routes import agents, jobs, auth, spending
+    from .indexes import ensure_indexes
+    from .key_store import key_store
+    from .metrics import CONTENT_TYPE_LATEST, render, track_requests
 except ImportError:
-    from routes import agents, jobs, auth
+    from routes import agents, jobs, auth, spending
+    from indexes import ensure_indexes
+    from key_store import key_store
+    from metrics import CONTENT_TYPE_LATEST, render, track_requests
 
-app = FastAPI(title="TUNDRA Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    revocation_watcher = asyncio.create_task(key_store.watch_revocations())
+    yield
+    revocation_watcher.cancel()
+
+app = FastAPI(title="TUNDRA Backend", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -19,11 +35,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.middleware("http")(track_requests)
+
 app.include_router(auth.router)
 app.include_router(agents.router)
 app.include_router(jobs.router)
+app.include_router(spending.router)
 
 
 @app.get("/")
 async def root():
     return {"message": "TUNDRA backend running", "status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=render(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,53 @@
+# db/metrics.py
+"""
+Prometheus metrics for the TUNDRA backend
+
+Every route is timed by the middleware below, labelled with its path
+template (/jobs/{job_id}, not the concrete id) so label cardinality stays
+bounded. Scraped from GET /metrics.
+"""
+
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from starlette.requests import Request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "tundra_db_request_duration_seconds",
+    "Time to serve each route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+ROUTING_DECISIONS = Counter(
+    "tundra_routing_decisions_total",
+    "Agent selections by how they were made (scored, llm, fallback)",
+    ["method"]
+)
+ROUTING_LLM_LATENCY = Histogram(
+    "tundra_routing_llm_duration_seconds",
+    "Time spent waiting on the routing LLM, including the concurrency slot",
+    buckets=LATENCY_BUCKETS
+)
+CATALOG_RELOADS = Counter("tundra_agent_catalog_reloads_total", "Agent catalog reloads from Mongo")
+
+
+async def track_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method,
+            route.path if route else "unmatched",
+            str(status)
+        ).observe(time.perf_counter() - started)
+
+
+def render() -> bytes:
+    return generate_latest()
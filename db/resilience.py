@@ -0,0 +1,104 @@
+# db/resilience.py
+"""
+Retry and circuit breaker for the routing LLM
+
+Transient Gemini failures (rate limits, 5xx, timeouts) are retried with
+exponential backoff and full jitter inside the caller's deadline. After
+repeated transient failures the breaker opens and calls fail fast with
+CircuitOpen, so routing goes straight to local scoring until a trial
+call succeeds again.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+from google.api_core import exceptions as google_exceptions
+
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def before_call(self) -> None:
+        if self.state == "closed":
+            return
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        raise CircuitOpen(f"{self.name} circuit is open")
+
+    def on_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def on_abandoned(self) -> None:
+        self._trial_in_flight = False
+
+    def on_failure(self, error: BaseException) -> None:
+        self._trial_in_flight = False
+        if not isinstance(error, TRANSIENT_ERRORS):
+            self.failures = 0
+            if self.state == "half_open":
+                self.state = "closed"
+            return
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+async def call_with_retry(
+    circuit: CircuitBreaker,
+    fn: Callable[[float], Awaitable[Any]],
+    deadline: float,
+    attempts: int = 2,
+    base_delay: float = 0.5
+) -> Any:
+    """
+    Call fn(time_left) until it succeeds, fails permanently or the
+    deadline (a time.monotonic() value) leaves no room for another try
+    """
+    attempt = 0
+    while True:
+        circuit.before_call()
+        try:
+            result = await fn(deadline - time.monotonic())
+        except asyncio.CancelledError:
+            circuit.on_abandoned()
+            raise
+        except Exception as e:
+            circuit.on_failure(e)
+            delay = random.uniform(0, base_delay * 2 ** attempt)
+            attempt += 1
+            if not isinstance(e, TRANSIENT_ERRORS) or attempt >= attempts or time.monotonic() + delay >= deadline:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        circuit.on_success()
+        return result
@@ -1,27 +1,34 @@
 # db/routes/agents.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from database import agents_collection
+from agent_catalog import agent_catalog
 from models import Agent
 from bson import ObjectId
 
 router = APIRouter(prefix="/agents", tags=["Agents"])
 
 @router.get("/")
-async def get_agents():
-    agents = []
-    async for agent in agents_collection.find():
-        agent["_id"] = str(agent["_id"])
-        agents.append(agent)
+async def get_agents(request: Request, response: Response):
+    agents = await agent_catalog.list()
+    etag = agent_catalog.etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return agents
 
 @router.post("/")
 async def create_agent(agent: Agent):
     agent_dict = agent.dict(by_alias=True)
     result = await agents_collection.insert_one(agent_dict)
+    await agent_catalog.invalidate()
     return {"_id": str(result.inserted_id)}
 
 @router.get("/{agent_id}")
 async def get_agent(agent_id: str):
+    agent = await agent_catalog.get(agent_id)
+    if agent:
+        return agent
+
     try:
       oid = ObjectId(agent_id)
     except Exception:
@@ -3,15 +3,11 @@ from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel, EmailStr
 import secrets
 import hashlib
-from datetime import datetime
 from typing import Optional
+from key_store import key_store
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# In-memory storage for now (replace with database later)
-api_keys = {}  # {api_key_hash: {user_id, email, created_at}}
-user_keys = {}  # {user_id: api_key} - to track which users have keys
-
 
 class SignupRequest(BaseModel):
     email: EmailStr
@@ -46,32 +42,22 @@ async def get_or_create_key(request: SignupRequest):
     - If user has existing key, returns masked version
     - If new user, generates and returns full key
     """
-    # Check if user already has a key
-    existing_key = user_keys.get(request.user_id)
+    # Generate new API key for new user
+    api_key = generate_api_key()
+    api_key_hash = hash_api_key(api_key)
 
-    if existing_key:
+    # Only succeeds if the user has no active key
+    created = await key_store.create(request.user_id, request.email, api_key, api_key_hash)
+
+    if not created:
         # User already has a key, return masked version
-        masked_key = existing_key[:13] + "•" * 20
+        existing = await key_store.active_key_for(request.user_id)
+        masked_key = (existing or {}).get("key_prefix", "tundra_sk_") + "•" * 20
         return APIKeyResponse(
             api_key=masked_key,
             message="You already have an API key. Check your Settings page."
         )
 
-    # Generate new API key for new user
-    api_key = generate_api_key()
-    api_key_hash = hash_api_key(api_key)
-
-    # Store in database (using in-memory for now)
-    api_keys[api_key_hash] = {
-        "user_id": request.user_id,
-        "email": request.email,
-        "created_at": datetime.utcnow().isoformat(),
-        "active": True
-    }
-
-    # Track user's key
-    user_keys[request.user_id] = api_key
-
     return APIKeyResponse(
         api_key=api_key,
         message="API key generated successfully. Save this key - it won't be shown again!"
@@ -86,27 +72,14 @@ async def generate_key(request: SignupRequest):
     This will invalidate the old key and create a new one.
     Use get-or-create-key for normal login flow.
     """
-    # Revoke old key if exists
-    old_key = user_keys.get(request.user_id)
-    if old_key:
-        old_hash = hash_api_key(old_key)
-        if old_hash in api_keys:
-            api_keys[old_hash]["active"] = False
-
     # Generate new API key
     api_key = generate_api_key()
     api_key_hash = hash_api_key(api_key)
 
-    # Store in database (using in-memory for now)
-    api_keys[api_key_hash] = {
-        "user_id": request.user_id,
-        "email": request.email,
-        "created_at": datetime.utcnow().isoformat(),
-        "active": True
-    }
-
-    # Update user's key
-    user_keys[request.user_id] = api_key
+    # Revokes the old key (if any) and stores the new one
+    created = await key_store.create(request.user_id, request.email, api_key, api_key_hash, replace=True)
+    if not created:
+        raise HTTPException(status_code=409, detail="Another key was created concurrently, please retry")
 
     return APIKeyResponse(
         api_key=api_key,
@@ -129,8 +102,8 @@ async def verify_api_key(x_api_key: str = Header(...)) -> dict:
     # Hash the provided key
     api_key_hash = hash_api_key(x_api_key)
 
-    # Check if exists
-    user_data = api_keys.get(api_key_hash)
+    # Check if exists (served from the in-process cache on the hot path)
+    user_data = await key_store.verify(api_key_hash)
 
     if not user_data:
         raise HTTPException(status_code=401, detail="Invalid API key")
@@ -144,10 +117,8 @@ async def verify_api_key(x_api_key: str = Header(...)) -> dict:
 @router.delete("/revoke-key")
 async def revoke_key(user_data: dict = Depends(verify_api_key)):
     """Revoke current API key"""
-    # Find and deactivate the key
-    for key_hash, data in api_keys.items():
-        if data["user_id"] == user_data["user_id"]:
-            data["active"] = False
+    # Deactivate the user's keys (indexed by user_id, no scan)
+    await key_store.revoke_user(user_data["user_id"])
 
     return {"message": "API key revoked successfully"}
 
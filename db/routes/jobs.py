@@ -1,19 +1,122 @@
 # db/routes/jobs.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from bson import ObjectId
-from database import jobs_collection
+from datetime import datetime
+from typing import Optional
+import base64
+import json
+import re
+from pymongo import ASCENDING, DESCENDING
+from database import jobs_collection, events_collection
 from models import Job
 
 router = APIRouter(prefix="/jobs", tags=["Jobs"])
 
+# Events live in their own collection; older job documents may still embed them.
+JOB_PROJECTION = {"events": 0}
+
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+
+def encode_cursor(doc: dict) -> str:
+    # Legacy and seed documents may lack created_at; they sort as null.
+    created_at = doc.get("created_at")
+    created_at = created_at.isoformat() if isinstance(created_at, datetime) else None
+    raw = json.dumps([created_at, str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, oid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(last_created_at: Optional[datetime], last_id: ObjectId, direction: int) -> dict:
+    """Jobs that sort after (last_created_at, last_id); missing created_at sorts lowest"""
+    op = "$lt" if direction == DESCENDING else "$gt"
+    if last_created_at is None:
+        same_position = {"created_at": None, "_id": {op: last_id}}
+        if direction == DESCENDING:
+            return same_position
+        return {"$or": [same_position, {"created_at": {"$ne": None}}]}
+
+    after = [
+        {"created_at": {op: last_created_at}},
+        {"created_at": last_created_at, "_id": {op: last_id}},
+    ]
+    if direction == DESCENDING:
+        after.append({"created_at": None})
+    return {"$or": after}
+
+
+def build_projection(fields: Optional[str]) -> dict:
+    if not fields:
+        return dict(JOB_PROJECTION)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    if not all(_FIELD_NAME.match(name) for name in names):
+        raise HTTPException(status_code=400, detail="Invalid field name in fields")
+    # created_at and _id are always returned so the cursor can be built.
+    return {name: 1 for name in names + ["created_at", "_id"]}
+
 
 @router.get("/")
-async def list_jobs():
+async def list_jobs(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort order on created_at"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    envelope: bool = Query(True, description="false returns a bare list, with the cursor in X-Next-Cursor"),
+    response: Response = None,
+):
+    """
+    List jobs a page at a time.
+
+    Filters and sort are evaluated by Mongo on the (..., created_at, _id)
+    indexes declared in indexes.py, and pages are fetched by keyset rather
+    than skip, so latency does not grow with the size of the collection.
+
+    API change: this used to return every job as a bare list. It now returns
+    {"jobs": [...], "next_cursor": ...}; clients that need the old shape can
+    pass envelope=false and page with the X-Next-Cursor header.
+    """
+    query = {}
+    if status:
+        query["status"] = status
+    if user_id:
+        query["user_id"] = user_id
+    if created_after or created_before:
+        query["created_at"] = {}
+        if created_after:
+            query["created_at"]["$gte"] = created_after
+        if created_before:
+            query["created_at"]["$lt"] = created_before
+
+    direction = DESCENDING if order == "desc" else ASCENDING
+    if cursor:
+        query = {"$and": [query, after_cursor(*decode_cursor(cursor), direction)]}
+
     jobs = []
-    async for doc in jobs_collection.find():
-        doc["_id"] = str(doc["_id"])
+    async for doc in jobs_collection.find(query, build_projection(fields)).sort(
+        [("created_at", direction), ("_id", direction)]
+    ).limit(limit):
         jobs.append(doc)
-    return jobs
+
+    next_cursor = encode_cursor(jobs[-1]) if len(jobs) == limit else None
+    for doc in jobs:
+        doc["_id"] = str(doc["_id"])
+    if not envelope:
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return jobs
+    return {"jobs": jobs, "next_cursor": next_cursor}
 
 
 @router.post("/")
@@ -23,14 +126,47 @@ async def create_job(job: Job):
     return {"_id": str(result.inserted_id)}
 
 
+async def find_job(job_id: str, projection: dict = JOB_PROJECTION) -> dict:
+    """
+    Look a job up by its job_id, the identifier the backend and CLI use;
+    documents created without one are found by their ObjectId instead.
+    """
+    doc = await jobs_collection.find_one({"job_id": job_id}, projection)
+    if doc is None and ObjectId.is_valid(job_id):
+        doc = await jobs_collection.find_one({"_id": ObjectId(job_id)}, projection)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return doc
+
+
 @router.get("/{job_id}")
 async def get_job(job_id: str):
-    try:
-        oid = ObjectId(job_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid job id")
-    doc = await jobs_collection.find_one({"_id": oid})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Job not found")
+    doc = await find_job(job_id)
     doc["_id"] = str(doc["_id"])
     return doc
+
+
+@router.get("/{job_id}/events")
+async def get_job_events(
+    job_id: str,
+    after: int = Query(-1, description="Return events with seq greater than this"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Page through a job's event log in sequence order."""
+    job = await find_job(job_id, {"job_id": 1, "events": 1})
+    if job.get("job_id"):
+        events = []
+        cursor = events_collection.find(
+            {"job_id": job["job_id"], "seq": {"$gt": after}},
+            {"_id": 0}
+        ).sort("seq", 1).limit(limit)
+        async for event in cursor:
+            events.append(event)
+    else:
+        # Jobs from before the event log embed their events; their position is the seq.
+        embedded = job.get("events") or []
+        start = max(after + 1, 0)
+        events = [{**event, "seq": seq} for seq, event in enumerate(embedded[start:start + limit], start)]
+
+    next_after = events[-1]["seq"] if len(events) == limit else None
+    return {"job_id": job_id, "events": events, "next_after": next_after}
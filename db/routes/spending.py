@@ -0,0 +1,15 @@
+# db/routes/spending.py
+from fastapi import APIRouter, Depends, Query
+from spending import spending_summary
+from routes.auth import verify_api_key
+
+router = APIRouter(prefix="/spending", tags=["Spending"])
+
+
+@router.get("/")
+async def get_spending(
+    period: str = Query("week", pattern="^(week|month|all)$"),
+    user_data: dict = Depends(verify_api_key)
+):
+    """Spending for the caller, read from the daily rollups"""
+    return await spending_summary(user_data["user_id"], period)
@@ -3,41 +3,263 @@
 Routing AI - The "Scout" that finds the best agent for a job
 """
 
+import asyncio
+import json
 import os
-from typing import Dict, List, Optional
+import re
+import time
+from typing import Dict, List, Optional, Set
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from agent_catalog import agent_catalog, normalize_capability
+from agent_scoring import ScoringWeights, score_agents, within_budget
+from metrics import ROUTING_DECISIONS, ROUTING_LLM_LATENCY
+from resilience import CircuitBreaker, call_with_retry
+
 load_dotenv()
 
 # Configure Gemini API (free tier)
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+# Capabilities that qualify an agent for each known task type
+TASK_TO_CAPABILITY = {
+    "web_scrape": ["web_scraping", "data_extraction", "scraping"],
+    "summarize": ["text_summarization", "summarization", "nlp"],
+    "validate": ["data_validation", "compliance", "validation"],
+    "code_review": ["code_review", "security_analysis", "code_analysis"],
+    "image_analysis": ["image_classification", "computer_vision", "ocr"],
+}
+
+# Agents in any other status (e.g. "disabled") are never routed to
+ROUTABLE_STATUSES = {"active", "idle"}
+
+
+def build_capability_index(agents: List[Dict]) -> Dict[str, List[Dict]]:
+    """Inverted index from normalized capability to the agents that have it"""
+    index: Dict[str, List[Dict]] = {}
+    for agent in agents:
+        for capability in agent.get("capabilities", []):
+            index.setdefault(normalize_capability(capability), []).append(agent)
+    return index
+
+
+def parse_routing_response(text: str) -> Dict:
+    """
+    Pull the routing decision out of an LLM reply
+
+    Accepts bare JSON, JSON inside markdown fences or surrounded by prose,
+    and requires an agent_id.
+    """
+    text = (text or "").strip()
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("no JSON object in LLM response")
+    result, _ = json.JSONDecoder().raw_decode(text[start:])
+    if not isinstance(result, dict) or not result.get("agent_id"):
+        raise ValueError("LLM response has no agent_id")
+    result["agent_id"] = str(result["agent_id"])
+    return result
+
+
+def prefilter_score(agent: Dict) -> float:
+    """Cheap reliability ranking used to cut the candidate list down before the LLM"""
+    score = (agent.get("success_rate") or 0) / 100
+    score -= (agent.get("average_latency_ms") or 0) / 10000
+    if agent.get("status") == "active":
+        score += 0.05
+    return score
+
+
+def keywords(text: Optional[str]) -> Set[str]:
+    """
+    Word stems to match a task description against capability names
+
+    Stems are the first five letters, so "scrape" matches "web_scraping"
+    and "validate" matches "data_validation".
+    """
+    return {word[:5] for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if len(word) >= 3}
+
+
+def relevance(index: Dict[str, List[Dict]], words: Set[str]) -> Dict[str, int]:
+    """Number of description stems each agent's capabilities match, by agent _id"""
+    scores: Dict[str, int] = {}
+    if not words:
+        return scores
+    for capability, agents in index.items():
+        hits = len(keywords(capability.replace("_", " ")) & words)
+        if hits:
+            for agent in agents:
+                key = str(agent.get("_id"))
+                scores[key] = scores.get(key, 0) + hits
+    return scores
+
+
 class RoutingAgent:
     """
     The Scout AI that analyzes incoming jobs and matches them to the best agent
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        top_k: int = 5,
+        weights: Optional[ScoringWeights] = None,
+        timeout: float = float(os.getenv("ROUTING_LLM_TIMEOUT", "8")),
+        max_concurrency: int = int(os.getenv("ROUTING_LLM_CONCURRENCY", "4"))
+    ):
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.top_k = top_k
+        self.weights = weights or ScoringWeights()
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.circuit = CircuitBreaker("gemini")
+
+    async def _catalog(self, available_agents: Optional[List[Dict]]):
+        """The capability index and agent list to route over"""
+        if available_agents is None:
+            return await agent_catalog.capability_index(), await agent_catalog.list()
+        return build_capability_index(available_agents), available_agents
+
+    async def candidates(
+        self,
+        task_type: Optional[str],
+        available_agents: Optional[List[Dict]] = None,
+        region: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        All routable agents for a task type
+
+        Candidates come from the capability index for the task type (the
+        cached catalog's, or one built from available_agents), then are
+        filtered by status and region.
+        """
+        index, everyone = await self._catalog(available_agents)
+        required_caps = TASK_TO_CAPABILITY.get(task_type, [])
+        if required_caps:
+            seen = {}
+            for cap in required_caps:
+                for agent in index.get(cap, []):
+                    seen[id(agent)] = agent
+            candidates = list(seen.values())
+        else:
+            candidates = list(everyone)  # Unknown task type, let the LLM decide
+
+        candidates = [a for a in candidates if a.get("status", "active") in ROUTABLE_STATUSES]
+
+        if region:
+            in_region = [a for a in candidates if (a.get("region") or "").lower() == region.lower()]
+            candidates = in_region or candidates  # Prefer the region, don't require it
+
+        return candidates
+
+    async def shortlist(
+        self,
+        task_type: Optional[str],
+        available_agents: Optional[List[Dict]] = None,
+        region: Optional[str] = None,
+        top_k: Optional[int] = None,
+        budget: Optional[float] = None,
+        task_description: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Narrow the affordable candidates down to the few agents worth showing the LLM
+
+        Agents whose capabilities match words in the task description come
+        first; prefilter_score orders agents of equal relevance.
+        """
+        candidates = within_budget(await self.candidates(task_type, available_agents, region), budget)
+        index, _ = await self._catalog(available_agents)
+        scores = relevance(index, keywords(task_description))
+        candidates.sort(key=lambda a: (scores.get(str(a.get("_id")), 0), prefilter_score(a)), reverse=True)
+        return candidates[:top_k or self.top_k]
+
+    def select_by_score(
+        self,
+        candidates: List[Dict],
+        budget: Optional[float] = None,
+        weights: Optional[ScoringWeights] = None
+    ) -> Optional[Dict]:
+        """Pick the best candidate locally, without calling the LLM"""
+        ranked = score_agents(candidates, weights or self.weights, budget)
+        if not ranked:
+            return None
+        score, agent = ranked[0]
+        runner_up = f"; runner-up {ranked[1][1].get('name')} scored {ranked[1][0]:.2f}" if len(ranked) > 1 else ""
+        return {
+            "agent_id": str(agent.get("_id")),
+            "agent_name": agent.get("name"),
+            "confidence": score,
+            "reasoning": (
+                f"Highest weighted score ({score:.2f}) on success rate, latency, "
+                f"reliability and price among {len(ranked)} capable agents{runner_up}"
+            ),
+            "method": "scored"
+        }
 
     async def find_best_agent(
         self,
         task_description: str,
         task_type: Optional[str],
-        available_agents: List[Dict]
+        available_agents: Optional[List[Dict]] = None,
+        region: Optional[str] = None,
+        budget: Optional[float] = None,
+        weights: Optional[ScoringWeights] = None
     ) -> Dict:
         """
-        Use LLM to analyze the task and pick the best agent from MongoDB
+        Pick the best agent for a task
+
+        Known task types are routed by the local scoring engine; the LLM is
+        only asked when the task type gives no capability to match on.
 
         Args:
             task_description: What the user wants done
             task_type: Optional hint like "web_scrape"
-            available_agents: List of agents from MongoDB with their capabilities
+            available_agents: Agents to choose from; defaults to the cached catalog
+            region: Optional preferred region
+            budget: Optional job budget; agents priced above it are skipped
+            weights: Optional override of the scoring weights
 
         Returns:
             Dict with selected agent and reasoning
         """
+        result = await self._route(task_description, task_type, available_agents, region, budget, weights)
+        ROUTING_DECISIONS.labels(result["method"]).inc()
+        return result
+
+    async def _route(
+        self,
+        task_description: str,
+        task_type: Optional[str],
+        available_agents: Optional[List[Dict]],
+        region: Optional[str],
+        budget: Optional[float],
+        weights: Optional[ScoringWeights]
+    ) -> Dict:
+        if task_type in TASK_TO_CAPABILITY:
+            candidates = await self.candidates(task_type, available_agents, region)
+            selected = self.select_by_score(candidates, budget, weights)
+            if selected:
+                return selected
+            reason = "within budget " if candidates else ""
+            return {
+                "agent_id": "no_match",
+                "agent_name": None,
+                "confidence": 0.0,
+                "reasoning": f"No routable agent {reason}has a capability for task type '{task_type}'",
+                "method": "scored"
+            }
+
+        candidates = await self.shortlist(
+            task_type, available_agents, region, budget=budget, task_description=task_description
+        )
+        if not candidates:
+            return {
+                "agent_id": "no_match",
+                "agent_name": None,
+                "confidence": 0.0,
+                "reasoning": "No routable agent within budget",
+                "method": "scored"
+            }
 
         # Build prompt for Gemini
         agent_list = "\n".join([
@@ -48,7 +270,7 @@ class RoutingAgent:
             f"  Avg Latency: {agent.get('average_latency_ms', 0)}ms\n"
             f"  Region: {agent.get('region')}\n"
             f"  Status: {agent.get('status')}\n"
-            for agent in available_agents
+            for agent in candidates
         ])
 
         prompt = f"""You are TUNDRA's Routing AI. Your job is to match tasks to the best available AI agent.
@@ -76,38 +298,68 @@ RESPOND IN THIS EXACT JSON FORMAT (no markdown):
 }}
 """
 
-        # Call Gemini
-        response = self.model.generate_content(prompt)
-        result_text = response.text.strip()
+        try:
+            result = parse_routing_response(await self.generate(prompt))
+        except Exception as e:
+            return self.fallback(candidates, budget, weights, f"{type(e).__name__}: {e}")
 
-        # Parse JSON response
-        import json
-        # Remove markdown code blocks if present
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
+        if result["agent_id"] != "no_match" and result["agent_id"] not in {str(a.get("_id")) for a in candidates}:
+            return self.fallback(candidates, budget, weights, f"LLM picked unknown agent {result['agent_id']}")
 
-        result = json.loads(result_text.strip())
+        result["method"] = "llm"
         return result
 
+    async def generate(self, prompt: str) -> str:
+        """
+        Ask Gemini without blocking the event loop
+
+        At most max_concurrency calls are in flight; the deadline covers
+        waiting for a slot, the call itself and any retry. While Gemini is
+        failing the circuit breaker raises CircuitOpen without calling it.
+        """
+        async def call():
+            async with self.semaphore:
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config={"response_mime_type": "application/json", "temperature": 0}
+                )
+                return response.text
+
+        with ROUTING_LLM_LATENCY.time():
+            return await call_with_retry(
+                self.circuit,
+                lambda time_left: asyncio.wait_for(call(), timeout=time_left),
+                deadline=time.monotonic() + self.timeout
+            )
+
+    def fallback(
+        self,
+        candidates: List[Dict],
+        budget: Optional[float],
+        weights: Optional[ScoringWeights],
+        error: str
+    ) -> Dict:
+        """Local choice used when the LLM is slow, down or returns junk"""
+        print(f"Routing LLM unavailable, using local scoring: {error}")
+        selected = self.select_by_score(candidates, budget, weights) or {
+            "agent_id": "no_match",
+            "agent_name": None,
+            "confidence": 0.0,
+            "reasoning": "No routable agent within budget"
+        }
+        selected["method"] = "fallback"
+        selected["llm_error"] = error
+        return selected
+
 
     def validate_task_type(self, task_type: str, agent_capabilities: List[str]) -> bool:
         """
         Simple capability matching (before LLM call to filter candidates)
         """
-        task_to_capability = {
-            "web_scrape": ["web_scraping", "data_extraction", "scraping"],
-            "summarize": ["text_summarization", "summarization", "nlp"],
-            "validate": ["data_validation", "compliance", "validation"],
-            "code_review": ["code_review", "security_analysis", "code_analysis"],
-            "image_analysis": ["image_classification", "computer_vision", "ocr"],
-        }
-
-        required_caps = task_to_capability.get(task_type, [])
+        required_caps = TASK_TO_CAPABILITY.get(task_type, [])
         if not required_caps:
             return True  # If unknown task type, let LLM decide
 
         # Check if agent has any of the required capabilities
-        agent_caps_lower = [cap.lower().replace(" ", "_") for cap in agent_capabilities]
+        agent_caps_lower = [normalize_capability(cap) for cap in agent_capabilities]
         return any(req_cap in agent_caps_lower for req_cap in required_caps)
@@ -6,6 +6,7 @@ Seed script to populate MongoDB with initial TUNDRA agents
 import asyncio
 from datetime import datetime
 from database import agents_collection, jobs_collection
+from agent_catalog import agent_catalog
 
 # Initial agents to add to the marketplace
 SEED_AGENTS = [
@@ -125,6 +126,7 @@ async def seed_database():
     print(f"\n📦 Inserting {len(SEED_AGENTS)} agents...")
     result = await agents_collection.insert_many(SEED_AGENTS)
     print(f"✅ Inserted {len(result.inserted_ids)} agents")
+    await agent_catalog.invalidate()
 
     # Print agent IDs for reference
     print("\n🤖 Agent IDs:")
@@ -147,6 +149,7 @@ async def clear_database():
     print("🗑️  Clearing database...")
     await agents_collection.delete_many({})
     await jobs_collection.delete_many({})
+    await agent_catalog.invalidate()
     print("✅ Database cleared")
 
 
@@ -0,0 +1,87 @@
+# db/spending.py
+"""
+Per-user spending rollups
+
+The backend $inc's one document per user per UTC day, plus an all-time
+document, as jobs finish. Period queries read at most a month of those
+documents no matter how many jobs the user has run. backfill_rollups()
+rebuilds them from the jobs collection:
+
+    python spending.py backfill
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from database import jobs_collection, spend_rollups_collection
+
+ALL_TIME = "all"
+PERIOD_DAYS = {"week": 7, "month": 30}
+FIELDS = ("total_spent", "successful_jobs", "failed_jobs", "refunded")
+
+
+async def spending_summary(user_id: str, period: str) -> dict:
+    summary = {field: 0 for field in FIELDS}
+
+    if period == "all":
+        doc = await spend_rollups_collection.find_one({"_id": f"{user_id}:{ALL_TIME}"})
+        docs = [doc] if doc else []
+    else:
+        today = datetime.now(timezone.utc).date()
+        start = today - timedelta(days=PERIOD_DAYS[period] - 1)
+        # Bounded above as well, since "all" sorts after every date string
+        docs = await spend_rollups_collection.find({
+            "user_id": user_id,
+            "day": {"$gte": start.isoformat(), "$lte": today.isoformat()}
+        }).to_list(length=PERIOD_DAYS[period])
+
+    for doc in docs:
+        for field in FIELDS:
+            summary[field] += doc.get(field, 0)
+
+    summary["total_spent"] = round(summary["total_spent"], 2)
+    summary["refunded"] = round(summary["refunded"], 2)
+    summary["period"] = period
+    return summary
+
+
+def _rollup_stage(day_expression):
+    return [
+        {"$match": {"status": {"$in": ["completed", "failed", "timed_out"]}, "user_id": {"$type": "string"}}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "day": day_expression},
+            "total_spent": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, {"$ifNull": ["$budget", 0]}, 0]}},
+            "successful_jobs": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+            "failed_jobs": {"$sum": {"$cond": [{"$in": ["$status", ["failed", "timed_out"]]}, 1, 0]}},
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.user_id", ":", "$_id.day"]},
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            "total_spent": 1,
+            "successful_jobs": 1,
+            "failed_jobs": 1,
+            "refunded": {"$literal": 0},
+        }},
+        {"$merge": {"into": spend_rollups_collection.name, "on": "_id", "whenMatched": "replace"}},
+    ]
+
+
+async def backfill_rollups():
+    """Recompute every rollup document from the jobs collection"""
+    finished_day = {"$dateToString": {
+        "format": "%Y-%m-%d",
+        "date": {"$ifNull": ["$finished_at", "$created_at"]}
+    }}
+    await jobs_collection.aggregate(_rollup_stage(finished_day)).to_list(length=None)
+    await jobs_collection.aggregate(_rollup_stage({"$literal": ALL_TIME})).to_list(length=None)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        asyncio.run(backfill_rollups())
+        print("✅ Spending rollups rebuilt")
+    else:
+        print("usage: python spending.py backfill")
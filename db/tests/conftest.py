@@ -0,0 +1,8 @@
+import os
+import sys
+
+# db service modules import each other as top-level modules (`from database import ...`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("GEMINI_API_KEY", "test")
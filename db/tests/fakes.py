@@ -0,0 +1,148 @@
+"""In-memory stand-ins for the Motor collections the routes use"""
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _compare(value, condition):
+    if not (isinstance(condition, dict) and any(k.startswith("$") for k in condition)):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$exists":
+            if (value is not None) != operand:
+                return False
+            continue
+        if op == "$ne":
+            if value == operand:
+                return False
+            continue
+        if op == "$in":
+            if value not in operand:
+                return False
+            continue
+        # Like Mongo, range operators only match values of the operand's type.
+        if value is None or type(value) is not type(operand):
+            return False
+        if not {"$lt": value < operand, "$lte": value <= operand,
+                "$gt": value > operand, "$gte": value >= operand}[op]:
+            return False
+    return True
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif not _compare(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    if any(projection.values()):
+        return {k: v for k, v in doc.items() if k in projection or k == "_id" and projection.get("_id", 1)}
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+class FakeCursor:
+
+    def __init__(self, docs):
+        self.docs = docs
+        self._limit = None
+
+    def sort(self, keys, direction=1):
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        # Missing and null sort lowest, as in Mongo.
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda d: (_get(d, field) is not None, _get(d, field) or 0), reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    async def to_list(self, length=None):
+        docs = self.docs[:self._limit]
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        async def gen():
+            for doc in self.docs[:self._limit]:
+                yield doc
+        return gen()
+
+
+class FakeCollection:
+
+    def __init__(self, docs=(), name="test"):
+        self.name = name
+        self.docs = [dict(d) for d in docs]
+        for doc in self.docs:
+            doc.setdefault("_id", ObjectId())
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([_project(d, projection) for d in self.docs if matches(d, query or {})])
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        doc = await self._find_raw(query)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            doc.setdefault("_id", ObjectId())
+            doc.update(update.get("$setOnInsert", {}))
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+    async def insert_one(self, doc):
+        doc = {"_id": ObjectId(), **doc}
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def update_many(self, query, update):
+        hits = [doc for doc in self.docs if matches(doc, query)]
+        for doc in hits:
+            doc.update(update.get("$set", {}))
+        return SimpleNamespace(modified_count=len(hits))
+
+    async def _find_raw(self, query):
+        return next((doc for doc in self.docs if matches(doc, query)), None)
+
+    async def index_information(self):
+        return {name: dict(info) for name, info in self.indexes.items()}
+
+    async def drop_index(self, name):
+        del self.indexes[name]
+
+    async def create_index(self, keys, name, **options):
+        for existing, info in self.indexes.items():
+            if existing == name and info["key"] == list(keys):
+                return name
+            if info["key"] == list(keys):
+                raise RuntimeError("IndexOptionsConflict")
+        self.indexes[name] = {"key": list(keys), **options}
+        return name
@@ -0,0 +1,67 @@
+import asyncio
+
+from agent_catalog import AgentCatalog
+from tests.fakes import FakeCollection
+
+
+class CountingCollection(FakeCollection):
+
+    def __init__(self, docs):
+        super().__init__(docs)
+        self.loads = 0
+
+    def find(self, query=None, projection=None):
+        self.loads += 1
+        return super().find(query, projection)
+
+
+def make_catalog(ttl=0.0):
+    agents = CountingCollection([
+        {"agent_id": "A1", "name": "Scraper", "capabilities": ["Web Scraping"]},
+        {"agent_id": "A2", "name": "Summarizer", "capabilities": ["summarization", "NLP"]},
+    ])
+    return AgentCatalog(agents, FakeCollection(), ttl=ttl), agents
+
+
+def test_indexes_by_id_and_normalized_capability():
+    catalog, _ = make_catalog()
+
+    async def check():
+        assert (await catalog.get("A1"))["name"] == "Scraper"
+        assert [a["agent_id"] for a in await catalog.with_capability("web_scraping")] == ["A1"]
+        assert [a["agent_id"] for a in await catalog.with_capability("nlp")] == ["A2"]
+
+    asyncio.run(check())
+
+
+def test_reloads_only_when_the_version_moves():
+    catalog, agents = make_catalog()
+
+    async def check():
+        await catalog.list()
+        first_etag = catalog.etag
+        await catalog.list()
+        assert agents.loads == 1
+
+        agents.docs[0]["name"] = "Renamed"
+        await catalog.list()
+        assert agents.loads == 1  # No version bump, no reload
+
+        await catalog.invalidate()
+        assert agents.loads == 2
+        assert (await catalog.get("A1"))["name"] == "Renamed"
+        assert catalog.etag != first_etag
+
+    asyncio.run(check())
+
+
+def test_ttl_skips_version_checks():
+    catalog, agents = make_catalog(ttl=60.0)
+
+    async def check():
+        await catalog.list()
+        await catalog.meta.update_one({"_id": "agents"}, {"$inc": {"version": 1}}, upsert=True)
+        await catalog.list()
+        assert agents.loads == 1
+
+    asyncio.run(check())
@@ -0,0 +1,51 @@
+import asyncio
+
+from agent_scoring import ScoringWeights, score_agents
+from routing_agent import RoutingAgent
+
+
+def agent(_id, success=90.0, latency=1000, reliability=0.9, price=1.0, capabilities=("summarization",)):
+    return {
+        "_id": _id, "name": _id, "capabilities": list(capabilities), "status": "active",
+        "success_rate": success, "average_latency_ms": latency, "reliability_score": reliability,
+        "pricing": {"base_rate": price, "unit": "per_task"},
+    }
+
+
+def test_ranking_is_deterministic_with_ties_broken_by_id():
+    ranked = score_agents([agent("b"), agent("a"), agent("c")])
+    assert [a["_id"] for _, a in ranked] == ["a", "b", "c"]
+
+
+def test_weights_steer_the_choice():
+    fast, accurate = agent("fast", success=80, latency=100), agent("accurate", success=99, latency=3000)
+    assert score_agents([fast, accurate], ScoringWeights(success_rate=0, latency=1, reliability=0, price=0))[0][1] is fast
+    assert score_agents([fast, accurate], ScoringWeights(success_rate=1, latency=0, reliability=0, price=0))[0][1] is accurate
+
+
+def test_budget_excludes_expensive_agents():
+    assert [a["_id"] for _, a in score_agents([agent("cheap", price=1), agent("pricey", price=50)], budget=10)] == ["cheap"]
+    assert score_agents([agent("pricey", price=50)], budget=10) == []
+
+
+def test_known_task_types_route_without_the_llm():
+    router = RoutingAgent()
+    result = asyncio.run(router.find_best_agent("summarize this", "summarize", [agent("a", success=99), agent("b")]))
+    assert (result["agent_id"], result["method"]) == ("a", "scored")
+
+
+def test_budget_applies_before_the_llm_shortlist_is_cut():
+    # Six expensive agents rank above the only affordable one in the prefilter.
+    agents = [agent(f"pricey{i}", success=99, price=100, capabilities=["translation"]) for i in range(6)]
+    agents.append(agent("cheap", success=50, price=1, capabilities=["translation"]))
+
+    router = RoutingAgent(top_k=5)
+    shortlist = asyncio.run(router.shortlist("translate", agents, budget=10))
+    assert [a["_id"] for a in shortlist] == ["cheap"]
+
+    async def no_llm(prompt):
+        raise ConnectionError("offline")
+
+    router.generate = no_llm
+    result = asyncio.run(router.find_best_agent("translate this", "translate", agents, budget=10))
+    assert (result["agent_id"], result["method"]) == ("cheap", "fallback")
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpen, call_with_retry
+from routing_agent import RoutingAgent
+
+
+def run(fn, circuit=None, timeout=5.0, attempts=2):
+    return asyncio.run(call_with_retry(circuit or CircuitBreaker("test"), fn, time.monotonic() + timeout, attempts, 0.01))
+
+
+def test_transient_errors_are_retried():
+    calls = []
+
+    async def flaky(time_left):
+        calls.append(time_left)
+        if len(calls) == 1:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    assert run(flaky) == "ok"
+    assert len(calls) == 2 and calls[1] < calls[0]
+
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    async def broken(time_left):
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        run(broken)
+    assert len(calls) == 1
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    circuit = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+
+    async def down(time_left):
+        raise ConnectionError()
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            run(down, circuit, attempts=1)
+    assert circuit.state == "open"
+    with pytest.raises(CircuitOpen):
+        run(down, circuit)
+
+    time.sleep(0.06)
+
+    async def up(time_left):
+        return "ok"
+
+    assert run(up, circuit) == "ok"
+    assert circuit.state == "closed"
+
+
+def test_generate_is_bounded_by_the_routing_timeout():
+    router = RoutingAgent(timeout=0.05)
+
+    class Hanging:
+        async def generate_content_async(self, *args, **kwargs):
+            await asyncio.sleep(10)
+
+    router.model = Hanging()
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(router.generate("prompt"))
+    assert time.monotonic() - started < 1
@@ -0,0 +1,33 @@
+import asyncio
+from collections import defaultdict
+
+import indexes
+from tests.fakes import FakeCollection
+
+
+def test_ttl_indexes_only_when_configured(monkeypatch):
+    monkeypatch.delenv("EVENT_TTL_DAYS", raising=False)
+    monkeypatch.setenv("JOB_TTL_DAYS", "0.5")
+    declared = indexes.declared_indexes()
+    assert not any("expireAfterSeconds" in spec for spec in declared["job_events"])
+    ttl = [spec for spec in declared["jobs"] if "expireAfterSeconds" in spec]
+    assert ttl == [{"keys": [("finished_at", 1)], "name": "finished_at_ttl", "expireAfterSeconds": 43200}]
+    # The module-level declaration is not mutated.
+    assert not any("expireAfterSeconds" in spec for spec in indexes.INDEXES["jobs"])
+
+
+def test_ensure_indexes_creates_every_declared_index(monkeypatch):
+    db = defaultdict(FakeCollection)
+    monkeypatch.setattr(indexes, "db", db)
+    asyncio.run(indexes.ensure_indexes())
+    asyncio.run(indexes.ensure_indexes())
+    for collection, specs in indexes.declared_indexes().items():
+        assert {spec["name"] for spec in specs} <= set(db[collection].indexes)
+
+
+def test_plan_stages_finds_nested_collection_scans():
+    plan = {"stage": "SORT", "inputStage": {"stage": "OR", "inputStages": [
+        {"stage": "IXSCAN"}, {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}
+    ]}}
+    assert list(indexes.plan_stages(plan)) == ["SORT", "OR", "IXSCAN", "FETCH", "COLLSCAN"]
+    assert list(indexes.plan_stages({"queryPlan": {"stage": "IXSCAN"}})) == [None, "IXSCAN"]
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import indexes
+from routes import jobs
+from tests.fakes import FakeCollection
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    legacy_id = ObjectId()
+    job_docs = FakeCollection([
+        {"job_id": "JOB-1", "task": "scrape"},
+        {"_id": legacy_id, "task": "old", "events": [{"type": "message"}, {"type": "result"}]},
+    ])
+    event_docs = FakeCollection([{"job_id": "JOB-1", "seq": seq, "type": "message"} for seq in range(3)])
+    monkeypatch.setattr(jobs, "jobs_collection", job_docs)
+    monkeypatch.setattr(jobs, "events_collection", event_docs)
+    return str(legacy_id)
+
+
+def test_job_and_events_take_the_same_identifier(collections):
+    assert asyncio.run(jobs.get_job("JOB-1"))["task"] == "scrape"
+    page = asyncio.run(jobs.get_job_events("JOB-1", after=0, limit=1))
+    assert [e["seq"] for e in page["events"]] == [1]
+    assert page["next_after"] == 1
+
+
+def test_legacy_jobs_by_object_id_serve_embedded_events(collections):
+    legacy_id = collections
+    assert asyncio.run(jobs.get_job(legacy_id))["task"] == "old"
+    assert "events" not in asyncio.run(jobs.get_job(legacy_id))
+    page = asyncio.run(jobs.get_job_events(legacy_id, after=0, limit=50))
+    assert page["events"] == [{"type": "result", "seq": 1}]
+
+
+def test_unknown_job_is_404(collections):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(jobs.get_job_events("JOB-404", after=-1, limit=50))
+    assert e.value.status_code == 404
+
+
+def test_ensure_index_replaces_an_index_left_under_another_name():
+    collection = FakeCollection()
+    collection.indexes["job_id_1_seq_1"] = {"key": [("job_id", 1), ("seq", 1)], "unique": True}
+    asyncio.run(indexes.ensure_index(collection, [("job_id", 1), ("seq", 1)], "job_id_seq", unique=True))
+    assert set(collection.indexes) == {"_id_", "job_id_seq"}
+    # Idempotent once the index has its declared name.
+    asyncio.run(indexes.ensure_index(collection, [("job_id", 1), ("seq", 1)], "job_id_seq", unique=True))
+    assert set(collection.indexes) == {"_id_", "job_id_seq"}
+
+
+def test_ensure_index_leaves_an_unknown_same_key_index_alone(caplog):
+    collection = FakeCollection()
+    collection.indexes["ops_job_seq"] = {"key": [("job_id", 1), ("seq", 1)]}
+    asyncio.run(indexes.ensure_index(collection, [("job_id", 1), ("seq", 1)], "job_id_seq", unique=True))
+    assert set(collection.indexes) == {"_id_", "ops_job_seq"}
+    assert "ops_job_seq" in caplog.text
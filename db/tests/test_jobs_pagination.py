@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+from routes import jobs
+from tests.fakes import FakeCollection
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def job_docs(monkeypatch):
+    docs = [{"job_id": f"J{i}", "status": "completed" if i % 2 else "pending",
+             "created_at": START + timedelta(minutes=i // 2)} for i in range(7)]
+    # Legacy documents without created_at, or with it set to null
+    docs += [{"job_id": "L1"}, {"job_id": "L2", "created_at": None}]
+    collection = FakeCollection(docs)
+    monkeypatch.setattr(jobs, "jobs_collection", collection)
+    return collection
+
+
+def list_jobs(**params):
+    params = {"status": None, "user_id": None, "created_after": None, "created_before": None,
+              "order": "desc", "fields": None, "limit": 20, "cursor": None, "envelope": True,
+              "response": Response(), **params}
+    return asyncio.run(jobs.list_jobs(**params))
+
+
+def walk(limit, **params):
+    seen, cursor = [], None
+    while True:
+        page = list_jobs(limit=limit, cursor=cursor, **params)
+        seen += [doc["job_id"] for doc in page["jobs"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+@pytest.mark.parametrize("limit", [1, 2, 3, 20])
+def test_pages_cover_every_job_once_in_order(job_docs, order, limit):
+    everything = [doc["job_id"] for doc in list_jobs(order=order, limit=100)["jobs"]]
+    assert sorted(everything) == sorted(doc["job_id"] for doc in job_docs.docs)
+    assert walk(limit, order=order) == everything
+
+
+def test_filters_apply_across_pages(job_docs):
+    assert walk(2, status="completed") == ["J5", "J3", "J1"]
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    assert jobs.decode_cursor(jobs.encode_cursor({"created_at": START, "_id": oid})) == (START, oid)
+    assert jobs.decode_cursor(jobs.encode_cursor({"_id": oid})) == (None, oid)
+    with pytest.raises(HTTPException) as e:
+        jobs.decode_cursor("not-a-cursor")
+    assert e.value.status_code == 400
+
+
+def test_bare_list_shape_on_request(job_docs):
+    response = Response()
+    page = list_jobs(limit=2, envelope=False, response=response)
+    assert isinstance(page, list) and len(page) == 2
+    assert jobs.decode_cursor(response.headers["X-Next-Cursor"])[1] == ObjectId(page[-1]["_id"])
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from key_store import APIKeyStore
+from tests.fakes import FakeCollection
+
+
+class CountingCollection(FakeCollection):
+
+    def __init__(self, docs=()):
+        super().__init__(docs, name="api_keys")
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return await super().find_one(query, projection)
+
+
+def key(user_id, key_hash, active=True):
+    return {"key_hash": key_hash, "user_id": user_id, "active": active}
+
+
+def test_hits_and_misses_are_cached():
+    collection = CountingCollection([key("u1", "h1")])
+    store = APIKeyStore(collection)
+
+    assert asyncio.run(store.verify("h1"))["user_id"] == "u1"
+    assert asyncio.run(store.verify("h1"))["user_id"] == "u1"
+    assert asyncio.run(store.verify("nope")) is None
+    assert asyncio.run(store.verify("nope")) is None
+    assert collection.lookups == 2
+
+
+def test_cache_is_bounded_and_evicts_least_recently_used():
+    collection = CountingCollection([key("u1", "h1")])
+    store = APIKeyStore(collection, max_entries=3)
+
+    asyncio.run(store.verify("h1"))
+    for i in range(100):
+        asyncio.run(store.verify(f"random-{i}"))
+        asyncio.run(store.verify("h1"))  # kept warm
+
+    assert len(store._cache) == 3
+    assert "h1" in store._cache
+    assert store._user_hashes == {"u1": {"h1"}}
+
+
+def test_evicted_keys_leave_no_user_index_behind():
+    collection = CountingCollection([key(f"u{i}", f"h{i}") for i in range(10)])
+    store = APIKeyStore(collection, max_entries=2)
+    for i in range(10):
+        asyncio.run(store.verify(f"h{i}"))
+    assert set(store._user_hashes) == {"u8", "u9"}
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("key_store.time.monotonic", lambda: now[0])
+    collection = CountingCollection([key("u1", "h1")])
+    store = APIKeyStore(collection, ttl=60, negative_ttl=5, max_entries=2)
+
+    asyncio.run(store.verify("h1"))
+    asyncio.run(store.verify("miss"))
+    now[0] += 10
+    # The expired miss is swept before the live key is evicted.
+    asyncio.run(store.verify("other"))
+    assert set(store._cache) == {"h1", "other"}
+
+    now[0] += 100
+    asyncio.run(store.verify("h1"))
+    assert collection.lookups == 4
+
+
+def test_revocation_invalidates_the_users_keys():
+    collection = CountingCollection([key("u1", "h1")])
+    store = APIKeyStore(collection)
+    asyncio.run(store.verify("h1"))
+    store.invalidate_user("u1")
+    assert "h1" not in store._cache
+
+
+def test_regenerated_key_keeps_its_tier():
+    collection = CountingCollection([{**key("u1", "h1"), "tier": "pro"}])
+    store = APIKeyStore(collection)
+    assert asyncio.run(store.create("u1", "u1@example.com", "tundra_new_key", "h2", replace=True))
+    assert asyncio.run(store.verify("h1"))["active"] is False
+    assert asyncio.run(store.verify("h2"))["tier"] == "pro"
+
+
+class FlakyStreamCollection(FakeCollection):
+    """Change streams fail twice, then report one revocation"""
+
+    def __init__(self):
+        super().__init__(name="api_keys")
+        self.attempts = 0
+
+    def watch(self, pipeline, full_document=None):
+        self.attempts += 1
+        if self.attempts <= 2:
+            raise OperationFailure("not a replica set")
+        return FakeStream([{"fullDocument": {"user_id": "u1"}}])
+
+
+class FakeStream:
+
+    def __init__(self, changes):
+        self.changes = changes
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.changes:
+            return self.changes.pop(0)
+        await asyncio.sleep(3600)
+
+
+def test_watcher_retries_after_change_stream_errors():
+    collection = FlakyStreamCollection()
+    store = APIKeyStore(collection, max_backoff=0.02)
+    store._remember("h1", key("u1", "h1"))
+
+    async def main():
+        watcher = asyncio.create_task(store.watch_revocations(initial_backoff=0.01))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if "h1" not in store._cache:
+                break
+        watcher.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await watcher
+
+    asyncio.run(main())
+    assert collection.attempts == 3
+    assert "h1" not in store._cache
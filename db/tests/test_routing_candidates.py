@@ -0,0 +1,52 @@
+import asyncio
+
+from routing_agent import RoutingAgent, build_capability_index
+
+AGENTS = [
+    {"_id": "1", "name": "Scraper East", "capabilities": ["Web Scraping"], "status": "active", "region": "US-East"},
+    {"_id": "2", "name": "Scraper West", "capabilities": ["data_extraction"], "status": "idle", "region": "US-West"},
+    {"_id": "3", "name": "Scraper Off", "capabilities": ["scraping"], "status": "disabled", "region": "US-East"},
+    {"_id": "4", "name": "Summarizer", "capabilities": ["summarization"], "status": "active", "region": "US-East"},
+]
+
+
+def candidate_ids(task_type, region=None):
+    agents = asyncio.run(RoutingAgent().candidates(task_type, AGENTS, region))
+    return sorted(a["_id"] for a in agents)
+
+
+def test_capability_index_normalizes_names():
+    index = build_capability_index(AGENTS)
+    assert [a["_id"] for a in index["web_scraping"]] == ["1"]
+
+
+def test_candidates_match_any_capability_and_skip_disabled_agents():
+    assert candidate_ids("web_scrape") == ["1", "2"]
+    assert candidate_ids("summarize") == ["4"]
+
+
+def test_region_is_preferred_not_required():
+    assert candidate_ids("web_scrape", region="us-west") == ["2"]
+    assert candidate_ids("web_scrape", region="EU") == ["1", "2"]
+
+
+def test_unknown_task_type_keeps_every_routable_agent():
+    assert candidate_ids("translate") == ["1", "2", "4"]
+
+
+def shortlist_ids(description, top_k=2, agents=AGENTS):
+    agents = asyncio.run(RoutingAgent().shortlist("translate", agents, top_k=top_k, task_description=description))
+    return [a["_id"] for a in agents]
+
+
+def test_unknown_task_type_shortlist_ranks_by_description_relevance():
+    ranked = [{**a, "success_rate": 99 if a["_id"] == "1" else 50} for a in AGENTS]
+    assert shortlist_ids("Summarize these meeting notes", top_k=1, agents=ranked) == ["4"]
+    assert shortlist_ids("extract the data tables", top_k=1, agents=ranked) == ["2"]
+    # Nothing relevant: reliability decides.
+    assert shortlist_ids("translate to French", top_k=1, agents=ranked) == ["1"]
+
+
+def test_shortlist_tolerates_missing_stats():
+    agents = [{**AGENTS[0], "success_rate": None, "average_latency_ms": None}, AGENTS[3]]
+    assert sorted(shortlist_ids(None, agents=agents)) == ["1", "4"]
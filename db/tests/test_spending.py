@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import spending
+from tests.fakes import FakeCollection
+
+
+def rollup(user_id, day, spent, ok=1, failed=0):
+    return {"_id": f"{user_id}:{day}", "user_id": user_id, "day": day,
+            "total_spent": spent, "successful_jobs": ok, "failed_jobs": failed, "refunded": 0.0}
+
+
+@pytest.fixture
+def rollups(monkeypatch):
+    today = datetime.now(timezone.utc).date()
+    days = lambda n: (today - timedelta(days=n)).isoformat()
+    collection = FakeCollection([
+        rollup("u1", days(0), 1.25),
+        rollup("u1", days(6), 2.0, failed=1),
+        rollup("u1", days(20), 4.0),
+        rollup("u1", days(45), 8.0),
+        rollup("u1", "all", 15.25, ok=4, failed=1),
+        rollup("u2", days(0), 100.0),
+        # Dated in the future: outside every period
+        rollup("u1", days(-1), 50.0),
+    ])
+    monkeypatch.setattr(spending, "spend_rollups_collection", collection)
+    return collection
+
+
+@pytest.mark.parametrize("period, spent, jobs", [("week", 3.25, 2), ("month", 7.25, 3), ("all", 15.25, 4)])
+def test_periods_sum_the_users_rollups(rollups, period, spent, jobs):
+    summary = asyncio.run(spending.spending_summary("u1", period))
+    assert summary["total_spent"] == spent
+    assert summary["successful_jobs"] == jobs
+    assert summary["period"] == period
+
+
+def test_user_without_rollups_spent_nothing(rollups):
+    summary = asyncio.run(spending.spending_summary("nobody", "all"))
+    assert summary == {"total_spent": 0, "successful_jobs": 0, "failed_jobs": 0, "refunded": 0, "period": "all"}
+
+
+def test_backfill_groups_by_finish_day_and_all_time():
+    stages = spending._rollup_stage({"$literal": spending.ALL_TIME})
+    group = stages[1]["$group"]
+    assert group["_id"] == {"user_id": "$user_id", "day": {"$literal": "all"}}
+    assert stages[-1]["$merge"]["whenMatched"] == "replace"